@@ -1,65 +1,228 @@
 """
 Script para copiar el mejor modelo de MLflow a producción
+
+Antes de copiar, el candidato y el modelo en producción se miden con el mismo
+workload sintético (src/infrastructure/ml/artifact_benchmark.py, cada uno en
+su propio proceso, en varias rondas). La promoción se rechaza si la latencia p90
+por batch (mediana entre rondas) o la memoria (RSS pico) empeoran más de lo
+permitido. Los deltas de accuracy, latencia y tamaño quedan en
+.mlflow_deploy_metrics.json.
 """
+import argparse
 import mlflow
 import shutil
 from pathlib import Path
 import json
+import numpy as np
+
+MODEL_DST = Path('models/ecg_nv_cnn/model_v7.keras')
+META_DST = Path('models/ecg_nv_cnn/meta_v7.json')
+PROFILE_DST = Path('models/ecg_nv_cnn/drift_profile_v7.json')  # baseline de drift de la versión
 
-# Configurar MLflow
-mlflow.set_tracking_uri('file:./mlruns')
+# Gate de latencia/memoria frente al modelo en producción
+BENCH_BATCH_SIZES = (1, 64, 256)
+BENCH_REPEATS = 60
+BENCH_ROUNDS = 3                # rondas alternadas candidato/producción en procesos nuevos
+MAX_LATENCY_REGRESSION = 0.20   # p90 del candidato <= p90 de producción x 1.20 (por tamaño de batch)
+MAX_RSS_REGRESSION = 0.20       # RSS pico del candidato <= el de producción x 1.20
+# Se compara la mediana entre rondas del p90 de cada ronda: con dos copias del mismo .keras
+# (3 rondas x 60 repeticiones, 1 núcleo) difirió <= 4.5%, frente a ~9% del p99 y ~19% de
+# la mejor ronda. El p99 de 60 muestras es prácticamente el máximo y no se usa para el gate.
 
-# Buscar experimento
-exp = mlflow.get_experiment_by_name('deteccion_arritmias_ecg')
-if not exp:
-    print('❌ No hay experimentos registrados')
-    print('💡 Ejecuta primero: python deteccionarritmias.py')
-    exit(1)
+METRIC_KEYS = {
+    'f1_v': 'metrics.test_f1_V',
+    'accuracy': 'metrics.test_accuracy',
+    'precision_v': 'metrics.test_precision_V',
+    'recall_v': 'metrics.test_recall_V',
+}
 
-# Buscar mejor modelo por F1-Score de clase V
-runs = mlflow.search_runs(
-    experiment_ids=[exp.experiment_id],
-    order_by=['metrics.test_f1_V DESC'],
-    max_results=1
-)
 
-if runs.empty:
-    print('❌ No hay runs registrados')
-    exit(1)
+def production_metrics():
+    """Métricas del run de MLflow del modelo en producción (`mlflow_run_id` de meta_v7.json)."""
+    if not META_DST.exists():
+        return None, None
+    run_id = json.loads(META_DST.read_text()).get('mlflow_run_id')
+    if not run_id:
+        return None, None
+    try:
+        metrics = mlflow.get_run(run_id).data.metrics
+    except Exception:
+        return run_id, None
+    return run_id, {key: metrics.get(col.split('.', 1)[1]) for key, col in METRIC_KEYS.items()}
 
-best_run = runs.iloc[0]
 
-# Mostrar métricas
-print('✅ Mejor modelo encontrado:')
-print(f'   Run ID: {best_run["run_id"]}')
-print(f'   F1-Score V: {best_run["metrics.test_f1_V"]:.4f}')
-print(f'   Accuracy: {best_run["metrics.test_accuracy"]:.4f}')
-print(f'   Precision V: {best_run["metrics.test_precision_V"]:.4f}')
-print(f'   Recall V: {best_run["metrics.test_recall_V"]:.4f}')
+def _round_stats(results: list) -> dict:
+    """
+    Mediana entre rondas de cada métrica y ruido de la medición: desviación
+    absoluta mediana entre rondas del p90, relativa a su mediana.
+    """
+    stats = {'rss_peak_mb': float(np.median([r['rss_peak_mb'] for r in results])), 'batches': {}}
+    for bs in BENCH_BATCH_SIZES:
+        row = {key: float(np.median([r['batches'][bs][key] for r in results]))
+               for key in ('p50_ms', 'p90_ms', 'p99_ms')}
+        p90 = np.array([r['batches'][bs]['p90_ms'] for r in results])
+        row['noise'] = float(np.median(np.abs(p90 - row['p90_ms'])) / row['p90_ms'])
+        stats['batches'][bs] = row
+    return stats
 
-# Copiar modelo
-model_src = Path(f'mlruns/{exp.experiment_id}/{best_run["run_id"]}/artifacts/models/model_v7.keras')
-model_dst = Path('models/ecg_nv_cnn/model_v7.keras')
 
-model_dst.parent.mkdir(parents=True, exist_ok=True)
+def latency_gate(candidate: Path, production: Path, max_latency_regression: float, max_rss_regression: float) -> dict:
+    """
+    Mide candidato y producción con el mismo workload (BENCH_ROUNDS rondas
+    alternadas) y compara la mediana entre rondas del p90 por tamaño de
+    batch y del RSS pico.
+    
+    Returns:
+        Bloque `latency_gate` de .mlflow_deploy_metrics.json; `status` es
+        'passed', 'failed' (con `violations`) o 'skipped' (sin baseline)
+    """
+    from src.infrastructure.ml.artifact_benchmark import artifact_size, benchmark_in_subprocess, is_lfs_pointer
+    
+    if not production.exists() or is_lfs_pointer(production):
+        return {'status': 'skipped', 'reason': f'sin modelo en producción medible en {production}'}
+    
+    rounds = {'candidate': [], 'production': []}
+    for i in range(BENCH_ROUNDS):
+        for name, path in (('candidate', candidate), ('production', production)):
+            print(f'⏱️  Benchmark {name} ({i + 1}/{BENCH_ROUNDS}): {path}')
+            rounds[name].append(benchmark_in_subprocess(path, batch_sizes=BENCH_BATCH_SIZES, repeats=BENCH_REPEATS))
+    cand, prod = (_round_stats(rounds[name]) for name in ('candidate', 'production'))
+    
+    violations = []
+    p90 = {}
+    noise = {}
+    for bs in BENCH_BATCH_SIZES:
+        c, p = cand['batches'][bs]['p90_ms'], prod['batches'][bs]['p90_ms']
+        p90[bs] = {'candidate': c, 'production': p, 'delta_ms': c - p, 'ratio': c / p if p else None}
+        noise[bs] = max(cand['batches'][bs]['noise'], prod['batches'][bs]['noise'])
+        if c > p * (1 + max_latency_regression):
+            violations.append(f'p90 batch {bs}: {c:.2f} ms vs {p:.2f} ms (límite +{max_latency_regression:.0%})')
+    noisy = [bs for bs in BENCH_BATCH_SIZES if noise[bs] > max_latency_regression / 2]
+    if noisy:
+        print(f"⚠️  Medición ruidosa en batch {noisy} (ruido entre rondas > la mitad del límite): "
+              f"{', '.join(f'{noise[bs]:.0%}' for bs in noisy)}")
+    
+    rss = {'candidate': cand['rss_peak_mb'], 'production': prod['rss_peak_mb'],
+           'delta_mb': cand['rss_peak_mb'] - prod['rss_peak_mb']}
+    if rss['candidate'] > rss['production'] * (1 + max_rss_regression):
+        violations.append(f"RSS pico: {rss['candidate']:.0f} MB vs {rss['production']:.0f} MB "
+                          f"(límite +{max_rss_regression:.0%})")
+    
+    size_c, size_p = artifact_size(candidate) / 1024, artifact_size(production) / 1024
+    return {
+        'status': 'failed' if violations else 'passed',
+        'violations': violations,
+        'batch_sizes': list(BENCH_BATCH_SIZES),
+        'rounds': BENCH_ROUNDS,
+        'repeats': BENCH_REPEATS,
+        'max_latency_regression': max_latency_regression,
+        'max_rss_regression': max_rss_regression,
+        'p90_ms': p90,
+        'noise': noise,
+        'p50_ms': {bs: {'candidate': cand['batches'][bs]['p50_ms'], 'production': prod['batches'][bs]['p50_ms']}
+                   for bs in BENCH_BATCH_SIZES},
+        'p99_ms': {bs: {'candidate': cand['batches'][bs]['p99_ms'], 'production': prod['batches'][bs]['p99_ms']}
+                   for bs in BENCH_BATCH_SIZES},
+        'rss_peak_mb': rss,
+        'size_kb': {'candidate': size_c, 'production': size_p, 'delta_kb': size_c - size_p},
+    }
 
-if model_src.exists():
-    shutil.copy(model_src, model_dst)
-    print(f'✅ Modelo copiado a {model_dst}')
-else:
-    print(f'❌ Modelo no encontrado en {model_src}')
-    exit(1)
 
-# Guardar métricas para el commit
-metrics_info = {
-    'run_id': best_run["run_id"],
-    'f1_v': float(best_run["metrics.test_f1_V"]),
-    'accuracy': float(best_run["metrics.test_accuracy"]),
-    'precision_v': float(best_run["metrics.test_precision_V"]),
-    'recall_v': float(best_run["metrics.test_recall_V"])
-}
+def main():
+    parser = argparse.ArgumentParser(description='Promueve el mejor run de MLflow a producción')
+    parser.add_argument('--max-latency-regression', type=float, default=MAX_LATENCY_REGRESSION,
+                        help='Aumento relativo máximo del p90 por batch (default: 0.20)')
+    parser.add_argument('--max-rss-regression', type=float, default=MAX_RSS_REGRESSION,
+                        help='Aumento relativo máximo del RSS pico (default: 0.20)')
+    parser.add_argument('--skip-latency-gate', action='store_true', help='Promover sin medir latencia ni memoria')
+    args = parser.parse_args()
+    
+    # Configurar MLflow
+    mlflow.set_tracking_uri('file:./mlruns')
+    
+    # Buscar experimento
+    exp = mlflow.get_experiment_by_name('deteccion_arritmias_ecg')
+    if not exp:
+        print('❌ No hay experimentos registrados')
+        print('💡 Ejecuta primero: python deteccionarritmias.py')
+        exit(1)
+    
+    # Buscar mejor modelo por F1-Score de clase V
+    runs = mlflow.search_runs(
+        experiment_ids=[exp.experiment_id],
+        order_by=['metrics.test_f1_V DESC'],
+        max_results=1
+    )
+    
+    if runs.empty:
+        print('❌ No hay runs registrados')
+        exit(1)
+    
+    best_run = runs.iloc[0]
+    
+    # Mostrar métricas
+    print('✅ Mejor modelo encontrado:')
+    print(f'   Run ID: {best_run["run_id"]}')
+    print(f'   F1-Score V: {best_run["metrics.test_f1_V"]:.4f}')
+    print(f'   Accuracy: {best_run["metrics.test_accuracy"]:.4f}')
+    print(f'   Precision V: {best_run["metrics.test_precision_V"]:.4f}')
+    print(f'   Recall V: {best_run["metrics.test_recall_V"]:.4f}')
+    
+    model_src = Path(f'mlruns/{exp.experiment_id}/{best_run["run_id"]}/artifacts/models/model_v7.keras')
+    if not model_src.exists():
+        print(f'❌ Modelo no encontrado en {model_src}')
+        exit(1)
+    
+    # Métricas del candidato y deltas frente a producción
+    metrics_info = {'run_id': best_run["run_id"]}
+    metrics_info.update({key: float(best_run[col]) for key, col in METRIC_KEYS.items()})
+    prod_run_id, prod_metrics = production_metrics()
+    metrics_info['production_run_id'] = prod_run_id
+    metrics_info['deltas'] = {
+        key: metrics_info[key] - prod_metrics[key]
+        for key in METRIC_KEYS if prod_metrics and prod_metrics.get(key) is not None
+    }
+    
+    # Gate de latencia/memoria (antes de sobrescribir el modelo en producción)
+    if args.skip_latency_gate:
+        gate = {'status': 'skipped', 'reason': '--skip-latency-gate'}
+    else:
+        gate = latency_gate(model_src, MODEL_DST, args.max_latency_regression, args.max_rss_regression)
+    metrics_info['latency_gate'] = gate
+    metrics_info['promoted'] = gate['status'] != 'failed'
+    
+    with open('.mlflow_deploy_metrics.json', 'w') as f:
+        json.dump(metrics_info, f, indent=2)
+    
+    if gate['status'] == 'failed':
+        print('❌ Promoción rechazada por el gate de latencia/memoria:')
+        for violation in gate['violations']:
+            print(f'   - {violation}')
+        exit(1)
+    if gate['status'] == 'skipped':
+        print(f"⚠️  Gate de latencia omitido: {gate['reason']}")
+    else:
+        worst = max(BENCH_BATCH_SIZES, key=lambda bs: gate['p90_ms'][bs]['ratio'])
+        print(f"✅ Gate de latencia aprobado (peor p90: batch {worst}, "
+              f"{gate['p90_ms'][worst]['ratio'] - 1:+.1%} ± {gate['noise'][worst]:.1%}; "
+              f"RSS {gate['rss_peak_mb']['delta_mb']:+.0f} MB)")
+    
+    # Copiar modelo
+    MODEL_DST.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(model_src, MODEL_DST)
+    print(f'✅ Modelo copiado a {MODEL_DST}')
+    
+    # Metadatos (umbral, RuleGuard, run de MLflow) y perfil de drift de la misma versión
+    for dst in (META_DST, PROFILE_DST):
+        src = model_src.parent.parent / 'metadata' / dst.name
+        if src.exists():
+            shutil.copy(src, dst)
+            print(f'✅ {dst.name} copiado a {dst}')
+        else:
+            print(f'⚠️  El run no tiene {dst.name} ({src})')
+    
+    print('✅ Métricas guardadas para deployment')
 
-with open('.mlflow_deploy_metrics.json', 'w') as f:
-    json.dump(metrics_info, f, indent=2)
 
-print('✅ Métricas guardadas para deployment')
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,47 @@
 import os
 import json
-from collections import defaultdict, Counter
+import argparse
+from collections import Counter
+from functools import partial
 
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import wfdb
-from scipy.signal import butter, filtfilt
 from sklearn.metrics import (
     confusion_matrix, 
     classification_report, 
     accuracy_score, 
-    precision_recall_fscore_support,
-    precision_recall_curve,
     precision_score,
     recall_score
 )
 from sklearn.model_selection import StratifiedShuffleSplit
-from imblearn.over_sampling import RandomOverSampler
 
 import tensorflow as tf
-from tensorflow.keras import layers, callbacks, optimizers, regularizers, Input, Model
 
 # MLOps: MLflow tracking
 import mlflow
 import mlflow.keras
 from datetime import datetime
 
+from training.dataset_cache import DatasetCache
+from training.input_pipeline import oversampling_plan
+from training.model import (
+    DEFAULT_HPARAMS, build_model, training_callbacks, fit_streaming, configure_runtime, float32_model, EpochTimer
+)
+from training.checkpointing import TrainingCheckpoint
+from training.augmentation import augment_rows
+from training.ecg_dataset import AAMI_MAP, TRAIN_RECORDS, TEST_RECORDS, preprocessing_params, extract_windows
+from training.parallel_extraction import extract_records, check_results, concat_results, extraction_summary
+from training.ruleguard import (
+    RR_LO_GRID, RR_HI_GRID, QRS_GRID, rr_ratio, sweep_grid, select_config, apply_ruleguard, meta_config
+)
+from src.infrastructure.ml.signal_processor import qrs_widths_ms  # mismo ancho QRS que la API
+from training.thresholds import fit_platt, calibrate, select_threshold, decision_meta
+from training.quantization import quantize_and_gate, print_quantization_report, quantization_mlflow_metrics
+from training.distillation import STUDENT_HPARAMS, distill_student, print_distillation_report, distillation_mlflow_metrics
+from training.compression import compress_model, print_compression_report, compression_mlflow_metrics
+from monitoring.reference_profile import build_reference_profile, save_reference_profile, profile_path
+
 # Configurar MLflow
 mlflow.set_tracking_uri("file:./mlruns")  # Almacenamiento local
 mlflow.set_experiment("deteccion_arritmias_ecg")
@@ -41,92 +56,68 @@ HALF = int(0.5*FS)
 WIN  = 2*HALF               # 360 muestras (1 s)
 
 CLASSES = ['N','V']
-AAMI = defaultdict(lambda: 'Q')
-AAMI.update({'N':'N','L':'N','R':'N','e':'N','j':'N', 'V':'V','E':'V'})
 
-TRAIN_RECORDS = [100,101,102,103,104,105,106,107,108,109,
-                 111,112,113,114,115,116,117,118,119,
-                 121,122,123,124]
-TEST_RECORDS  = [200,201,202,203,205,207,208,209,210,
-                 212,213,214,215,217,219,220,221,222,
-                 223,228,230,231,232,233,234]
+# TRAIN_RECORDS / TEST_RECORDS: split fijo de training/ecg_dataset.py
 
 # === Flags de experimento (puedes desactivar cuando quieras) ===
 USE_AUGMENT   = True     # pequeñas perturbaciones (jitter/gain/warp leve)
 USE_RULEGUARD = True     # post-filtro para recortar FP de V
+USE_QUANTIZATION = True  # PTQ TFLite (dynamic range + full int8) con gate de accuracy y latencia
+QUANT_MAX_DROP   = 0.01  # caída máx. de Prec/Rec de V (vs TFLite float) para promover
+QUANT_MAX_LATENCY_DELTA_MS = 0.0  # Δ latencia (vs TFLite float, batch 256) debe ser menor que esto
+USE_DISTILLATION = False # student compacto destilado del modelo v7 (model_v7_student.*, training/distillation.py)
+DISTILL_SEPARABLE = False  # conv depthwise-separable en los bloques 2 y 3 del student
+USE_COMPRESSION = False  # poda por magnitud (+ clustering) del modelo v7 → model_v7_compressed.* (training/compression.py)
+PRUNE_SPARSITY  = 0.5    # sparsity final de la poda (0 = sin poda)
+PRUNE_STRUCTURE = 'unstructured'  # 'unstructured' (pesos) | 'filters' (filtros Conv1D completos: red más chica)
+CLUSTER_WEIGHTS = 0      # centroides por capa del clustering de pesos (0 = sin clustering)
+USE_DATASET_CACHE = True # shards .npy memory-mapped por registro (cache/datasets/<hash>)
+USE_TF_DATA   = True     # oversampling + augmentation al vuelo con tf.data (sin set balanceado en memoria)
+EXTRACT_WORKERS = os.cpu_count()  # procesos para extraer registros (1 = secuencial)
+CHECKPOINT_EVERY = 1     # épocas entre checkpoints reanudables (models/.../checkpoints/<run_id>)
+USE_XLA       = False    # jit_compile=True: paso de entrenamiento compilado con XLA
+USE_MIXED_BF16 = False   # precisión mixta bfloat16 (solo si la CPU tiene BF16 nativo: AVX512-BF16/AMX)
+TF_INTRA_OP_THREADS = 0  # hilos por op de TensorFlow (0 = default de TF: todos los núcleos)
+TF_INTER_OP_THREADS = 0  # ops en paralelo (0 = default de TF)
 RANDOM_SEED   = 42
 np.random.seed(RANDOM_SEED)
 
+# --resume <run_id>: continúa el run de MLflow desde su último checkpoint
+# (parse_known_args: tolera los argumentos que agrega Jupyter/Colab)
+_parser = argparse.ArgumentParser(description='Entrenamiento CNN N vs V')
+_parser.add_argument('--resume', metavar='RUN_ID', default=None, help='run_id de MLflow a reanudar')
+RESUME_RUN_ID = _parser.parse_known_args()[0].resume
+
+# Hilos y precisión antes de ejecutar cualquier op de TensorFlow
+RUNTIME = configure_runtime(TF_INTRA_OP_THREADS, TF_INTER_OP_THREADS, mixed_bf16=USE_MIXED_BF16)
+print(f"Runtime TF: intra_op={RUNTIME['intra_op']} inter_op={RUNTIME['inter_op']} "
+      f"precision={RUNTIME['precision']} xla={USE_XLA}")
+
+# Hiperparámetros del modelo y del entrenamiento (ver training/model.py)
+HPARAMS = dict(DEFAULT_HPARAMS)
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache', 'datasets')
+# Todo lo que cambia las ventanas/etiquetas extraídas entra en el hash de la cache
+PREPROC_PARAMS = preprocessing_params(fs=FS, deriv_idx=DERIV_IDX, classes=CLASSES)
+
 """**Utilidades de señal y dataset**"""
 
-def bandpass(signal, fs=360, low=0.5, high=40.0, order=4):
-    nyq = 0.5*fs
-    b, a = butter(order, [low/nyq, high/nyq], btype='band')
-    return filtfilt(b, a, signal, method="gust")
-
-def robust_z(x, eps=1e-6):
-    # z-score robusto (por ventana)
-    mu  = np.mean(x)
-    std = np.std(x)
-    return (x - mu) / (std + eps)
-
-def extract_windows(record_id, base_path, deriv_idx=0):
-    """
-    Salida:
-      X_sig: (n, WIN)  ventana ECG filtrada y normalizada (z-score)
-      X_rr : (n, 3)    [RR_prev, RR_next, ratio]
-      y    : (n,)      'N' o 'V'
-    """
-    rec = wfdb.rdrecord(os.path.join(base_path, f'{record_id}'))
-    ann = wfdb.rdann   (os.path.join(base_path, f'{record_id}'), 'atr')
-
-    sig = rec.p_signal[:, deriv_idx].astype(np.float32)
-    sig = bandpass(sig, fs=FS, low=0.5, high=40.0, order=4)
-
-    samples = ann.sample
-    symbols = ann.symbol
-    rr_sec = np.diff(samples) / FS
-
-    X_sig, X_rr, y = [], [], []
-    for i, (samp, sym) in enumerate(zip(samples, symbols)):
-        s0, s1 = samp - HALF, samp + HALF
-        if s0 < 0 or s1 > len(sig):  # ventana incompleta
-            continue
-
-        w = sig[s0:s1]
-        w = robust_z(w)
-
-        rr_prev = rr_sec[i-1] if 0 <= i-1 < len(rr_sec) else np.nan
-        rr_next = rr_sec[i]   if i < len(rr_sec)      else np.nan
-        if np.isnan(rr_prev) or np.isnan(rr_next):
-            continue
-        ratio = rr_next / (rr_prev + 1e-6)
-
-        cls = AAMI[sym]
-        if cls in CLASSES:
-            X_sig.append(w); X_rr.append([rr_prev, rr_next, ratio]); y.append(cls)
-
-    if not X_sig:
-        return (np.empty((0, WIN), np.float32),
-                np.empty((0, 3),  np.float32),
-                np.array([]))
-    return (np.stack(X_sig).astype(np.float32),
-            np.stack(X_rr).astype(np.float32),
-            np.array(y))
+EXTRACTION_RESULTS = []  # RecordResult por registro extraído (train + test)
 
 def build_dataset(records, base_path, deriv_idx):
-    Xs, Xr, ys = [], [], []
-    for rid in records:
-        X_sig, X_rr, y = extract_windows(rid, base_path, deriv_idx)
-        if X_sig.shape[0]==0:
-            print(f'[ADVERTENCIA] Record {rid} sin ventanas válidas (deriv_idx={deriv_idx}).')
-            continue
-        Xs.append(X_sig); Xr.append(X_rr); ys.append(y)
-    if not Xs:
-        return (np.empty((0, WIN), np.float32),
-                np.empty((0, 3),  np.float32),
-                np.array([]))
-    return (np.concatenate(Xs), np.concatenate(Xr), np.concatenate(ys))
+    # Extracción en paralelo por registro; el orden del resultado sigue a `records`
+    extract_fn = partial(extract_windows, base_path=base_path, deriv_idx=deriv_idx,
+                         fs=FS, classes=CLASSES, aami=AAMI_MAP)
+    if USE_DATASET_CACHE:
+        cache = DatasetCache(CACHE_DIR, {**PREPROC_PARAMS, 'deriv_idx': deriv_idx})
+        data = cache.load_dataset(records, extract_fn, workers=EXTRACT_WORKERS)
+        results = cache.extraction_results
+    else:
+        results = extract_records(records, extract_fn, workers=EXTRACT_WORKERS)
+        data = concat_results(results, WIN)
+    check_results(results)
+    EXTRACTION_RESULTS.extend(results)
+    return data
 
 # Construir train/test
 Xtr_sig, Xtr_rr, ytr = build_dataset(TRAIN_RECORDS, BASE_PATH, DERIV_IDX)
@@ -143,7 +134,6 @@ ytr_bin = (ytr == 'V').astype(np.int32)
 yte_bin = (yte == 'V').astype(np.int32)
 
 # Expandir canal para la CNN
-Xtr_sig_cnn = np.expand_dims(Xtr_sig, -1).astype(np.float32)
 Xte_sig_cnn = np.expand_dims(Xte_sig, -1).astype(np.float32)
 
 # Definir objetivos de umbral (necesario antes de MLflow)
@@ -151,8 +141,13 @@ TARGET_PREC = 0.83
 TARGET_REC  = 0.85
 
 # ==================== MLOps: Iniciar experimento MLflow ====================
-run_name = f"CNN_v7_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-mlflow.start_run(run_name=run_name)
+if RESUME_RUN_ID:
+    # Mismo run: las métricas por época siguen desde el checkpoint
+    mlflow.start_run(run_id=RESUME_RUN_ID)
+    run_name = mlflow.active_run().info.run_name
+else:
+    run_name = f"CNN_v7_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    mlflow.start_run(run_name=run_name)
 
 print(f"\n🚀 MLflow Run iniciado: {run_name}")
 print(f"   Run ID: {mlflow.active_run().info.run_id}")
@@ -163,17 +158,24 @@ mlflow.log_params({
     "fs": FS,
     "win": WIN,
     "use_augment": USE_AUGMENT,
+    "input_pipeline": "tf.data" if USE_TF_DATA else "materialized",
     "use_ruleguard": USE_RULEGUARD,
     "random_seed": RANDOM_SEED,
-    "focal_gamma": 2.0,
-    "focal_alpha": 0.35,
+    "focal_gamma": HPARAMS['focal_gamma'],
+    "focal_alpha": HPARAMS['focal_alpha'],
     "target_prec": TARGET_PREC,
     "target_rec": TARGET_REC,
-    "batch_size": 256,
-    "epochs_max": 30,
-    "lr_initial": 1e-3,
-    "dropout_rate": 0.35,
-    "l2_regularization": 1e-4
+    "batch_size": HPARAMS['batch_size'],
+    "epochs_max": HPARAMS['epochs'],
+    "lr_initial": HPARAMS['learning_rate'],
+    "dropout_rate": HPARAMS['dropout_rate'],
+    "l2_regularization": HPARAMS['l2_reg'],
+    "conv_filters": f"{HPARAMS['conv1_filters']}-{HPARAMS['conv2_filters']}-{HPARAMS['conv3_filters']}",
+    "dense_units": HPARAMS['dense_units'],
+    "xla": USE_XLA,
+    "precision": RUNTIME['precision'],
+    "tf_intra_op_threads": RUNTIME['intra_op'],
+    "tf_inter_op_threads": RUNTIME['inter_op']
 })
 
 # Log de distribución de datos
@@ -185,163 +187,153 @@ mlflow.log_metrics({
     "test_V_samples": int((yte == 'V').sum()),
     "test_N_samples": int((yte == 'N').sum())
 })
+if EXTRACTION_RESULTS:
+    mlflow.log_metrics(extraction_summary(EXTRACTION_RESULTS))
+    mlflow.log_dict({'records': [r.to_dict() for r in EXTRACTION_RESULTS]}, "data/extraction_report.json")
 
 # Data augmentation (opcional) y oversampling real (sin SMOTE)
 rng = np.random.default_rng(RANDOM_SEED)
 
-def augment_block(w, fs=FS):
-    # Pequeñas perturbaciones que no rompen morfología
-    if not USE_AUGMENT:
-        return w
-    x = w.copy()
-    # 1) jitter gaussiano leve
-    x += rng.normal(0, 0.01, size=x.shape).astype(np.float32)
-    # 2) gain leve (±5%)
-    x = (1.0 + rng.uniform(-0.05, 0.05)) * x
-    # 3) time-warp ligero (re-sample local)  — muy suave
-    # evitamos librerías externas; hacemos un warp lineal simple 0.98–1.02
-    scale = rng.uniform(0.98, 1.02)
-    idx = np.clip((np.arange(len(x)) * scale).round().astype(int), 0, len(x)-1)
-    x = x[idx]
-    if len(x) < len(w):
-        x = np.pad(x, (0, len(w)-len(x)), mode='edge')
-    elif len(x) > len(w):
-        x = x[:len(w)]
-    return robust_z(x)
-
-# Construir índices balanceados por oversampling de V (reales)
-idx_V = np.where(ytr_bin==1)[0]
-idx_N = np.where(ytr_bin==0)[0]
-ratio = max(1, int(len(idx_N)/max(1,len(idx_V))) - 1)  # cuántas veces replicar V
-idx_bal = np.concatenate([idx_N, np.tile(idx_V, ratio)])
-rng.shuffle(idx_bal)
-
-# Aplicar augmentation SOLO a una fracción de V replicados
-Xtr_sig_bal = Xtr_sig_cnn[idx_bal].copy()
-Xtr_rr_bal  = Xtr_rr[idx_bal].astype(np.float32).copy()
-ytr_bin_bal = ytr_bin[idx_bal].astype(np.int32).copy()
-
-if USE_AUGMENT:
-    # detecta qué muestras son V en el set balanceado
-    mask_V = (ytr_bin_bal==1)
-    V_idx = np.where(mask_V)[0]
-    # aplica augment a ~50% de V balanceados
-    take = rng.choice(V_idx, size=int(0.5*len(V_idx)), replace=False)
-    for i in take:
-        Xtr_sig_bal[i,:,0] = augment_block(Xtr_sig_bal[i,:,0])
-
-print("Distribución balanceada:", Counter(ytr_bin_bal))
-print("Shapes:", Xtr_sig_bal.shape, Xtr_rr_bal.shape, Xte_sig_cnn.shape)
-
-# Log datos balanceados
-mlflow.log_metrics({
-    "train_V_balanced": int((ytr_bin_bal == 1).sum()),
-    "train_N_balanced": int((ytr_bin_bal == 0).sum()),
-    "balance_ratio": float((ytr_bin_bal == 1).sum() / (ytr_bin_bal == 0).sum())
-})
+# Hold-out del TRAIN ORIGINAL (sin oversampling) ~15%: validación del
+# entrenamiento con tf.data y selección de umbral/Platt en [C09]
+sss = StratifiedShuffleSplit(n_splits=1, test_size=0.15, random_state=RANDOM_SEED)
+tr_idx, val_idx = next(sss.split(Xtr_sig, ytr_bin))
+Xval_sig = np.expand_dims(Xtr_sig[val_idx], -1).astype(np.float32)
+Xval_rr  = Xtr_rr[val_idx].astype(np.float32)
+yval     = ytr_bin[val_idx].astype(np.int32)
+
+if USE_TF_DATA:
+    # V sobremuestreado por batch a la misma fracción que el set balanceado
+    # (N + V replicado `ratio` veces); las ventanas se leen por batch del
+    # memmap de train y se augmentan en el pipeline (se arma en [C08])
+    pos_frac, epoch_samples = oversampling_plan(ytr_bin[tr_idx])
+    print(f"Pipeline tf.data: {epoch_samples // HPARAMS['batch_size']} batches/época | fracción V={pos_frac:.3f}")
+    
+    # Log datos balanceados (esperados por época)
+    mlflow.log_metrics({
+        "train_V_balanced": int(epoch_samples * pos_frac),
+        "train_N_balanced": int(epoch_samples * (1.0 - pos_frac)),
+        "balance_ratio": float(pos_frac / (1.0 - pos_frac))
+    })
+else:
+    Xtr_sig_cnn = np.expand_dims(Xtr_sig, -1).astype(np.float32)
+    
+    # Construir índices balanceados por oversampling de V (reales)
+    idx_V = np.where(ytr_bin==1)[0]
+    idx_N = np.where(ytr_bin==0)[0]
+    ratio = max(1, int(len(idx_N)/max(1,len(idx_V))) - 1)  # cuántas veces replicar V
+    idx_bal = np.concatenate([idx_N, np.tile(idx_V, ratio)])
+    rng.shuffle(idx_bal)
+    
+    # Aplicar augmentation SOLO a una fracción de V replicados
+    Xtr_sig_bal = Xtr_sig_cnn[idx_bal].copy()
+    Xtr_rr_bal  = Xtr_rr[idx_bal].astype(np.float32).copy()
+    ytr_bin_bal = ytr_bin[idx_bal].astype(np.int32).copy()
+    
+    if USE_AUGMENT:
+        # detecta qué muestras son V en el set balanceado
+        mask_V = (ytr_bin_bal==1)
+        V_idx = np.where(mask_V)[0]
+        # aplica augment a ~50% de V balanceados
+        take = rng.choice(V_idx, size=int(0.5*len(V_idx)), replace=False)
+        # jitter/gain/warp leve + z-score, por bloques (training/augmentation.py)
+        augment_rows(Xtr_sig_bal[:, :, 0], take, seed=RANDOM_SEED)
+    
+    print("Distribución balanceada:", Counter(ytr_bin_bal))
+    print("Shapes:", Xtr_sig_bal.shape, Xtr_rr_bal.shape, Xte_sig_cnn.shape)
+    
+    # Log datos balanceados
+    mlflow.log_metrics({
+        "train_V_balanced": int((ytr_bin_bal == 1).sum()),
+        "train_N_balanced": int((ytr_bin_bal == 0).sum()),
+        "balance_ratio": float((ytr_bin_bal == 1).sum() / (ytr_bin_bal == 0).sum())
+    })
 
-# [C06] Modelo CNN-1D (señal + RR)
+# [C06] Modelo CNN-1D (señal + RR) — arquitectura en training/model.py
 tf.keras.backend.clear_session()
-
-inp_sig = Input(shape=(WIN, 1), name='sig')
-x = layers.Conv1D(32, 7, padding='same', activation='relu')(inp_sig)
-x = layers.MaxPooling1D(2)(x)
-x = layers.Conv1D(64, 5, padding='same', activation='relu')(x)
-x = layers.MaxPooling1D(2)(x)
-x = layers.Conv1D(128, 3, padding='same', activation='relu')(x)
-x = layers.GlobalAveragePooling1D()(x)
-
-inp_rr = Input(shape=(3,), name='rr')
-y = layers.Dense(16, activation='relu')(inp_rr)
-
-z = layers.Concatenate()([x, y])
-# L2 suave ayuda a bajar sobre-confianza (menos FP)
-z = layers.Dense(64, activation='relu', kernel_regularizer=regularizers.l2(1e-4))(z)
-z = layers.Dropout(0.35)(z)
-out = layers.Dense(1, activation='sigmoid')(z)
-
-model = Model(inputs=[inp_sig, inp_rr], outputs=out)
+model = build_model(WIN, HPARAMS, jit_compile=True if USE_XLA else 'auto')
 model.summary()
 
 # [C07] Loss, métricas y callbacks (Focal + PR-AUC)
-def binary_focal_loss(gamma=2.0, alpha=0.35):
-    import tensorflow as tf
-    def loss(y_true, y_pred):
-        y_true = tf.cast(y_true, tf.float32)
-        y_pred = tf.clip_by_value(y_pred, 1e-7, 1-1e-7)
-        pt = tf.where(tf.equal(y_true, 1), y_pred, 1-y_pred)
-        w  = tf.where(tf.equal(y_true, 1), alpha, 1-alpha)
-        return -tf.reduce_mean(w * tf.pow(1-pt, gamma) * tf.math.log(pt))
-    return loss
-
-pr_auc = tf.keras.metrics.AUC(curve='PR', name='pr_auc')
-
-model.compile(
-    optimizer=optimizers.Adam(1e-3),
-    loss=binary_focal_loss(gamma=2.0, alpha=0.35),
-    metrics=['accuracy', pr_auc]
-)
-
-cb = [
-    callbacks.ReduceLROnPlateau(monitor='val_pr_auc', factor=0.5, patience=3, verbose=1, mode='max'),
-    callbacks.EarlyStopping(monitor='val_pr_auc', patience=6, restore_best_weights=True, verbose=1, mode='max')
-]
+cb = training_callbacks()
+
+# Métricas por época a MLflow durante el fit (un corte no las pierde)
+epoch_logger = tf.keras.callbacks.LambdaCallback(on_epoch_end=lambda epoch, logs: mlflow.log_metrics({
+    "train_loss": float(logs['loss']),
+    "train_accuracy": float(logs['accuracy']),
+    "train_pr_auc": float(logs['pr_auc']),
+    "val_loss": float(logs['val_loss']),
+    "val_accuracy": float(logs['val_accuracy']),
+    "val_pr_auc": float(logs['val_pr_auc']),
+    "epoch_time_s": float(logs['epoch_time_s'])
+}, step=epoch))
+
+# Checkpoint reanudable (va último: guarda el estado de cb ya actualizado)
+CHECKPOINT_DIR = os.path.join(SAVE_DIR, 'checkpoints', mlflow.active_run().info.run_id)
+checkpointer = TrainingCheckpoint(CHECKPOINT_DIR, callback_list=cb, every=CHECKPOINT_EVERY)
+initial_epoch = checkpointer.restore(model, epochs=HPARAMS['epochs']) if RESUME_RUN_ID else 0
+if RESUME_RUN_ID:
+    print(f"↩️  Reanudando {RESUME_RUN_ID} desde la época {initial_epoch}"
+          if initial_epoch else f"⚠️  {RESUME_RUN_ID} sin checkpoint: entrenando desde cero")
+    mlflow.set_tag("resumed_from_epoch", str(initial_epoch))
+# EpochTimer antes del logger y del checkpoint: ambos leen `epoch_time_s` de los logs
+train_callbacks = cb + [EpochTimer(), epoch_logger, checkpointer]
 
 # [C08] Entrenamiento
-hist = model.fit(
-    x={'sig': Xtr_sig_bal, 'rr': Xtr_rr_bal},
-    y=ytr_bin_bal,
-    validation_split=0.15,
-    epochs=30,
-    batch_size=256,
-    callbacks=cb,
-    verbose=1
-)
-
-# Log métricas de entrenamiento por época
-for epoch in range(len(hist.history['loss'])):
+if USE_TF_DATA:
+    hist = fit_streaming(
+        model, Xtr_sig, Xtr_rr, ytr_bin, tr_idx,
+        validation=({'sig': Xval_sig, 'rr': Xval_rr}, yval),
+        hparams=HPARAMS, augment=USE_AUGMENT, seed=RANDOM_SEED,
+        callback_list=train_callbacks, initial_epoch=initial_epoch, verbose=1
+    )
+else:
+    hist = model.fit(
+        x={'sig': Xtr_sig_bal, 'rr': Xtr_rr_bal},
+        y=ytr_bin_bal,
+        validation_split=0.15,
+        epochs=HPARAMS['epochs'],
+        batch_size=HPARAMS['batch_size'],
+        callbacks=train_callbacks,
+        initial_epoch=initial_epoch,
+        verbose=1
+    )
+
+# Historia completa (épocas previas al checkpoint + las de este fit)
+hist.history = checkpointer.history
+
+# Tiempos por época (la primera incluye el trazado / compilación XLA)
+epoch_times = hist.history.get('epoch_time_s', [])
+if epoch_times:
     mlflow.log_metrics({
-        "train_loss": float(hist.history['loss'][epoch]),
-        "train_accuracy": float(hist.history['accuracy'][epoch]),
-        "train_pr_auc": float(hist.history['pr_auc'][epoch]),
-        "val_loss": float(hist.history['val_loss'][epoch]),
-        "val_accuracy": float(hist.history['val_accuracy'][epoch]),
-        "val_pr_auc": float(hist.history['val_pr_auc'][epoch])
-    }, step=epoch)
+        "epoch_time_first_s": float(epoch_times[0]),
+        "epoch_time_median_s": float(np.median(epoch_times[1:] or epoch_times)),
+        "train_time_s": float(np.sum(epoch_times))
+    })
+    print(f"⏱️  Época: primera {epoch_times[0]:.1f} s | mediana {np.median(epoch_times[1:] or epoch_times):.1f} s")
+
+# Inferencia y exportación en float32 (con precisión mixta el cómputo era bfloat16).
+# La política global vuelve a float32: el student ([C14]) y los modelos podados por
+# filtros ([C15]) se construyen de cero y se exportan directamente a TFLite
+model = float32_model(model)
+tf.keras.mixed_precision.set_global_policy('float32')
 
 # [C09] Selección de umbral en distribución real + (opcional) Platt
-# hold-out del TRAIN ORIGINAL (sin SMOTE/oversampling) ~15%
-sss = StratifiedShuffleSplit(n_splits=1, test_size=0.15, random_state=RANDOM_SEED)
-for tr_idx, val_idx in sss.split(Xtr_sig, ytr_bin):
-    Xval_sig = np.expand_dims(Xtr_sig[val_idx], -1).astype(np.float32)
-    Xval_rr  = Xtr_rr[val_idx].astype(np.float32)
-    yval     = ytr_bin[val_idx].astype(np.int32)
+# hold-out del TRAIN ORIGINAL (sin SMOTE/oversampling) ~15%: Xval_*/yval de [C05]
 
 # Probabilidades
 proba_val_raw  = model.predict({'sig': Xval_sig, 'rr': Xval_rr}, batch_size=512, verbose=0).ravel()
 proba_test_raw = model.predict({'sig': Xte_sig_cnn, 'rr': Xte_rr}, batch_size=512, verbose=0).ravel()
 
 # Calibración Platt opcional (suele estabilizar el umbral)
-from sklearn.linear_model import LogisticRegression
-platt = LogisticRegression(max_iter=1000)
-platt.fit(proba_val_raw.reshape(-1,1), yval)
-proba_val  = platt.predict_proba(proba_val_raw.reshape(-1,1))[:,1]
-proba_test = platt.predict_proba(proba_test_raw.reshape(-1,1))[:,1]
-
-# Elegir umbral buscando Prec objetivo y buen recall
-prec, rec, thr = precision_recall_curve(yval, proba_val)
-cands_both = [(p, r, t, (2*p*r)/(p+r+1e-9))
-              for t, p, r in zip(thr, prec[1:], rec[1:])
-              if (p >= TARGET_PREC and r >= TARGET_REC)]
-if cands_both:
-    cands_both.sort(key=lambda x: x[3], reverse=True)
-    thr_opt, p_val, r_val = cands_both[0][2], cands_both[0][0], cands_both[0][1]
-    msg = "Cumple metas (Prec y Rec)"
-else:
-    allp = [(p, r, t, (2*p*r)/(p+r+1e-9)) for t,p,r in zip(thr, prec[1:], rec[1:])]
-    allp.sort(key=lambda x: x[3], reverse=True)
-    thr_opt, p_val, r_val = allp[0][2], allp[0][0], allp[0][1]
-    msg = "Mejor F1 posible (no alcanzó ambas metas)"
+platt = fit_platt(proba_val_raw, yval)
+proba_val  = calibrate(platt, proba_val_raw)
+proba_test = calibrate(platt, proba_test_raw)
+
+# Elegir umbral buscando Prec objetivo y buen recall (training/thresholds.py)
+thr_sel = select_threshold(yval, proba_val, TARGET_PREC, TARGET_REC)
+thr_opt, p_val, r_val = thr_sel['threshold'], thr_sel['precision'], thr_sel['recall']
+msg = thr_sel['method']
 
 print(f"[Umbral] thr_opt={thr_opt:.4f} | Prec_val={p_val:.3f} | Rec_val={r_val:.3f} | {msg}")
 
@@ -357,61 +349,44 @@ mlflow.log_param("threshold_selection_method", msg)
 ypred_bin = (proba_test >= thr_opt).astype(np.int32)
 
 # [C10] RuleGuard-V (opcional): recorta FP de V usando RR y "ancho QRS" aproximado
-def qrs_width_ms_from_window(w, fs=FS, center=None, rel_thr=0.5, max_ms=200):
-    L = len(w)
-    if center is None:
-        center = L//2
-    dv = np.abs(np.diff(w, prepend=w[0]))
-    kernel = np.ones(5)/5.0
-    env = np.convolve(dv, kernel, mode='same')
-    peak = np.max(env[max(0,center-20):min(L,center+20)]) + 1e-9
-    thr = rel_thr * peak
-    left = center
-    while left>1 and env[left] > thr:
-        left -= 1
-    right = center
-    while right<L-2 and env[right] > thr:
-        right += 1
-    width_samples = right - left
-    width_ms = 1000.0 * width_samples / fs
-    return min(width_ms, max_ms)
+# Grilla completa evaluada de una vez (training/ruleguard.py); la original era 6x4x5
+RG_RR_LO_GRID  = RR_LO_GRID
+RG_RR_HI_GRID  = RR_HI_GRID
+RG_QRS_GRID    = QRS_GRID
+ruleguard_config = None
 
 if USE_RULEGUARD:
     # Sintoniza umbrales con la validación (misma que C09)
-    Xval_sig_raw = Xval_sig.squeeze(-1)
-    rr_ratio_val = Xval_rr[:,1] / (Xval_rr[:,0] + 1e-6)
-    qrs_val_ms   = np.array([qrs_width_ms_from_window(w) for w in Xval_sig_raw])
+    rr_ratio_val = rr_ratio(Xval_rr)
+    qrs_val_ms   = qrs_widths_ms(Xval_sig, fs=FS)
     yhat_val     = (proba_val >= thr_opt).astype(np.int32)
 
     TARGET_PREC_RG = max(0.85, TARGET_PREC)  # apunta un poco más alto en Prec
-    best = (0.0, (0.90,1.10,110)) # (F1, (rr_lo, rr_hi, qrs_thr))
-    from sklearn.metrics import precision_recall_fscore_support, f1_score
-
-    for rr_lo in np.linspace(0.85, 0.95, 6):
-        for rr_hi in np.linspace(1.05, 1.20, 4):
-            for qrs_thr in [90, 100, 110, 120, 130]:
-                ytmp = yhat_val.copy()
-                mask = (ytmp==1) & (rr_ratio_val>rr_lo) & (rr_ratio_val<rr_hi) & (qrs_val_ms<qrs_thr)
-                ytmp[mask] = 0
-                p,r,f1,_ = precision_recall_fscore_support(yval, ytmp, average='binary', zero_division=0)
-                if p>=TARGET_PREC_RG and f1>best[0]:
-                    best = (f1, (rr_lo, rr_hi, qrs_thr))
-
-    rr_lo, rr_hi, qrs_thr = best[1]
-    print(f"[RuleGuard-V] RR∈({rr_lo:.2f},{rr_hi:.2f}), QRS<{qrs_thr} ms")
+    rg_sweep = sweep_grid(yval, yhat_val, rr_ratio_val, qrs_val_ms,
+                          RG_RR_LO_GRID, RG_RR_HI_GRID, RG_QRS_GRID)
+    rg_best  = select_config(rg_sweep, TARGET_PREC_RG)
+    rr_lo, rr_hi, qrs_thr = rg_best['rr_lo'], rg_best['rr_hi'], rg_best['qrs_thr']
+    ruleguard_config = meta_config(rg_best)
+    print(f"[RuleGuard-V] RR∈({rr_lo:.2f},{rr_hi:.2f}), QRS<{qrs_thr:g} ms "
+          f"| {rg_sweep['f1'].size} combinaciones | F1_val={rg_best['f1']:.3f}")
     
     # Log parámetros de RuleGuard
     mlflow.log_params({
         "ruleguard_rr_lo": float(rr_lo),
         "ruleguard_rr_hi": float(rr_hi),
-        "ruleguard_qrs_thr": int(qrs_thr)
+        "ruleguard_qrs_thr": float(qrs_thr),
+        "ruleguard_grid_size": int(rg_sweep['f1'].size)
     })
-
-    rr_ratio_te = Xte_rr[:,1] / (Xte_rr[:,0] + 1e-6)
-    qrs_te_ms   = np.array([qrs_width_ms_from_window(w) for w in Xte_sig])
-    ypred_rg    = ypred_bin.copy()
-    mask_te     = (ypred_rg==1) & (rr_ratio_te>rr_lo) & (rr_ratio_te<rr_hi) & (qrs_te_ms<qrs_thr)
-    ypred_rg[mask_te] = 0
+    if rg_best['feasible']:
+        mlflow.log_metrics({
+            "ruleguard_f1_val": rg_best['f1'],
+            "ruleguard_precision_val": rg_best['precision'],
+            "ruleguard_recall_val": rg_best['recall']
+        })
+
+    rr_ratio_te = rr_ratio(Xte_rr)
+    qrs_te_ms   = qrs_widths_ms(Xte_sig, fs=FS)
+    ypred_rg    = apply_ruleguard(ypred_bin, rr_ratio_te, qrs_te_ms, rr_lo, rr_hi, qrs_thr)
 else:
     ypred_rg = ypred_bin
 
@@ -489,6 +464,34 @@ print("Guardado:", savedmodel_dir)
 
 history_csv_path = os.path.join(SAVE_DIR, 'history_v7.csv')
 pd.DataFrame(hist.history).to_csv(history_csv_path, index=False)
+
+# Perfil de referencia para drift (monitoring/reference_profile.py): histogramas, cuantiles
+# y probabilidad cruda de train (sin oversampling) y validación, con las features de la API
+def reference_features(X_sig, X_rr, proba):
+    return {
+        'rr_prev': X_rr[:, 0], 'rr_next': X_rr[:, 1], 'rr_ratio': rr_ratio(X_rr),
+        'qrs_width': qrs_widths_ms(X_sig, fs=FS), 'prediction_proba': proba
+    }
+
+PROFILE_CHUNK = 8192  # train se lee por bloques (puede ser un memmap de la cache)
+train_features = []
+for start in range(0, len(tr_idx), PROFILE_CHUNK):
+    sel = np.sort(tr_idx[start:start + PROFILE_CHUNK])
+    sig_chunk = np.asarray(Xtr_sig[sel], dtype=np.float32)
+    rr_chunk = np.asarray(Xtr_rr[sel], dtype=np.float32)
+    proba_chunk = model.predict({'sig': sig_chunk[..., None], 'rr': rr_chunk}, batch_size=512, verbose=0).ravel()
+    train_features.append(reference_features(sig_chunk, rr_chunk, proba_chunk))
+drift_profile = build_reference_profile(
+    {
+        'train': {k: np.concatenate([f[k] for f in train_features]) for k in train_features[0]},
+        'validation': reference_features(Xval_sig, Xval_rr, proba_val_raw)
+    },
+    model_version='model_v7',
+    metadata={'mlflow_run_id': mlflow.active_run().info.run_id}
+)
+drift_profile_path = save_reference_profile(drift_profile, profile_path(SAVE_DIR, 'model_v7'))
+print("Guardado perfil de referencia:", drift_profile_path)
+
 meta = {
     "classes": ["N","V"],
     "fs": FS, "win": WIN, "deriv_idx": DERIV_IDX,
@@ -497,7 +500,10 @@ meta = {
     "inputs": {"sig": [WIN,1], "rr": [3]},
     "augmentation": bool(USE_AUGMENT),
     "ruleguard": bool(USE_RULEGUARD),
+    "ruleguard_config": ruleguard_config,
+    "decision": decision_meta(platt, thr_sel),
     "threshold_note": "thr_opt seleccionado en validación de distribución real + Platt",
+    "drift_profile": drift_profile_path.name,
     "mlflow_run_id": mlflow.active_run().info.run_id,
     "timestamp": datetime.now().isoformat()
 }
@@ -510,6 +516,7 @@ print("Guardado history_v7.csv y meta_v7.json")
 mlflow.log_artifact(keras_path, "models")
 mlflow.log_artifact(history_csv_path, "metrics")
 mlflow.log_artifact(meta_json_path, "metadata")
+mlflow.log_artifact(str(drift_profile_path), "metadata")
 
 # TFLite
 tflite_path = os.path.join(SAVE_DIR, 'model_v7.tflite')
@@ -524,6 +531,107 @@ print("Guardado TFLite:", tflite_path, "tamaño:", tflite_size_kb, "KB")
 mlflow.log_artifact(tflite_path, "models")
 mlflow.log_metric("model_size_kb", tflite_size_kb)
 
+# [C13] Cuantización INT8 post-entrenamiento con gate de accuracy
+if USE_QUANTIZATION:
+    def decide_test(proba_raw):
+        # Misma regla de decisión que el modelo float: Platt + thr_opt + RuleGuard
+        p = calibrate(platt, proba_raw)
+        y = (p >= thr_opt).astype(np.int32)
+        if USE_RULEGUARD:
+            y = apply_ruleguard(y, rr_ratio_te, qrs_te_ms, rr_lo, rr_hi, qrs_thr)
+        return y
+
+    quant = quantize_and_gate(
+        savedmodel_dir, SAVE_DIR,
+        Xtr_sig, Xtr_rr,
+        Xte_sig_cnn, Xte_rr, yte_bin,
+        decide_fn=decide_test,
+        max_metric_drop=QUANT_MAX_DROP,
+        max_latency_delta_ms=QUANT_MAX_LATENCY_DELTA_MS,
+        model_tag='v7',
+        seed=RANDOM_SEED,
+        float_model=tflite_model
+    )
+    print_quantization_report(quant)
+
+    mlflow.log_metrics(quantization_mlflow_metrics(quant))
+    mlflow.log_params({
+        "quant_max_drop": QUANT_MAX_DROP,
+        "quant_max_latency_delta_ms": QUANT_MAX_LATENCY_DELTA_MS,
+        "quant_promoted": quant['promoted'] or 'none'
+    })
+    for path in quant['paths'].values():
+        mlflow.log_artifact(path, "models")
+
+    meta["quantization"] = {
+        "promoted": quant['promoted'],
+        "artifacts": {k: os.path.basename(v) for k, v in quant['paths'].items()},
+        "max_metric_drop": QUANT_MAX_DROP,
+        "max_latency_delta_ms": QUANT_MAX_LATENCY_DELTA_MS,
+        "variants": quant['variants']
+    }
+    with open(meta_json_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    mlflow.log_artifact(meta_json_path, "metadata")
+
+# [C14] Destilación: student compacto para tráfico de alto volumen (opcional)
+if USE_DISTILLATION:
+    kd = distill_student(
+        model, Xtr_sig, Xtr_rr, ytr_bin, tr_idx,
+        validation=({'sig': Xval_sig, 'rr': Xval_rr}, yval),
+        test_data=(Xte_sig, Xte_rr, yte_bin),
+        teacher_tag='v7', teacher_meta=meta, teacher_tflite=tflite_model,
+        hparams={**HPARAMS, **STUDENT_HPARAMS}, separable=DISTILL_SEPARABLE,
+        target_prec=TARGET_PREC, target_rec=TARGET_REC,
+        augment=USE_AUGMENT, seed=RANDOM_SEED, save_dir=SAVE_DIR
+    )
+    print_distillation_report(kd)
+    
+    mlflow.log_metrics(distillation_mlflow_metrics(kd))
+    mlflow.log_params({"distill_separable": DISTILL_SEPARABLE, "distill_student": kd['meta']['distillation']['architecture']})
+    kd['meta']["mlflow_run_id"] = mlflow.active_run().info.run_id
+    with open(kd['paths']['meta'], 'w') as f:
+        json.dump(kd['meta'], f, indent=2)
+    for key in ('keras', 'tflite'):
+        mlflow.log_artifact(kd['paths'][key], "models")
+    mlflow.log_artifact(kd['paths']['meta'], "metadata")
+    
+    meta["student"] = kd['student_block']
+    with open(meta_json_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    mlflow.log_artifact(meta_json_path, "metadata")
+
+# [C15] Compresión: poda por magnitud y clustering de pesos (opcional)
+if USE_COMPRESSION:
+    cmp = compress_model(
+        model, Xtr_sig, Xtr_rr, ytr_bin, tr_idx,
+        validation=({'sig': Xval_sig, 'rr': Xval_rr}, yval),
+        test_data=(Xte_sig, Xte_rr, yte_bin),
+        tag='v7', meta=meta, dense_tflite=tflite_model,
+        prune=PRUNE_SPARSITY > 0, target_sparsity=PRUNE_SPARSITY, structure=PRUNE_STRUCTURE,
+        cluster=CLUSTER_WEIGHTS > 0, n_clusters=CLUSTER_WEIGHTS or 16,
+        hparams={'batch_size': HPARAMS['batch_size'], 'focal_gamma': HPARAMS['focal_gamma'],
+                 'focal_alpha': HPARAMS['focal_alpha']},
+        target_prec=TARGET_PREC, target_rec=TARGET_REC,
+        augment=USE_AUGMENT, seed=RANDOM_SEED, save_dir=SAVE_DIR
+    )
+    print_compression_report(cmp)
+    
+    mlflow.log_metrics(compression_mlflow_metrics(cmp))
+    mlflow.log_params({"prune_sparsity": PRUNE_SPARSITY, "prune_structure": PRUNE_STRUCTURE,
+                       "cluster_weights": CLUSTER_WEIGHTS})
+    cmp['meta']["mlflow_run_id"] = mlflow.active_run().info.run_id
+    with open(cmp['paths']['meta'], 'w') as f:
+        json.dump(cmp['meta'], f, indent=2)
+    for key in ('keras', 'tflite'):
+        mlflow.log_artifact(cmp['paths'][key], "models")
+    mlflow.log_artifact(cmp['paths']['meta'], "metadata")
+    
+    meta["compression"] = cmp['compression_block']
+    with open(meta_json_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    mlflow.log_artifact(meta_json_path, "metadata")
+
 # Finalizar run de MLflow
 mlflow.end_run()
 print(f"\n✅ Experimento MLflow completado")
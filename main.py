@@ -7,10 +7,24 @@ from src.infrastructure.config.settings import settings
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "src.presentation.app:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        log_level="info"
-    )
+    if settings.WORKERS > 1 and not settings.DEBUG:
+        from src.presentation.prefork import PreforkServer
+        PreforkServer(
+            app,
+            host=settings.HOST,
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            heartbeat_interval_s=settings.PREFORK_HEARTBEAT_INTERVAL_S,
+            heartbeat_timeout_s=settings.PREFORK_HEARTBEAT_TIMEOUT_S,
+            boot_timeout_s=settings.PREFORK_BOOT_TIMEOUT_S,
+            graceful_timeout_s=settings.PREFORK_GRACEFUL_TIMEOUT_S,
+            max_requests=settings.PREFORK_MAX_REQUESTS
+        ).run()
+    else:
+        uvicorn.run(
+            "src.presentation.app:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            log_level="info"
+        )
@@ -21,8 +21,23 @@ except ImportError:
 class ECGDriftDetector:
     """Detector de drift para datos ECG"""
     
-    def __init__(self, reference_data_path=None, report_dir="monitoring/reports"):
+    def __init__(
+        self,
+        reference_data_path=None,
+        report_dir="monitoring/reports",
+        psi_threshold=0.2,
+        ks_threshold=0.15,
+        js_threshold=0.2
+    ):
+        """
+        Los umbrales PSI/KS/JS se aplican con un perfil .json como referencia;
+        son los mismos que DRIFT_PSI/KS/JS_THRESHOLD del monitor en streaming.
+        """
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.js_threshold = js_threshold
         self.reference_data = None
+        self.reference_profile = None
         self.report_dir = Path(report_dir)
         self.report_dir.mkdir(parents=True, exist_ok=True)
         
@@ -30,16 +45,29 @@ class ECGDriftDetector:
             self.load_reference_data(reference_data_path)
     
     def load_reference_data(self, path):
-        """Carga datos de referencia (baseline)"""
+        """Carga datos de referencia (baseline): CSV, DataFrame o perfil .json exportado con el modelo"""
+        if isinstance(path, (str, Path)) and Path(path).suffix == '.json':
+            self.load_reference_profile(path)
+            return
         if isinstance(path, (str, Path)):
             self.reference_data = pd.read_csv(path)
         elif isinstance(path, pd.DataFrame):
             self.reference_data = path
         else:
             raise ValueError("path debe ser str, Path o DataFrame")
+        self.reference_profile = None
         
         print(f"✅ Datos de referencia cargados: {len(self.reference_data)} muestras")
     
+    def load_reference_profile(self, path, split='train'):
+        """Carga el perfil de referencia de una versión de modelo (drift_profile_<versión>.json)"""
+        from monitoring.reference_profile import load_reference_profile, profile_sketches
+        profile = load_reference_profile(path)
+        self.reference_profile = profile_sketches(profile, split)
+        self.reference_data = None
+        n = max(sketch.total for sketch in self.reference_profile.values())
+        print(f"✅ Perfil de referencia cargado: {profile['model_version']} ({split}, {n} muestras)")
+    
     def detect_drift(self, current_data, save_report=True):
         """
         Detecta drift entre datos de referencia y actuales
@@ -51,6 +79,9 @@ class ECGDriftDetector:
         Returns:
             dict con resultados de drift
         """
+        if self.reference_profile is not None:
+            return self._detect_drift_profile(current_data)
+        
         if not EVIDENTLY_AVAILABLE:
             raise ImportError("Evidently no está instalado")
         
@@ -116,6 +147,43 @@ class ECGDriftDetector:
         
         return drift_summary
     
+    def _detect_drift_profile(self, current_data):
+        """Drift contra el perfil de referencia (PSI/KS/Jensen-Shannon, sin Evidently)"""
+        from monitoring.streaming_drift import FixedBinSketch, compare_sketches
+        current = {}
+        for col, ref_sketch in self.reference_profile.items():
+            if col in current_data:
+                current[col] = FixedBinSketch(ref_sketch.edges)
+                current[col].update(current_data[col].to_numpy())
+        features = compare_sketches(self.reference_profile, current,
+                                    self.psi_threshold, self.ks_threshold, self.js_threshold)
+        drifted_features = [col for col, scores in features.items() if scores['drift_detected']]
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        drift_summary = {
+            "drift_detected": bool(drifted_features),
+            "drifted_features": drifted_features,
+            "num_drifted_features": len(drifted_features),
+            "timestamp": datetime.now().isoformat(),
+            "reference_size": max(sketch.total for sketch in self.reference_profile.values()),
+            "current_size": len(current_data),
+            "source": "profile",
+            "features": features
+        }
+        
+        summary_path = self.report_dir / f"drift_summary_{timestamp}.json"
+        with open(summary_path, 'w') as f:
+            json.dump(drift_summary, f, indent=2)
+        
+        if drifted_features:
+            print("⚠️  DRIFT DETECTADO!")
+            print(f"   Features afectados: {drifted_features}")
+            self._trigger_alert(drift_summary)
+        else:
+            print("✅ No se detectó drift")
+        
+        return drift_summary
+    
     def _trigger_alert(self, drift_info):
         """Dispara alerta cuando se detecta drift"""
         alert_file = self.report_dir / "drift_alerts.log"
@@ -0,0 +1,92 @@
+"""
+Perfiles de referencia para drift
+Resumen compacto de las features de entrenamiento/validación (histogramas de
+bins fijos, cuantiles y distribución de la probabilidad predicha) que se
+exporta junto a meta_<versión>.json. El detector batch y el monitor en
+streaming lo cargan sin releer ni remuestrear el dataset de entrenamiento.
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from monitoring.streaming_drift import FEATURE_BINS, FixedBinSketch
+
+PROFILE_FORMAT = 1
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def profile_path(model_dir, model_version: str) -> Path:
+    """Ruta del perfil de una versión: drift_profile_v7.json junto a meta_v7.json."""
+    return Path(model_dir) / f"drift_profile_{model_version.replace('model_', '')}.json"
+
+
+def feature_profile(values, edges) -> dict:
+    """Histograma, cuantiles y momentos de una feature (sin NaN; ±inf solo en el histograma)."""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    sketch = FixedBinSketch(edges)
+    sketch.update(values)
+    finite = values[np.isfinite(values)]
+    profile = {**sketch.to_dict(), 'n': sketch.total}
+    if len(finite):
+        profile.update({
+            'quantiles': {f"{q:g}": float(v) for q, v in zip(QUANTILES, np.quantile(finite, QUANTILES))},
+            'mean': float(finite.mean()),
+            'std': float(finite.std()),
+        })
+    return profile
+
+
+def build_reference_profile(
+    splits: Dict[str, Dict[str, np.ndarray]],
+    model_version: str,
+    metadata: Optional[dict] = None
+) -> dict:
+    """
+    Construye el perfil a partir de las features por split.
+    
+    Args:
+        splits: {'train': {'rr_prev': array, ...}, 'validation': {...}}; las
+            features fuera de FEATURE_BINS se ignoran
+        model_version: versión del modelo (ej: 'model_v7')
+        metadata: campos adicionales (ej: run de MLflow)
+    """
+    return {
+        'format': PROFILE_FORMAT,
+        'model_version': model_version,
+        'created_at': datetime.now().isoformat(),
+        'quantile_levels': list(QUANTILES),
+        'splits': {
+            split: {
+                name: feature_profile(values, FEATURE_BINS[name])
+                for name, values in features.items() if name in FEATURE_BINS
+            }
+            for split, features in splits.items()
+        },
+        **(metadata or {}),
+    }
+
+
+def save_reference_profile(profile: dict, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+def load_reference_profile(path) -> dict:
+    with open(path, 'r') as f:
+        profile = json.load(f)
+    if profile.get('format') != PROFILE_FORMAT:
+        raise ValueError(f"Formato de perfil no soportado en {path}: {profile.get('format')}")
+    return profile
+
+
+def profile_sketches(profile: dict, split: str = 'train') -> Dict[str, FixedBinSketch]:
+    """Histogramas de un split del perfil, listos para comparar."""
+    if split not in profile['splits']:
+        raise ValueError(f"El perfil no tiene el split '{split}': {list(profile['splits'])}")
+    return {name: FixedBinSketch.from_dict(data) for name, data in profile['splits'][split].items()}
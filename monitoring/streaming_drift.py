@@ -0,0 +1,287 @@
+"""
+Monitor de drift en streaming
+Actualiza histogramas de bins fijos con las features de cada petición de la API
+(memoria O(1), sin guardar muestras) y, cada cierto tiempo, compara la ventana
+actual con los histogramas de referencia mediante PSI, KS y Jensen-Shannon.
+Las alertas usan el mismo `_trigger_alert` que ECGDriftDetector.
+"""
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+# RR y ancho QRS son múltiplos de 1/fs y los cocientes RR suelen ser fracciones simples
+# (1.0, 0.75...): con bordes redondos caerían justo en el borde y el bin dependería del
+# redondeo (float32 en entrenamiento, float64 en la API, epsilon del cociente).
+# Los desplazamientos lo evitan.
+RR_EDGE_OFFSET = 1e-3   # segundos / cociente
+QRS_EDGE_OFFSET = 1.0   # ms
+
+# Bordes fijos por feature; cada sketch añade un bin de underflow y otro de overflow
+FEATURE_BINS = {
+    'rr_prev': np.linspace(0.0, 3.0, 31) + RR_EDGE_OFFSET,        # segundos, bins de 100 ms
+    'rr_next': np.linspace(0.0, 3.0, 31) + RR_EDGE_OFFSET,
+    'rr_ratio': np.linspace(0.0, 3.0, 31) + RR_EDGE_OFFSET,
+    'qrs_width': np.linspace(0.0, 200.0, 21) + QRS_EDGE_OFFSET,   # ms, bins de 10 ms (satura en 200)
+    'prediction_proba': np.linspace(0.0, 1.0, 21),
+}
+
+EPS = 1e-4  # suavizado de proporciones para PSI
+
+
+class FixedBinSketch:
+    """Histograma de bins fijos con underflow/overflow (memoria constante)."""
+    
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+    
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+    
+    def update(self, values):
+        """Añade valores (escalar o array); NaN se descarta, ±inf cae en under/overflow."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            idx = np.searchsorted(self.edges, values, side='right')
+            self.counts += np.bincount(idx, minlength=len(self.counts))
+    
+    def reset(self):
+        self.counts[:] = 0
+    
+    def proportions(self) -> np.ndarray:
+        total = self.counts.sum()
+        return self.counts / total if total else np.zeros(len(self.counts))
+    
+    def to_dict(self) -> dict:
+        return {'edges': self.edges.tolist(), 'counts': self.counts.tolist()}
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'FixedBinSketch':
+        sketch = cls(data['edges'])
+        sketch.counts = np.asarray(data['counts'], dtype=np.int64)
+        return sketch
+
+
+def psi(reference: np.ndarray, current: np.ndarray) -> float:
+    """Population Stability Index entre dos distribuciones de proporciones."""
+    ref = np.clip(reference, EPS, None)
+    cur = np.clip(current, EPS, None)
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def ks_statistic(reference: np.ndarray, current: np.ndarray) -> float:
+    """Estadístico KS: máxima diferencia entre CDFs (evaluadas en los bordes de los bins)."""
+    return float(np.max(np.abs(np.cumsum(current) - np.cumsum(reference))))
+
+
+def jensen_shannon(reference: np.ndarray, current: np.ndarray) -> float:
+    """Distancia de Jensen-Shannon en base 2 (0 = iguales, 1 = disjuntas)."""
+    mid = (reference + current) / 2.0
+    
+    def kl(p, q):
+        mask = p > 0
+        return np.sum(p[mask] * np.log2(p[mask] / q[mask]))
+    
+    return float(np.sqrt(max(0.5 * kl(reference, mid) + 0.5 * kl(current, mid), 0.0)))
+
+
+def compare_sketches(
+    reference: Dict[str, FixedBinSketch],
+    current: Dict[str, FixedBinSketch],
+    psi_threshold: float = 0.2,
+    ks_threshold: float = 0.15,
+    js_threshold: float = 0.2
+) -> Dict[str, dict]:
+    """
+    PSI, KS y Jensen-Shannon por feature (las presentes en ambos lados y con
+    datos). Una feature tiene drift si supera cualquiera de los umbrales.
+    """
+    features = {}
+    for name, ref_sketch in reference.items():
+        cur_sketch = current.get(name)
+        if cur_sketch is None or cur_sketch.total == 0:
+            continue
+        if not np.array_equal(ref_sketch.edges, cur_sketch.edges):
+            raise ValueError(f"Bins distintos para '{name}' en referencia y ventana actual")
+        ref, cur = ref_sketch.proportions(), cur_sketch.proportions()
+        scores = {
+            'psi': psi(ref, cur),
+            'ks': ks_statistic(ref, cur),
+            'js': jensen_shannon(ref, cur),
+        }
+        scores['drift_detected'] = (scores['psi'] > psi_threshold or
+                                    scores['ks'] > ks_threshold or
+                                    scores['js'] > js_threshold)
+        features[name] = scores
+    return features
+
+
+class StreamingDriftMonitor:
+    """
+    Monitor de drift en proceso para la API.
+    
+    `observe` acumula las features de cada petición en la ventana actual;
+    `check` (periódico, ver `start`) compara la ventana con la referencia y
+    la reinicia. Cada worker de la API monitoriza solo su propio tráfico.
+    Con `model_version` solo se observa el tráfico servido por esa versión
+    (ver `tracks`).
+    """
+    
+    def __init__(
+        self,
+        reference: Dict[str, FixedBinSketch],
+        min_samples: int = 500,
+        psi_threshold: float = 0.2,
+        ks_threshold: float = 0.15,
+        js_threshold: float = 0.2,
+        report_dir="monitoring/reports",
+        model_version: Optional[str] = None
+    ):
+        self.set_reference(reference, model_version)
+        self.min_samples = min_samples
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.js_threshold = js_threshold
+        self.report_dir = report_dir
+        self.observed_total = 0
+        self.last_summary: Optional[dict] = None
+        self._detector = None
+        self._task: Optional[asyncio.Task] = None
+    
+    @classmethod
+    def from_reference_data(cls, data, **kwargs) -> 'StreamingDriftMonitor':
+        """
+        Construye la referencia desde un CSV o DataFrame con las columnas de
+        `create_sample_monitoring_data` (las que falten se ignoran).
+        """
+        if isinstance(data, (str, Path)):
+            import pandas as pd
+            data = pd.read_csv(data)
+        reference = {}
+        for name, edges in FEATURE_BINS.items():
+            if name in data:
+                reference[name] = FixedBinSketch(edges)
+                reference[name].update(data[name].to_numpy())
+        return cls(reference, **kwargs)
+    
+    @classmethod
+    def from_reference_profile(cls, profile, split: str = 'train', **kwargs) -> 'StreamingDriftMonitor':
+        """Construye la referencia desde un perfil exportado con el modelo (ruta o dict)."""
+        from monitoring.reference_profile import load_reference_profile, profile_sketches
+        if isinstance(profile, (str, Path)):
+            profile = load_reference_profile(profile)
+        return cls(profile_sketches(profile, split), **kwargs)
+    
+    def set_reference(self, reference: Dict[str, FixedBinSketch], model_version: Optional[str] = None):
+        """
+        Reemplaza la referencia (p. ej. al cambiar de versión de modelo) y
+        reinicia la ventana. `model_version` es la versión cuyo tráfico se
+        compara con ella (None: todo el tráfico).
+        """
+        reference = {
+            name: sketch for name, sketch in reference.items()
+            if name in FEATURE_BINS and sketch.total > 0
+        }
+        if not reference:
+            raise ValueError(f"La referencia no contiene ninguna feature monitorizable: {list(FEATURE_BINS)}")
+        self.reference = reference
+        self.model_version = model_version
+        self.paused = False
+        self.current = {name: FixedBinSketch(sketch.edges) for name, sketch in reference.items()}
+        self._window_start = datetime.now()
+    
+    @property
+    def window_size(self) -> int:
+        """Latidos acumulados en la ventana actual."""
+        return max((sketch.total for sketch in self.current.values()), default=0)
+    
+    def tracks(self, model_version: Optional[str]) -> bool:
+        """Indica si las predicciones de `model_version` entran en la ventana."""
+        return not self.paused and (self.model_version is None or model_version == self.model_version)
+    
+    def pause(self):
+        """Deja de observar (y vacía la ventana) hasta el próximo `set_reference`."""
+        self.paused = True
+        for sketch in self.current.values():
+            sketch.reset()
+    
+    def observe(self, features: Dict[str, np.ndarray]):
+        """Añade los latidos de una petición (arrays por feature, mismo orden)."""
+        for name, values in features.items():
+            sketch = self.current.get(name)
+            if sketch is not None:
+                sketch.update(values)
+        self.observed_total += len(next(iter(features.values()), ()))
+    
+    def check(self) -> Optional[dict]:
+        """
+        Compara la ventana actual con la referencia. Con menos de
+        `min_samples` latidos no evalúa y sigue acumulando; si evalúa,
+        reinicia la ventana.
+        
+        Returns:
+            Resumen compatible con `ECGDriftDetector.detect_drift` más las
+            métricas por feature, o None si la ventana aún es pequeña
+        """
+        current_size = self.window_size
+        if current_size < max(self.min_samples, 1):
+            return None
+        
+        features = compare_sketches(self.reference, self.current,
+                                    self.psi_threshold, self.ks_threshold, self.js_threshold)
+        drifted = [name for name, scores in features.items() if scores['drift_detected']]
+        
+        summary = {
+            "drift_detected": bool(drifted),
+            "drifted_features": drifted,
+            "num_drifted_features": len(drifted),
+            "timestamp": datetime.now().isoformat(),
+            "window_start": self._window_start.isoformat(),
+            "reference_size": max(sketch.total for sketch in self.reference.values()),
+            "current_size": current_size,
+            "source": "streaming",
+            "features": features,
+        }
+        self.last_summary = summary
+        for sketch in self.current.values():
+            sketch.reset()
+        self._window_start = datetime.now()
+        
+        if drifted:
+            print(f"⚠️  Drift en streaming: {drifted}")
+            self._trigger_alert(summary)
+        return summary
+    
+    def _trigger_alert(self, summary: dict):
+        """Registra la alerta con el mismo mecanismo que el detector batch."""
+        if self._detector is None:
+            from monitoring.drift_detector import ECGDriftDetector
+            self._detector = ECGDriftDetector(report_dir=self.report_dir)
+        self._detector._trigger_alert(summary)
+    
+    def start(self, interval_s: float):
+        """Inicia la tarea que evalúa el drift cada `interval_s` segundos."""
+        if self._task is None and interval_s > 0:
+            self._task = asyncio.create_task(self._run(interval_s))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Warning: Drift check failed: {e}")
@@ -1,28 +1,42 @@
 """
 Optimización de Hiperparámetros con Optuna + MLflow
 Encuentra automáticamente la mejor configuración del modelo
+
+Cada trial entrena el modelo real (training/model.py) con los hiperparámetros
+sugeridos sobre los registros de train, validando en un hold-out
+estratificado (el mismo criterio que deteccionarritmias.py). La PR-AUC de
+validación se reporta por época al MedianPruner, que corta los trials malos.
+
+Los trials corren en N procesos worker (spawn) que comparten el estudio en
+un JournalStorage en disco y leen el mismo split memory-mapped de la cache
+de dataset (una copia en el page cache para todos). Cada worker acota sus
+hilos de TensorFlow para no competir por los núcleos.
 """
 import os
-import sys
+import json
+import multiprocessing
 import optuna
 import mlflow
 import mlflow.keras
 import numpy as np
 import pandas as pd
 from datetime import datetime
-from optuna.integration.mlflow import MLflowCallback
+from functools import partial
+from optuna.trial import TrialState
 
-# Importar funciones del script principal
-# (Asumiendo que deteccionarritmias.py tiene las funciones necesarias)
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'datasets')
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+RESULTS_DIR = "optimization_results"
+RANDOM_SEED = 42
 
-def objective(trial):
-    """
-    Función objetivo para Optuna
-    Define el espacio de búsqueda de hiperparámetros
-    """
-    
-    # Hiperparámetros a optimizar
-    params = {
+# Datos del proceso (cargados una vez por worker)
+_SEARCH_DATA = {}
+
+
+def suggest_hparams(trial):
+    """Espacio de búsqueda (claves de training.model.DEFAULT_HPARAMS)."""
+    return {
         'focal_gamma': trial.suggest_float('focal_gamma', 1.0, 3.0),
         'focal_alpha': trial.suggest_float('focal_alpha', 0.25, 0.45),
         'dropout_rate': trial.suggest_float('dropout_rate', 0.2, 0.5),
@@ -31,79 +45,260 @@ def objective(trial):
         'batch_size': trial.suggest_categorical('batch_size', [128, 256, 512]),
         'conv1_filters': trial.suggest_categorical('conv1_filters', [16, 32, 64]),
         'conv2_filters': trial.suggest_categorical('conv2_filters', [32, 64, 128]),
+        'conv3_filters': trial.suggest_categorical('conv3_filters', [64, 128, 256]),
         'dense_units': trial.suggest_categorical('dense_units', [32, 64, 128])
     }
+
+
+def load_search_data(config):
+    """
+    (X_sig, X_rr, y_bin, train_idx, val_idx) de los registros de búsqueda,
+    desde la cache de dataset (memory-mapped). Los registros que falten se
+    extraen en paralelo; en los workers la cache ya está completa.
+    """
+    if 'data' not in _SEARCH_DATA:
+        from sklearn.model_selection import StratifiedShuffleSplit
+        from training.dataset_cache import DatasetCache
+        from training.ecg_dataset import extract_windows, preprocessing_params
+        
+        cache = DatasetCache(config['cache_dir'], preprocessing_params(fs=config['fs'], deriv_idx=config['deriv_idx']))
+        extract_fn = partial(extract_windows, base_path=config['base_path'],
+                             deriv_idx=config['deriv_idx'], fs=config['fs'])
+        X_sig, X_rr, y = cache.load_dataset(config['records'], extract_fn, workers=config['extract_workers'])
+        if len(y) == 0:
+            raise RuntimeError("No hay datos de búsqueda. Revisa BASE_PATH y los registros")
+        y_bin = (np.asarray(y) == 'V').astype(np.int32)
+        sss = StratifiedShuffleSplit(n_splits=1, test_size=config['val_size'], random_state=config['seed'])
+        train_idx, val_idx = next(sss.split(np.zeros(len(y_bin)), y_bin))
+        _SEARCH_DATA['data'] = (X_sig, X_rr, y_bin, train_idx, val_idx)
+    return _SEARCH_DATA['data']
+
+
+def make_pruning_callback(trial, monitor='val_pr_auc'):
+    """Callback de Keras que reporta `monitor` por época y poda el trial si el pruner lo indica."""
+    import tensorflow as tf
     
-    # Aquí iría el código de entrenamiento usando estos parámetros
-    # Por ahora retornamos un valor simulado
-    # En producción, entrenarías el modelo y retornarías test_f1_V
+    class OptunaPruning(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            value = (logs or {}).get(monitor)
+            if value is None:
+                return
+            trial.report(float(value), step=epoch)
+            if trial.should_prune():
+                raise optuna.TrialPruned(f"Trial {trial.number} podado en la época {epoch}")
     
-    print(f"\n📊 Trial {trial.number} - Params: {params}")
+    return OptunaPruning()
+
+
+def objective(trial, config):
+    """
+    Función objetivo para Optuna
+    Entrena con los hiperparámetros del trial y retorna la mejor PR-AUC de validación
+    """
+    from sklearn.metrics import precision_recall_curve
+    from training.model import train_model
     
-    # SIMULACIÓN - Reemplazar con entrenamiento real
-    # test_f1_V = train_model_with_params(params)
-    test_f1_V = np.random.uniform(0.75, 0.92)  # Simulado
+    params = {**suggest_hparams(trial), 'epochs': config['epochs']}
+    print(f"\n📊 Trial {trial.number} (pid {os.getpid()}) - Params: {params}")
     
-    return test_f1_V
+    X_sig, X_rr, y_bin, train_idx, val_idx = load_search_data(config)
+    model, history, (val_inputs, yval) = train_model(
+        X_sig, X_rr, y_bin, train_idx, val_idx,
+        hparams=params,
+        augment=True,
+        seed=config['seed'],
+        extra_callbacks=[make_pruning_callback(trial)],
+        threads=config['threads'],
+        verbose=0
+    )
+    val_pr_auc = float(np.max(history.history['val_pr_auc']))
+    
+    # F1 de V en validación con el mejor umbral (referencia, no se optimiza)
+    proba = model.predict(val_inputs, batch_size=1024, verbose=0).ravel()
+    prec, rec, _ = precision_recall_curve(yval, proba)
+    trial.set_user_attr('val_f1_V', float(np.max(2 * prec * rec / (prec + rec + 1e-9))))
+    trial.set_user_attr('epochs_trained', len(history.history['val_pr_auc']))
+    
+    return val_pr_auc
+
+
+def make_storage(path):
+    """JournalStorage en archivo: admite varios procesos sobre el mismo estudio."""
+    try:
+        from optuna.storages.journal import JournalFileBackend
+    except ImportError:  # optuna < 4
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(path))
+
 
+def make_pruner():
+    return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=5)
 
-def run_hyperparameter_optimization(n_trials=20):
+
+def mlflow_trial_callback(experiment_name):
+    """
+    Callback que registra cada trial terminado como run de MLflow. Usa el
+    MLflowCallback de optuna si está disponible (optuna >= 4 lo movió a
+    `optuna-integration[mlflow]`); si no, registra params y métrica con mlflow.
+    """
+    mlflow.set_tracking_uri("file:./mlruns")
+    mlflow.set_experiment(experiment_name)
+    try:
+        from optuna.integration.mlflow import MLflowCallback
+        return MLflowCallback(
+            tracking_uri="file:./mlruns",
+            metric_name="val_pr_auc",
+            create_experiment=False
+        )
+    except ImportError:
+        pass
+    
+    def log_trial(study, trial):
+        if trial.state not in (TrialState.COMPLETE, TrialState.PRUNED):
+            return
+        with mlflow.start_run(run_name=str(trial.number)):
+            mlflow.log_params(trial.params)
+            mlflow.set_tags({'study_name': study.study_name, 'trial_state': trial.state.name})
+            if trial.value is not None:
+                mlflow.log_metric("val_pr_auc", trial.value)
+    
+    return log_trial
+
+
+def _run_worker(worker_id, study_name, storage_path, n_trials, config):
+    """Proceso worker: acota hilos de TF y toma trials del estudio compartido hasta completar `n_trials`."""
+    threads = config['threads']
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    from training.model import limit_tf_threads
+    limit_tf_threads(threads, 1)
+    
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=make_storage(storage_path),
+        # Semilla por worker: con la misma, todos propondrían los mismos trials iniciales
+        sampler=optuna.samplers.TPESampler(seed=RANDOM_SEED + worker_id),
+        pruner=make_pruner()
+    )
+    callbacks = [optuna.study.MaxTrialsCallback(
+        n_trials, states=(TrialState.COMPLETE, TrialState.PRUNED, TrialState.RUNNING)
+    )]
+    if config['mlflow']:
+        callbacks.append(mlflow_trial_callback(config['experiment_name']))
+    study.optimize(partial(objective, config=config), n_trials=n_trials, callbacks=callbacks)
+
+
+def run_hyperparameter_optimization(
+    n_trials=20,
+    workers=None,
+    threads_per_worker=None,
+    epochs=30,
+    records=None,
+    study_name=None,
+    use_mlflow=True
+):
     """
     Ejecuta optimización de hiperparámetros con Optuna
     
     Args:
-        n_trials: Número de trials a ejecutar
+        n_trials: Número de trials (en total, entre todos los workers)
+        workers: Procesos que entrenan trials en paralelo (default: núcleos/2)
+        threads_per_worker: Hilos de TF por worker (default: núcleos/workers)
+        epochs: Épocas máximas por trial (EarlyStopping y el pruner cortan antes)
+        records: Registros MIT-BIH de búsqueda (default: TRAIN_RECORDS)
+        study_name: Reanuda un estudio existente con ese nombre
     """
+    from training.ecg_dataset import TRAIN_RECORDS
+    
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores // 2, n_trials))
+    threads = max(1, threads_per_worker or cores // workers)
+    study_name = study_name or f"optuna_study_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    config = {
+        'cache_dir': CACHE_DIR,
+        'base_path': BASE_PATH,
+        'records': list(records or TRAIN_RECORDS),
+        'fs': 360,
+        'deriv_idx': 0,
+        'val_size': 0.15,
+        'seed': RANDOM_SEED,
+        'epochs': epochs,
+        'threads': threads,
+        'extract_workers': cores,
+        'mlflow': use_mlflow,
+        'experiment_name': "hyperparameter_optimization",
+    }
     
     # Configurar MLflow
-    mlflow.set_tracking_uri("file:./mlruns")
-    experiment_name = "hyperparameter_optimization"
-    mlflow.set_experiment(experiment_name)
+    experiment_name = config['experiment_name']
+    if use_mlflow:
+        mlflow.set_tracking_uri("file:./mlruns")
+        mlflow.set_experiment(experiment_name)
     
-    # Callback para integrar con MLflow
-    mlflc = MLflowCallback(
-        tracking_uri="file:./mlruns",
-        metric_name="f1_score",
-        create_experiment=False
-    )
+    # Poblar la cache antes de arrancar los workers: todos leen el mismo split
+    X_sig, _, y_bin, train_idx, val_idx = load_search_data(config)
     
-    # Crear estudio de Optuna
+    # Crear (o reanudar) estudio de Optuna en almacenamiento compartido
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    storage_path = os.path.join(RESULTS_DIR, f"{study_name}.journal")
     study = optuna.create_study(
-        study_name=f"optuna_study_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-        direction="maximize",  # Maximizar F1 score
-        sampler=optuna.samplers.TPESampler(seed=42),
-        pruner=optuna.pruners.MedianPruner(n_startup_trials=5)
+        study_name=study_name,
+        storage=make_storage(storage_path),
+        direction="maximize",  # Maximizar PR-AUC de validación
+        sampler=optuna.samplers.TPESampler(seed=RANDOM_SEED),
+        pruner=make_pruner(),
+        load_if_exists=True
     )
     
     print(f"🔬 Iniciando optimización de hiperparámetros")
     print(f"   Experimento: {experiment_name}")
-    print(f"   Trials: {n_trials}")
-    print(f"   Objetivo: Maximizar F1 Score (clase V)")
+    print(f"   Estudio: {study_name} ({storage_path})")
+    print(f"   Trials: {n_trials} | Workers: {workers} x {threads} hilos TF")
+    print(f"   Datos: {len(train_idx)} train / {len(val_idx)} val ({int(y_bin.sum())} V)")
+    print(f"   Objetivo: Maximizar PR-AUC de validación (clase V)")
     print()
     
     # Optimizar
-    study.optimize(
-        objective,
-        n_trials=n_trials,
-        callbacks=[mlflc],
-        show_progress_bar=True
-    )
+    if workers == 1:
+        _run_worker(0, study_name, storage_path, n_trials, config)
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        procs = [
+            ctx.Process(target=_run_worker, args=(i, study_name, storage_path, n_trials, config), daemon=False)
+            for i in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        failed = [p.exitcode for p in procs if p.exitcode != 0]
+        if failed:
+            print(f"⚠️  {len(failed)} worker(s) terminaron con error (códigos {failed})")
+    
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage_path))
+    states = pd.Series([t.state.name for t in study.trials]).value_counts().to_dict()
     
     # Resultados
     print("\n" + "="*80)
     print("✅ OPTIMIZACIÓN COMPLETADA")
     print("="*80)
+    print(f"   Trials: {states}")
+    
+    if not any(t.state == TrialState.COMPLETE for t in study.trials):
+        print("❌ Ningún trial completó; no hay mejores hiperparámetros")
+        return study
     
     print(f"\n🏆 Mejores hiperparámetros:")
     for key, value in study.best_params.items():
         print(f"   {key}: {value}")
     
-    print(f"\n📊 Mejor F1 Score: {study.best_value:.4f}")
+    print(f"\n📊 Mejor PR-AUC (val): {study.best_value:.4f}")
+    print(f"   F1 V (val): {study.best_trial.user_attrs.get('val_f1_V', float('nan')):.4f}")
     print(f"   Trial número: {study.best_trial.number}")
     
     # Guardar resultados
-    results_dir = "optimization_results"
-    os.makedirs(results_dir, exist_ok=True)
+    results_dir = RESULTS_DIR
     
     # DataFrame con todos los trials
     df = study.trials_dataframe()
@@ -111,9 +306,8 @@ def run_hyperparameter_optimization(n_trials=20):
     df.to_csv(f"{results_dir}/optuna_trials_{timestamp}.csv", index=False)
     
     # Guardar mejores parámetros
-    import json
     with open(f"{results_dir}/best_params_{timestamp}.json", 'w') as f:
-        json.dump(study.best_params, f, indent=2)
+        json.dump({**study.best_params, 'epochs': epochs}, f, indent=2)
     
     print(f"\n💾 Resultados guardados en: {results_dir}/")
     
@@ -133,8 +327,12 @@ def run_hyperparameter_optimization(n_trials=20):
         fig = vis.plot_parallel_coordinate(study)
         fig.write_html(f"{results_dir}/parallel_coordinate_{timestamp}.html")
         
-        print(f"📈 Visualizaciones guardadas en: {results_dir}/")
+        # Curvas de PR-AUC por época (muestra qué trials podó el pruner)
+        fig = vis.plot_intermediate_values(study)
+        fig.write_html(f"{results_dir}/intermediate_values_{timestamp}.html")
         
+        print(f"📈 Visualizaciones guardadas en: {results_dir}/")
+    
     except Exception as e:
         print(f"⚠️  Error generando visualizaciones: {e}")
     
@@ -146,15 +344,29 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description='Optimización de hiperparámetros con Optuna')
     parser.add_argument('--trials', type=int, default=20, help='Número de trials (default: 20)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos en paralelo (default: núcleos/2)')
+    parser.add_argument('--threads-per-worker', type=int, default=None, help='Hilos de TF por worker (default: núcleos/workers)')
+    parser.add_argument('--epochs', type=int, default=30, help='Épocas máximas por trial (default: 30)')
+    parser.add_argument('--records', type=int, nargs='*', default=None, help='Registros de búsqueda (default: TRAIN_RECORDS)')
+    parser.add_argument('--study-name', default=None, help='Reanudar un estudio existente')
+    parser.add_argument('--no-mlflow', action='store_true', help='No registrar cada trial en MLflow')
     args = parser.parse_args()
     
-    study = run_hyperparameter_optimization(n_trials=args.trials)
+    study = run_hyperparameter_optimization(
+        n_trials=args.trials,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        epochs=args.epochs,
+        records=args.records,
+        study_name=args.study_name,
+        use_mlflow=not args.no_mlflow
+    )
     
     print("\n" + "="*80)
     print("🎯 PRÓXIMOS PASOS:")
     print("="*80)
     print("1. Revisa los resultados en: optimization_results/")
-    print("2. Actualiza deteccionarritmias.py con los mejores parámetros")
+    print("2. Actualiza HPARAMS en deteccionarritmias.py con los mejores parámetros")
     print("3. Entrena el modelo final")
     print("4. Visualiza en MLflow UI: mlflow ui")
     print()
@@ -14,6 +14,7 @@ class PredictionRequestDTO:
     derivation: str = "MLII"
     patient_id: Optional[str] = None
     apply_ruleguard: bool = True
+    model_variant: Optional[str] = None  # 'teacher' | 'student' | 'auto' (None = 'auto')
 
 
 @dataclass
@@ -24,12 +24,14 @@ class PredictArrhythmiaUseCase:
         prediction_repository: IPredictionRepository,
         model_repository: IModelRepository,
         signal_processor,  # Inyectamos el procesador de señales
-        predictor_service  # Inyectamos el servicio de predicción
+        predictor_service,  # Inyectamos el servicio de predicción
+        drift_monitor=None  # Monitor de drift en streaming (opcional)
     ):
         self.prediction_repository = prediction_repository
         self.model_repository = model_repository
         self.signal_processor = signal_processor
         self.predictor_service = predictor_service
+        self.drift_monitor = drift_monitor
     
     async def execute(self, request: PredictionRequestDTO) -> PredictionResponseDTO:
         """
@@ -47,6 +49,11 @@ class PredictArrhythmiaUseCase:
         """
         start_time = time.time()
         
+        # La petición cuenta como carga desde que entra (para el ruteo 'auto')
+        with self.predictor_service.track_request():
+            return await self._execute(request, start_time)
+    
+    async def _execute(self, request: PredictionRequestDTO, start_time: float) -> PredictionResponseDTO:
         try:
             # 1. Crear entidad de dominio ECGSignal
             signal_array = np.array(request.signal_data, dtype=np.float32)
@@ -71,9 +78,14 @@ class PredictArrhythmiaUseCase:
             # 4. Realizar predicción con el modelo
             predictions = await self.predictor_service.predict(
                 processed_data,
-                apply_ruleguard=request.apply_ruleguard
+                apply_ruleguard=request.apply_ruleguard,
+                model_variant=request.model_variant
             )
             
+            # Solo el tráfico de la versión de referencia (no el student ni otros alias)
+            if self.drift_monitor is not None and self.drift_monitor.tracks(predictions.model_version):
+                self._observe_drift(processed_data, predictions)
+            
             # 5. Crear entidad de predicción
             beat_predictions_dto = []
             normal_count = 0
@@ -109,7 +121,9 @@ class PredictArrhythmiaUseCase:
                     'total_beats': len(beat_predictions_dto),
                     'normal_beats': normal_count,
                     'ventricular_beats': ventricular_count,
-                    'ruleguard_applied': request.apply_ruleguard
+                    'ruleguard_applied': request.apply_ruleguard,
+                    'model_version': predictions.model_version,
+                    'model_variant': predictions.model_variant
                 }
             )
             
@@ -140,3 +154,15 @@ class PredictArrhythmiaUseCase:
             raise
         except Exception as e:
             raise PredictionError(f"Failed to predict arrhythmia: {str(e)}")
+    
+    def _observe_drift(self, processed_data, predictions):
+        """Pasa las features de los latidos de la petición al monitor de drift."""
+        rr = np.array([r.to_features() for r in processed_data.rr_intervals], dtype=np.float64)
+        windows = np.stack([w.data for w in processed_data.windows])
+        self.drift_monitor.observe({
+            'rr_prev': rr[:, 0],
+            'rr_next': rr[:, 1],
+            'rr_ratio': rr[:, 2],
+            'qrs_width': self.signal_processor.estimate_qrs_widths(windows),
+            'prediction_proba': np.array([b['confidence'] for b in predictions.beat_predictions])
+        })
@@ -25,3 +25,8 @@ class IModelRepository(ABC):
     def is_model_loaded(self, model_name: str) -> bool:
         """Verifica si el modelo está cargado en memoria."""
         pass
+
+    @abstractmethod
+    def unload_model(self, model_name: str) -> bool:
+        """Libera un modelo de la memoria."""
+        pass
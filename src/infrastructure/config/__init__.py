@@ -1,6 +1,6 @@
 """Config module"""
 from .settings import settings, Settings
-from .dependencies import get_container, get_predict_use_case, get_analyze_use_case, get_model_repository
+from .dependencies import get_container, get_predict_use_case, get_analyze_use_case, get_model_repository, get_model_registry, get_readiness
 
 __all__ = [
     'settings',
@@ -8,5 +8,7 @@ __all__ = [
     'get_container',
     'get_predict_use_case',
     'get_analyze_use_case',
-    'get_model_repository'
+    'get_model_repository',
+    'get_model_registry',
+    'get_readiness'
 ]
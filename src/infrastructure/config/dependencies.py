@@ -6,8 +6,10 @@ from functools import lru_cache
 from pathlib import Path
 
 from src.infrastructure.config.settings import settings
-from src.infrastructure.repositories import ModelRepository, InMemoryPredictionRepository
-from src.infrastructure.ml import SignalProcessor, ArrhythmiaPredictor
+from src.infrastructure.repositories import ModelRepository, ModelRegistry, InMemoryPredictionRepository
+from src.infrastructure.ml import (
+    SignalProcessor, ParallelSignalProcessor, ArrhythmiaPredictor, ModelWarmup, ServiceReadiness
+)
 from src.application.use_cases import PredictArrhythmiaUseCase, AnalyzeECGSignalUseCase
 
 
@@ -27,14 +29,43 @@ class DependencyContainer:
             return
         
         # Repositories
-        self.model_repository = ModelRepository(model_dir=settings.MODEL_DIR)
+        backend_options = {}
+        if settings.MODEL_BACKEND == 'onnx':
+            backend_options = {
+                'intra_op_threads': settings.ONNX_INTRA_OP_THREADS,
+                'inter_op_threads': settings.ONNX_INTER_OP_THREADS,
+                'optimization_level': settings.ONNX_GRAPH_OPTIMIZATION,
+                'max_batch': settings.ONNX_MAX_BATCH
+            }
+        self.model_repository = ModelRepository(
+            model_dir=settings.MODEL_DIR,
+            backend=settings.MODEL_BACKEND,
+            backend_options=backend_options
+        )
+        self.model_registry = ModelRegistry(
+            model_repository=self.model_repository,
+            default_alias=settings.MODEL_ALIAS,
+            default_version=settings.MODEL_NAME,
+            memory_budget_mb=settings.MODEL_CACHE_MAX_MB,
+            drain_timeout_s=settings.MODEL_DRAIN_TIMEOUT_S
+        )
+        if settings.STUDENT_MODEL_NAME:
+            self.model_registry.set_aliases({settings.STUDENT_MODEL_ALIAS: settings.STUDENT_MODEL_NAME})
         self.prediction_repository = InMemoryPredictionRepository()
         
         # Services
-        self.signal_processor = SignalProcessor(
-            sampling_rate=settings.SAMPLING_RATE,
-            window_size=settings.WINDOW_SIZE
-        )
+        if settings.PREPROCESS_WORKERS > 0:
+            self.signal_processor = ParallelSignalProcessor(
+                sampling_rate=settings.SAMPLING_RATE,
+                window_size=settings.WINDOW_SIZE,
+                workers=settings.PREPROCESS_WORKERS,
+                min_samples=settings.PREPROCESS_MIN_SAMPLES
+            )
+        else:
+            self.signal_processor = SignalProcessor(
+                sampling_rate=settings.SAMPLING_RATE,
+                window_size=settings.WINDOW_SIZE
+            )
         
         ruleguard_config = {
             'rr_low': settings.RULEGUARD_RR_LOW,
@@ -43,17 +74,41 @@ class DependencyContainer:
         }
         
         self.predictor_service = ArrhythmiaPredictor(
-            model_repository=self.model_repository,
+            model_registry=self.model_registry,
             threshold=settings.MODEL_THRESHOLD,
-            ruleguard_config=ruleguard_config
+            ruleguard_config=ruleguard_config,
+            model_alias=settings.MODEL_ALIAS,
+            ruleguard_from_metadata=settings.RULEGUARD_FROM_METADATA,
+            student_alias=settings.STUDENT_MODEL_ALIAS,
+            student_load_threshold=settings.STUDENT_LOAD_THRESHOLD,
+            threshold_from_metadata=settings.THRESHOLD_FROM_METADATA
         )
         
+        # Warmup y estado de readiness
+        self.model_warmup = ModelWarmup(
+            signal_processor=self.signal_processor,
+            predictor=self.predictor_service,
+            batch_sizes=settings.WARMUP_BATCH_SIZES,
+            iterations=settings.WARMUP_ITERATIONS
+        )
+        self.readiness = ServiceReadiness()
+        if settings.WARMUP_ENABLED:
+            self.model_registry.set_warmup(
+                lambda version: self.model_warmup.run(model_version=version)
+            )
+        
+        # Monitor de drift en streaming (opcional)
+        self.drift_monitor = self._create_drift_monitor() if settings.DRIFT_MONITOR_ENABLED else None
+        if self.drift_monitor is not None:
+            self.model_registry.set_swap_hook(self._on_model_swap)
+        
         # Use Cases
         self.predict_arrhythmia_use_case = PredictArrhythmiaUseCase(
             prediction_repository=self.prediction_repository,
             model_repository=self.model_repository,
             signal_processor=self.signal_processor,
-            predictor_service=self.predictor_service
+            predictor_service=self.predictor_service,
+            drift_monitor=self.drift_monitor
         )
         
         self.analyze_ecg_signal_use_case = AnalyzeECGSignalUseCase(
@@ -61,6 +116,54 @@ class DependencyContainer:
         )
         
         self._initialized = True
+    
+    def _create_drift_monitor(self):
+        """
+        Monitor con la referencia de DRIFT_REFERENCE_PATH (CSV o perfil .json) o,
+        por defecto, con el perfil exportado junto al modelo (drift_profile_<versión>.json).
+        """
+        from monitoring.streaming_drift import StreamingDriftMonitor
+        from monitoring.reference_profile import profile_path
+        
+        reference = settings.DRIFT_REFERENCE_PATH or profile_path(settings.MODEL_DIR, settings.MODEL_NAME)
+        if settings.DRIFT_REFERENCE_PATH is None and not reference.exists():
+            print(f"⚠️  Warning: Drift monitor disabled, no reference profile at {reference}")
+            return None
+        options = {
+            'min_samples': settings.DRIFT_MIN_SAMPLES,
+            'psi_threshold': settings.DRIFT_PSI_THRESHOLD,
+            'ks_threshold': settings.DRIFT_KS_THRESHOLD,
+            'js_threshold': settings.DRIFT_JS_THRESHOLD,
+            'report_dir': settings.DRIFT_REPORT_DIR
+        }
+        if Path(reference).suffix == '.json':
+            return StreamingDriftMonitor.from_reference_profile(reference, **options)
+        return StreamingDriftMonitor.from_reference_data(reference, **options)
+    
+    def _on_model_swap(self, alias: str, version: str):
+        """Al promover una versión al alias por defecto, el monitor de drift pasa a ella."""
+        if alias == self.model_registry.default_alias:
+            self.refresh_drift_reference(version)
+    
+    def refresh_drift_reference(self, version: str):
+        """
+        Compara el tráfico de `version` con su perfil (drift_profile_<versión>.json),
+        o con DRIFT_REFERENCE_PATH si está fijada. Si la versión no tiene perfil,
+        el monitor deja de observar hasta la siguiente promoción.
+        """
+        from monitoring.reference_profile import profile_path, load_reference_profile, profile_sketches
+        
+        if self.drift_monitor is None:
+            return
+        if settings.DRIFT_REFERENCE_PATH is not None:
+            self.drift_monitor.set_reference(self.drift_monitor.reference, model_version=version)
+            return
+        profile = profile_path(settings.MODEL_DIR, version)
+        try:
+            self.drift_monitor.set_reference(profile_sketches(load_reference_profile(profile)), model_version=version)
+        except Exception as e:
+            print(f"⚠️  Warning: Drift monitor paused, no reference profile for {version} ({profile}): {e}")
+            self.drift_monitor.pause()
 
 
 @lru_cache()
@@ -83,3 +186,13 @@ def get_analyze_use_case() -> AnalyzeECGSignalUseCase:
 def get_model_repository() -> ModelRepository:
     """Inyecta el repositorio de modelos."""
     return get_container().model_repository
+
+
+def get_model_registry() -> ModelRegistry:
+    """Inyecta el registro de versiones de modelo."""
+    return get_container().model_registry
+
+
+def get_readiness() -> ServiceReadiness:
+    """Inyecta el estado de readiness del servicio."""
+    return get_container().readiness
@@ -3,6 +3,7 @@ Configuration settings for the application
 """
 import os
 from pathlib import Path
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -19,21 +20,72 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = int(os.getenv("PORT", "8000"))
     
+    # Pre-fork serving (WORKERS > 1: el master carga el modelo y hace fork de los workers)
+    WORKERS: int = 1
+    PREFORK_HEARTBEAT_INTERVAL_S: float = 1.0
+    PREFORK_HEARTBEAT_TIMEOUT_S: float = 30.0
+    PREFORK_BOOT_TIMEOUT_S: float = 120.0
+    PREFORK_GRACEFUL_TIMEOUT_S: float = 30.0
+    PREFORK_MAX_REQUESTS: int = 0  # 0 = sin reciclado de workers
+    
     # ML Model settings
     MODEL_NAME: str = "model_v7"
     MODEL_DIR: Path = Path(__file__).parent.parent.parent.parent / "models" / "ecg_nv_cnn"
     MODEL_THRESHOLD: float = 0.5
+    MODEL_BACKEND: str = "keras"  # keras | numpy (.npz) | onnx (.onnx); numpy y onnx no importan TensorFlow
+    # Usar el umbral crudo elegido en entrenamiento (`decision.threshold_raw` de meta_<versión>.json)
+    THRESHOLD_FROM_METADATA: bool = False
+    
+    # Student destilado (training/distillation.py): variante compacta por petición o por carga
+    STUDENT_MODEL_NAME: Optional[str] = None  # ej: model_v7_student (también: 'student=...' en ACTIVE_MODEL)
+    STUDENT_MODEL_ALIAS: str = "student"
+    STUDENT_LOAD_THRESHOLD: int = 0  # peticiones concurrentes desde las que 'auto' usa el student (0 = nunca)
+    
+    # ONNX Runtime settings (MODEL_BACKEND=onnx)
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 = default de ONNX Runtime (núcleos físicos)
+    ONNX_INTER_OP_THREADS: int = 1
+    ONNX_GRAPH_OPTIMIZATION: str = "all"  # disable | basic | extended | all
+    ONNX_MAX_BATCH: int = 256
+    
+    # Model registry settings (alias -> versión, hot swap)
+    MODEL_ALIAS: str = "production"
+    MODEL_CACHE_MAX_MB: float = 512.0
+    MODEL_DRAIN_TIMEOUT_S: float = 30.0
+    MODEL_ACTIVE_FILE: str = "ACTIVE_MODEL"
+    MODEL_WATCH_INTERVAL_S: float = 10.0
+    ADMIN_TOKEN: Optional[str] = None  # None = endpoints admin deshabilitados (403)
+    
+    # Warmup / readiness settings
+    WARMUP_ENABLED: bool = True
+    WARMUP_BATCH_SIZES: list = [1, 16, 64, 256]
+    WARMUP_ITERATIONS: int = 2
     
     # Signal processing settings
     SAMPLING_RATE: int = 360
     WINDOW_SIZE: int = 360
     DERIVATION_INDEX: int = 0
     
+    # Preprocesamiento en pool de procesos (0 = en el propio proceso)
+    PREPROCESS_WORKERS: int = 0
+    PREPROCESS_MIN_SAMPLES: int = 20000  # señales más cortas no compensan el IPC
+    
     # RuleGuard settings
     USE_RULEGUARD: bool = True
     RULEGUARD_RR_LOW: float = 0.90
     RULEGUARD_RR_HIGH: float = 1.10
     RULEGUARD_QRS_THRESHOLD: float = 110.0
+    # Usar los umbrales sintonizados en entrenamiento (meta_<versión>.json) si existen
+    RULEGUARD_FROM_METADATA: bool = True
+    
+    # Monitor de drift en streaming (monitoring/streaming_drift.py), por worker
+    DRIFT_MONITOR_ENABLED: bool = False
+    DRIFT_REFERENCE_PATH: Optional[Path] = None  # CSV o perfil .json; None = drift_profile_<versión>.json del modelo
+    DRIFT_CHECK_INTERVAL_S: float = 300.0
+    DRIFT_MIN_SAMPLES: int = 500  # latidos mínimos en la ventana para evaluar
+    DRIFT_PSI_THRESHOLD: float = 0.2
+    DRIFT_KS_THRESHOLD: float = 0.15
+    DRIFT_JS_THRESHOLD: float = 0.2
+    DRIFT_REPORT_DIR: str = "monitoring/reports"
     
     # CORS settings
     CORS_ORIGINS: list = ["*"]
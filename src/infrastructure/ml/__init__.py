@@ -3,10 +3,17 @@ ML services
 """
 from .signal_processor import SignalProcessor, ProcessedSignalData
 from .arrhythmia_predictor import ArrhythmiaPredictor, PredictionResult
+from .model_warmup import ModelWarmup, WarmupReport, ServiceReadiness
+from .preprocessing_pool import ParallelSignalProcessor, SharedMemoryPool
 
 __all__ = [
     'SignalProcessor',
     'ProcessedSignalData',
     'ArrhythmiaPredictor',
-    'PredictionResult'
+    'PredictionResult',
+    'ModelWarmup',
+    'WarmupReport',
+    'ServiceReadiness',
+    'ParallelSignalProcessor',
+    'SharedMemoryPool'
 ]
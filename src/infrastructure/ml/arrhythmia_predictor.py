@@ -3,11 +3,12 @@ Arrhythmia Predictor Service
 Servicio que realiza predicciones de arritmias usando el modelo ML.
 """
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from contextlib import contextmanager
 from dataclasses import dataclass
 
 from src.infrastructure.ml.signal_processor import ProcessedSignalData
-from src.infrastructure.repositories.model_repository import ModelRepository
+from src.infrastructure.repositories.model_registry import ModelRegistry
 from src.shared.exceptions import PredictionError
 
 
@@ -17,31 +18,115 @@ class PredictionResult:
     beat_predictions: List[Dict]
     overall_confidence: float
     threshold: float
+    model_version: Optional[str] = None
+    model_variant: Optional[str] = None
 
 
 class ArrhythmiaPredictor:
     """
     Servicio de predicción de arritmias.
+    
+    Sirve el modelo del alias del servicio (teacher) y, si el registro tiene
+    el alias del student destilado, la variante compacta: por petición
+    (`model_variant`) o en modo 'auto' cuando las peticiones concurrentes
+    alcanzan `student_load_threshold`.
     """
     
     def __init__(
         self,
-        model_repository: ModelRepository,
+        model_registry: ModelRegistry,
         threshold: float = 0.5,
-        ruleguard_config: dict = None
+        ruleguard_config: dict = None,
+        model_alias: Optional[str] = None,
+        ruleguard_from_metadata: bool = True,
+        student_alias: Optional[str] = None,
+        student_load_threshold: int = 0,
+        threshold_from_metadata: bool = False
     ):
-        self.model_repository = model_repository
+        self.model_registry = model_registry
+        self.model_alias = model_alias
         self.threshold = threshold
         self.ruleguard_config = ruleguard_config or {
             'rr_low': 0.90,
             'rr_high': 1.10,
             'qrs_threshold': 110.0
         }
+        self.ruleguard_from_metadata = ruleguard_from_metadata
+        self.student_alias = student_alias
+        self.student_load_threshold = student_load_threshold
+        self.threshold_from_metadata = threshold_from_metadata
+        self._active_requests = 0
+    
+    @contextmanager
+    def track_request(self):
+        """Cuenta una petición como activa mientras dure el bloque `with`."""
+        self._active_requests += 1
+        try:
+            yield
+        finally:
+            self._active_requests -= 1
+    
+    @property
+    def active_requests(self) -> int:
+        return self._active_requests
+    
+    @property
+    def student_available(self) -> bool:
+        return self.student_alias is not None and self.model_registry.has_alias(self.student_alias)
+    
+    def select_model(self, model_variant: Optional[str] = None) -> Tuple[Optional[str], str]:
+        """
+        Alias a usar según la variante pedida.
+        
+        Returns:
+            Tupla (alias, variante efectiva: 'teacher' | 'student')
+        """
+        variant = model_variant or 'auto'
+        if variant == 'student':
+            if not self.student_available:
+                raise PredictionError("Student model is not configured")
+            return self.student_alias, 'student'
+        if variant == 'auto':
+            overloaded = 0 < self.student_load_threshold <= self._active_requests
+            if overloaded and self.student_available:
+                return self.student_alias, 'student'
+        elif variant != 'teacher':
+            raise PredictionError(f"Unknown model variant: {model_variant}")
+        return self.model_alias, 'teacher'
+    
+    async def threshold_for(self, version: str) -> float:
+        """
+        Umbral sobre la probabilidad cruda para una versión: el elegido en
+        entrenamiento (`decision.threshold_raw` de meta_<versión>.json) si
+        está habilitado y existe, si no el de settings.
+        """
+        if not self.threshold_from_metadata:
+            return self.threshold
+        metadata = await self.model_registry.model_repository.get_model_metadata(version)
+        threshold_raw = ((metadata or {}).get('decision') or {}).get('threshold_raw')
+        return self.threshold if threshold_raw is None else float(threshold_raw)
+    
+    async def ruleguard_config_for(self, version: str) -> dict:
+        """
+        Configuración de RuleGuard para una versión: la sintonizada en
+        entrenamiento (`ruleguard_config` de meta_<versión>.json) si existe,
+        si no la de settings.
+        """
+        if not self.ruleguard_from_metadata:
+            return self.ruleguard_config
+        metadata = await self.model_registry.model_repository.get_model_metadata(version)
+        tuned = (metadata or {}).get('ruleguard_config') or {}
+        return {
+            key: float(tuned.get(key, default))
+            for key, default in self.ruleguard_config.items()
+        }
     
     async def predict(
         self,
         processed_data: ProcessedSignalData,
-        apply_ruleguard: bool = True
+        apply_ruleguard: bool = True,
+        model_version: Optional[str] = None,
+        model_variant: Optional[str] = None
     ) -> PredictionResult:
         """
         Realiza predicciones de arritmias en los latidos detectados.
@@ -49,6 +134,8 @@ class ArrhythmiaPredictor:
         Args:
             processed_data: Datos de señal procesados
             apply_ruleguard: Si se aplica RuleGuard para reducir falsos positivos
+            model_version: Alias o versión explícita (tiene prioridad sobre `model_variant`)
+            model_variant: 'teacher' | 'student' | 'auto' (None = 'auto')
             
         Returns:
             Resultado con predicciones por latido
@@ -56,9 +143,6 @@ class ArrhythmiaPredictor:
         if len(processed_data.windows) == 0:
             raise PredictionError("No windows to predict")
         
-        # Cargar modelo
-        model = await self.model_repository.load_model("model_v7")
-        
         # Preparar inputs para el modelo
         # Input 1: Señales (batch, 360, 1)
         signal_inputs = np.stack([w.to_cnn_input() for w in processed_data.windows])
@@ -66,22 +150,33 @@ class ArrhythmiaPredictor:
         # Input 2: RR intervals (batch, 3)
         rr_inputs = np.stack([rr.to_features() for rr in processed_data.rr_intervals]).astype(np.float32)
         
-        # Predicción
-        probabilities = model.predict(
-            {'sig': signal_inputs, 'rr': rr_inputs},
-            batch_size=256,
-            verbose=0
-        ).ravel()
+        if model_version is not None:
+            alias = model_version
+            is_student = (self.student_available and
+                          self.model_registry.resolve(model_version) == self.model_registry.resolve(self.student_alias))
+            variant = 'student' if is_student else 'teacher'
+        else:
+            alias, variant = self.select_model(model_variant)
+        
+        # Predicción (la versión queda marcada en uso hasta terminar)
+        async with self.model_registry.acquire(alias) as (version, model):
+            probabilities = model.predict(
+                {'sig': signal_inputs, 'rr': rr_inputs},
+                batch_size=256,
+                verbose=0
+            ).ravel()
         
         # Clasificación binaria
-        predictions = (probabilities >= self.threshold).astype(np.int32)
+        threshold = await self.threshold_for(version)
+        predictions = (probabilities >= threshold).astype(np.int32)
         
         # Aplicar RuleGuard si está habilitado
         if apply_ruleguard:
             predictions = self._apply_ruleguard(
                 predictions,
                 processed_data,
-                probabilities
+                probabilities,
+                await self.ruleguard_config_for(version)
             )
         
         # Construir resultados por latido
@@ -111,23 +206,27 @@ class ArrhythmiaPredictor:
         return PredictionResult(
             beat_predictions=beat_predictions,
             overall_confidence=overall_confidence,
-            threshold=self.threshold
+            threshold=threshold,
+            model_version=version,
+            model_variant=variant
         )
     
     def _apply_ruleguard(
         self,
         predictions: np.ndarray,
         processed_data: ProcessedSignalData,
-        probabilities: np.ndarray
+        probabilities: np.ndarray,
+        config: Optional[dict] = None
     ) -> np.ndarray:
         """
         Aplica reglas heurísticas para reducir falsos positivos de arritmias ventriculares.
         """
         filtered_predictions = predictions.copy()
+        config = config or self.ruleguard_config
         
-        rr_low = self.ruleguard_config['rr_low']
-        rr_high = self.ruleguard_config['rr_high']
-        qrs_thr = self.ruleguard_config['qrs_threshold']
+        rr_low = config['rr_low']
+        rr_high = config['rr_high']
+        qrs_thr = config['qrs_threshold']
         
         for i, (window, rr, pred) in enumerate(zip(
             processed_data.windows,
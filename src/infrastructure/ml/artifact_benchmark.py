@@ -0,0 +1,386 @@
+"""
+Artifact Benchmark
+Matriz de benchmark y paridad entre los artefactos servibles de un modelo.
+
+Carga cada artefacto (.keras, SavedModel, .tflite, .npz, .onnx) en un
+proceso nuevo, lo ejecuta sobre las mismas entradas sintéticas a varios
+tamaños de batch y mide tiempo de carga, latencia de la primera llamada,
+latencia en caliente (p50/p99), throughput y RSS pico. Las probabilidades
+se comparan con las del `.keras` de la misma versión (max|Δp| y acuerdo de etiquetas).
+    
+    python -m src.infrastructure.ml.artifact_benchmark models/ecg_nv_cnn
+    python -m src.infrastructure.ml.artifact_benchmark models/ecg_nv_cnn --batch-sizes 1 64 256 --json bench.json
+"""
+import json
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.infrastructure.ml.parity import compare_probabilities, synthetic_inputs
+
+ARTIFACT_SUFFIXES = ('.keras', '.tflite', '.npz', '.onnx')
+DEFAULT_BATCH_SIZES = (1, 16, 64, 256)
+LFS_POINTER_PREFIX = b'version https://git-lfs'
+
+# Exportaciones sin versión cuyo nombre no coincide con el de su .keras
+LEGACY_GROUPS = {'model_nv': 'model'}  # model_nv.tflite se exportó desde model.keras / saved_model
+
+
+def discover_artifacts(model_dir: Union[str, Path]) -> List[Path]:
+    """Artefactos servibles del directorio: archivos con extensión conocida y directorios SavedModel."""
+    model_dir = Path(model_dir)
+    found = [p for p in model_dir.iterdir() if p.suffix in ARTIFACT_SUFFIXES and p.is_file()]
+    found += [p for p in model_dir.iterdir() if p.is_dir() and (p / 'saved_model.pb').exists()]
+    return sorted(found, key=lambda p: p.name)
+
+
+def artifact_group(path: Path) -> str:
+    """
+    Versión del modelo a la que pertenece: model_v7.keras, model_v7.tflite y
+    saved_model_v7 -> 'model_v7' (los nombres heredados según LEGACY_GROUPS).
+    """
+    group = path.name.replace('saved_', '', 1) if path.is_dir() else path.stem
+    return LEGACY_GROUPS.get(group, group)
+
+
+def artifact_backend(path: Path) -> str:
+    return 'savedmodel' if path.is_dir() else path.suffix.lstrip('.')
+
+
+def artifact_size(path: Path) -> int:
+    """Bytes en disco (suma de archivos para SavedModel)."""
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size
+
+
+def is_lfs_pointer(path: Path) -> bool:
+    """Puntero de Git LFS sin descargar (el artefacto real no está en disco)."""
+    target = path / 'saved_model.pb' if path.is_dir() else path
+    with open(target, 'rb') as f:
+        return f.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX
+
+
+# ----------------------------------------------------------------------
+# Adaptadores: todos exponen `predict(inputs, batch_size=..., verbose=0)`
+# ----------------------------------------------------------------------
+
+def _map_inputs(names_to_rank: Dict[str, int]) -> Dict[str, str]:
+    """Nombre de entrada del artefacto -> 'sig' | 'rr' (por nombre o, si no, por rango)."""
+    mapping = {}
+    for name, rank in names_to_rank.items():
+        if 'sig' in name:
+            mapping[name] = 'sig'
+        elif 'rr' in name:
+            mapping[name] = 'rr'
+        else:
+            mapping[name] = 'sig' if rank == 3 else 'rr'
+    return mapping
+
+
+class _BatchedModel:
+    """Base: parte `inputs` en lotes de `batch_size` y concatena las salidas."""
+    
+    def _run(self, sig: np.ndarray, rr: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+    
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: int = 256, verbose: int = 0) -> np.ndarray:
+        n = len(inputs['sig'])
+        outputs = [
+            np.asarray(self._run(inputs['sig'][s:s + batch_size], inputs['rr'][s:s + batch_size])).reshape(-1, 1)
+            for s in range(0, n, batch_size)
+        ]
+        return np.concatenate(outputs, axis=0) if outputs else np.empty((0, 1), np.float32)
+
+
+class SavedModelRunner(_BatchedModel):
+    """Signature 'serving_default' de un SavedModel."""
+    
+    def __init__(self, path: Path, threads: int = 0):
+        import tensorflow as tf
+        
+        self._tf = tf
+        self._loaded = tf.saved_model.load(str(path))
+        self._fn = self._loaded.signatures['serving_default']
+        specs = self._fn.structured_input_signature[1]
+        self._inputs = _map_inputs({name: len(spec.shape) for name, spec in specs.items()})
+    
+    def _run(self, sig, rr):
+        feeds = {'sig': sig, 'rr': rr}
+        outputs = self._fn(**{name: self._tf.constant(feeds[k]) for name, k in self._inputs.items()})
+        return next(iter(outputs.values())).numpy()
+
+
+class TFLiteRunner(_BatchedModel):
+    """Intérprete TFLite; redimensiona las entradas al cambiar el tamaño de batch."""
+    
+    def __init__(self, path: Path, threads: int = 0):
+        import tensorflow as tf
+        
+        self._interpreter = tf.lite.Interpreter(model_path=str(path), num_threads=threads or None)
+        details = self._interpreter.get_input_details()
+        self._inputs = _map_inputs({d['name']: len(d['shape']) for d in details})
+        self._index = {d['name']: d['index'] for d in details}
+        self._output = self._interpreter.get_output_details()[0]['index']
+        self._batch = None
+    
+    def _run(self, sig, rr):
+        feeds = {'sig': sig, 'rr': rr}
+        if self._batch != len(sig):
+            for name, k in self._inputs.items():
+                self._interpreter.resize_tensor_input(self._index[name], feeds[k].shape)
+            self._interpreter.allocate_tensors()
+            self._batch = len(sig)
+        for name, k in self._inputs.items():
+            self._interpreter.set_tensor(self._index[name], np.ascontiguousarray(feeds[k], dtype=np.float32))
+        self._interpreter.invoke()
+        return self._interpreter.get_tensor(self._output).copy()
+
+
+def load_artifact(path: Path, threads: int = 0):
+    """Carga un artefacto con el runtime que le corresponde."""
+    backend = artifact_backend(path)
+    if backend == 'keras':
+        import tensorflow as tf
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        return tf.keras.models.load_model(path, compile=False)
+    if backend == 'savedmodel':
+        return SavedModelRunner(path, threads)
+    if backend == 'tflite':
+        return TFLiteRunner(path, threads)
+    if backend == 'npz':
+        from src.infrastructure.ml.numpy_engine import NumpyCNNModel
+        return NumpyCNNModel.load(path)
+    if backend == 'onnx':
+        from src.infrastructure.ml.onnx_engine import OnnxModel
+        return OnnxModel(path, intra_op_threads=threads)
+    raise ValueError(f"Unknown artifact type: {path}")
+
+
+# ----------------------------------------------------------------------
+# Benchmark de un artefacto (en su propio proceso)
+# ----------------------------------------------------------------------
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss: KB en Linux, bytes en macOS
+    scale = 1024 * 1024 if os.uname().sysname == 'Darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def benchmark_artifact(
+    path: Union[str, Path],
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    n_samples: int = 512,
+    repeats: int = 20,
+    threads: int = 0,
+    seed: int = 0
+) -> Dict:
+    """
+    Mide un artefacto en el proceso actual (llamar en un proceso nuevo
+    para que carga y RSS no se mezclen con otros artefactos).
+    
+    Returns:
+        {'load_s', 'first_call_ms', 'rss_*_mb', 'batches': {bs: {'first_ms',
+        'p50_ms', 'p90_ms', 'p99_ms', 'samples_per_s'}}, 'probabilities': {bs: (n,)}}
+    """
+    path = Path(path)
+    batch_sizes = sorted({int(bs) for bs in batch_sizes if int(bs) > 0})
+    inputs = synthetic_inputs(max(n_samples, max(batch_sizes)), seed=seed)
+    parity_inputs = {k: v[:n_samples] for k, v in inputs.items()}
+    rss_base = _peak_rss_mb()
+    
+    t0 = time.perf_counter()
+    model = load_artifact(path, threads)
+    load_s = time.perf_counter() - t0
+    rss_loaded = _peak_rss_mb()
+    
+    batches, probabilities = {}, {}
+    first_call_ms = None
+    for bs in batch_sizes:
+        batch = {k: v[:bs] for k, v in inputs.items()}
+        t0 = time.perf_counter()
+        model.predict(batch, batch_size=bs, verbose=0)
+        first_ms = (time.perf_counter() - t0) * 1000
+        first_call_ms = first_ms if first_call_ms is None else first_call_ms
+        
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            model.predict(batch, batch_size=bs, verbose=0)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        p50 = float(np.percentile(latencies, 50))
+        batches[bs] = {
+            'first_ms': first_ms,
+            'p50_ms': p50,
+            'p90_ms': float(np.percentile(latencies, 90)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+            'samples_per_s': bs / (p50 / 1000),
+        }
+        probabilities[bs] = np.asarray(model.predict(parity_inputs, batch_size=bs, verbose=0), np.float32).ravel()
+    
+    return {
+        'load_s': load_s,
+        'first_call_ms': first_call_ms,
+        'rss_loaded_mb': rss_loaded - rss_base,
+        'rss_peak_mb': _peak_rss_mb(),
+        'batches': batches,
+        'probabilities': probabilities,
+    }
+
+
+def benchmark_in_subprocess(path: Path, **kwargs) -> Dict:
+    """`benchmark_artifact` en un proceso spawn nuevo (runtime, cache y RSS aislados)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(benchmark_artifact, path, **kwargs).result()
+
+
+# ----------------------------------------------------------------------
+# Matriz completa
+# ----------------------------------------------------------------------
+
+def run_benchmark(
+    artifacts: Sequence[Union[str, Path]],
+    reference: Optional[Union[str, Path]] = None,
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    n_samples: int = 512,
+    repeats: int = 20,
+    threads: int = 0,
+    threshold: float = 0.5,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Benchmark y paridad de cada artefacto contra `reference` o, por
+    defecto, contra el `.keras` de su misma versión (`artifact_group`; si
+    no hay, el primer artefacto de la versión que cargue).
+    
+    Returns:
+        Una fila por artefacto con `status` ('ok' | 'lfs_pointer' | 'error'),
+        métricas de tiempo/memoria y, si hay referencia, `parity`
+        (max|Δp|, mean|Δp|, acuerdo de etiquetas) y `batch_max_abs_diff`
+        (diferencia entre tamaños de batch del propio artefacto). Las filas
+        'ok' sin paridad llevan `reference` = None si nadie las compara con
+        otra (artefacto sin referencia) o su propio nombre si son la referencia.
+    """
+    rows = []
+    for path in map(Path, artifacts):
+        row = {'artifact': path.name, 'group': artifact_group(path), 'backend': artifact_backend(path),
+               'size_kb': artifact_size(path) / 1024}
+        if is_lfs_pointer(path):
+            rows.append({**row, 'status': 'lfs_pointer', 'error': 'Git LFS pointer (run `git lfs pull`)'})
+            continue
+        try:
+            result = benchmark_in_subprocess(path, batch_sizes=batch_sizes, n_samples=n_samples,
+                                              repeats=repeats, threads=threads, seed=seed)
+        except Exception as e:
+            rows.append({**row, 'status': 'error', 'error': f"{e.__class__.__name__}: {e}"})
+            continue
+        rows.append({**row, 'status': 'ok', **result})
+    
+    ok = [r for r in rows if r['status'] == 'ok']
+    
+    def reference_for(row):
+        if reference is not None:
+            return next((r for r in ok if r['artifact'] == Path(reference).name), None)
+        group = [r for r in ok if r['group'] == row['group']]
+        return next((r for r in group if r['backend'] == 'keras'), group[0])
+    
+    for row in ok:
+        probs = row.pop('probabilities')
+        by_batch = list(probs.values())
+        row['batch_max_abs_diff'] = float(max(np.abs(p - by_batch[0]).max() for p in by_batch))
+        row['_probs'] = probs[max(probs)]
+    for row in ok:
+        ref_row = reference_for(row)
+        row['reference'] = None
+        if ref_row is not None and ref_row is not row:
+            row['reference'] = ref_row['artifact']
+            row['parity'] = compare_probabilities(ref_row['_probs'], row['_probs'], threshold)
+    used = {row['reference'] for row in ok}
+    for row in ok:
+        if row['reference'] is None and row['artifact'] in used:
+            row['reference'] = row['artifact']
+    for row in ok:
+        row.pop('_probs')
+    return rows
+
+
+def format_report(rows: Sequence[Dict], batch_sizes: Sequence[int]) -> str:
+    """Tabla Markdown: una fila por artefacto."""
+    batch_sizes = sorted({int(bs) for bs in batch_sizes})
+    header = (['Artefacto', 'Backend', 'KB', 'Carga s', '1ª llamada ms']
+              + [f'p50/p99 ms b={bs}' for bs in batch_sizes]
+              + [f'muestras/s b={batch_sizes[-1]}', 'RSS MB', 'Referencia', 'max|Δp|', 'Acuerdo'])
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+    for r in rows:
+        base = [r['artifact'], r['backend'], f"{r['size_kb']:.1f}"]
+        if r['status'] != 'ok':
+            cells = base + [f"{r['status']}: {r['error']}"] + [''] * (len(header) - len(base) - 1)
+        else:
+            parity = r.get('parity')
+            cells = base + [
+                f"{r['load_s']:.2f}",
+                f"{r['first_call_ms']:.1f}",
+                *[f"{r['batches'][bs]['p50_ms']:.2f} / {r['batches'][bs]['p99_ms']:.2f}" for bs in batch_sizes],
+                f"{r['batches'][batch_sizes[-1]]['samples_per_s']:.0f}",
+                f"{r['rss_peak_mb']:.0f}",
+                r.get('reference') or '-',
+                f"{parity['max_abs_diff']:.1e}" if parity else '-',
+                f"{parity['label_agreement']:.4f}" if parity else '-',
+            ]
+        lines.append('| ' + ' | '.join(cells) + ' |')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Benchmark y paridad de los artefactos servibles de un modelo')
+    parser.add_argument('paths', type=Path, nargs='+', help='Directorio de modelos y/o artefactos sueltos')
+    parser.add_argument('--reference', default=None, help='Artefacto de referencia para la paridad (default: primer .keras)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--samples', type=int, default=512, help='Muestras para la paridad')
+    parser.add_argument('--repeats', type=int, default=20, help='Llamadas en caliente por tamaño de batch')
+    parser.add_argument('--threads', type=int, default=0, help='Hilos de inferencia (0 = default de cada runtime)')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Umbral para el acuerdo de etiquetas')
+    parser.add_argument('--atol', type=float, default=1e-4, help='Diferencia máxima de probabilidad permitida')
+    parser.add_argument('--json', type=Path, default=None, help='Guardar las filas completas en JSON')
+    args = parser.parse_args()
+    
+    artifacts = []
+    for p in args.paths:
+        artifacts += discover_artifacts(p) if p.is_dir() and not (p / 'saved_model.pb').exists() else [p]
+    if args.threads:
+        os.environ.setdefault('OMP_NUM_THREADS', str(args.threads))
+    
+    rows = run_benchmark(artifacts, reference=args.reference, batch_sizes=args.batch_sizes, n_samples=args.samples,
+                         repeats=args.repeats, threads=args.threads, threshold=args.threshold)
+    print(format_report(rows, args.batch_sizes))
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2, default=str))
+        print(f"\n💾 Resultados guardados en: {args.json}")
+    
+    failed = [f"{r['artifact']} (vs {r['reference']})" for r in rows
+              if r.get('parity') and r['parity']['max_abs_diff'] > args.atol]
+    not_loaded = [f"{r['artifact']} ({r['status']})" for r in rows if r['status'] != 'ok']
+    unmatched = [r['artifact'] for r in rows if r['status'] == 'ok' and r['reference'] is None]
+    if failed:
+        print(f"\n❌ Fuera de tolerancia ({args.atol}): {', '.join(failed)}")
+    if not_loaded:
+        print(f"\n❌ Sin cargar: {', '.join(not_loaded)}")
+    if unmatched:
+        print(f"\n❌ Sin referencia para la paridad: {', '.join(unmatched)}")
+    if not any(r.get('parity') for r in rows):
+        print("\n❌ No se comparó ningún artefacto")
+        sys.exit(1)
+    if failed or not_loaded or unmatched:
+        sys.exit(1)
+    print(f"\n✅ Artefactos cargados dentro de la tolerancia ({args.atol})")
@@ -0,0 +1,149 @@
+"""
+Model Warmup Service
+Ejecuta lotes sintéticos por el pipeline completo antes de aceptar tráfico.
+"""
+import time
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+
+from src.domain.entities import ECGSignal
+from src.infrastructure.ml.signal_processor import SignalProcessor, ProcessedSignalData
+from src.infrastructure.ml.arrhythmia_predictor import ArrhythmiaPredictor
+
+
+@dataclass
+class WarmupReport:
+    """Latencias medidas durante el warmup."""
+    batch_sizes: List[int]
+    latencies_ms: Dict[int, List[float]]
+    completed_at: datetime
+
+    def summary(self) -> List[Dict]:
+        """Resumen por tamaño de batch (primera llamada vs. llamada en caliente)."""
+        return [
+            {
+                'batch_size': bs,
+                'cold_ms': round(self.latencies_ms[bs][0], 3),
+                'warm_ms': round(self.latencies_ms[bs][-1], 3),
+            }
+            for bs in self.batch_sizes
+        ]
+
+
+@dataclass
+class ServiceReadiness:
+    """Estado de readiness del servicio (se activa solo tras el warmup)."""
+    ready: bool = False
+    report: Optional[WarmupReport] = None
+    error: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.utcnow)
+
+    def mark_ready(self, report: Optional[WarmupReport]):
+        self.report = report
+        self.error = None
+        self.ready = True
+
+    def mark_failed(self, error: str):
+        self.error = error
+        self.ready = False
+
+
+def generate_synthetic_ecg(
+    n_beats: int,
+    sampling_rate: int = 360,
+    rr_seconds: float = 0.8,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    Genera una señal ECG sintética (P, QRS, T) con `n_beats` latidos.
+    Se usa únicamente para calentar el pipeline; no representa datos clínicos.
+    """
+    rng = np.random.default_rng(seed)
+    beat_len = int(rr_seconds * sampling_rate)
+    t = np.arange(beat_len) / sampling_rate
+
+    # Plantilla de un latido (centros relativos al inicio del latido)
+    template = (
+        0.15 * np.exp(-((t - 0.20) ** 2) / (2 * 0.010 ** 2))
+        - 0.05 * np.exp(-((t - 0.38) ** 2) / (2 * 0.005 ** 2))
+        + 1.20 * np.exp(-((t - 0.40) ** 2) / (2 * 0.008 ** 2))
+        - 0.10 * np.exp(-((t - 0.42) ** 2) / (2 * 0.005 ** 2))
+        + 0.25 * np.exp(-((t - 0.57) ** 2) / (2 * 0.020 ** 2))
+    )
+
+    signal = np.tile(template, n_beats)
+    signal += rng.normal(0, 0.02, size=signal.shape)
+    return signal.astype(np.float32)
+
+
+class ModelWarmup:
+    """
+    Calienta el pipeline (filtrado, detección de picos, modelo y RuleGuard)
+    con lotes sintéticos de cada tamaño de batch esperado.
+    """
+
+    def __init__(
+        self,
+        signal_processor: SignalProcessor,
+        predictor: ArrhythmiaPredictor,
+        batch_sizes: List[int],
+        iterations: int = 2
+    ):
+        self.signal_processor = signal_processor
+        self.predictor = predictor
+        self.batch_sizes = sorted({int(bs) for bs in batch_sizes if int(bs) > 0})
+        self.iterations = max(1, iterations)
+
+    async def _build_batch(self, batch_size: int) -> ProcessedSignalData:
+        """Procesa una señal sintética y recorta a exactamente `batch_size` latidos."""
+        # +2 latidos: el primero y el último pueden quedar fuera por ventana incompleta
+        signal = generate_synthetic_ecg(
+            batch_size + 2,
+            sampling_rate=self.signal_processor.sampling_rate
+        )
+        ecg_signal = ECGSignal.create(
+            signal_data=signal,
+            sampling_rate=self.signal_processor.sampling_rate
+        )
+        processed = await self.signal_processor.process_signal(ecg_signal)
+
+        n = len(processed.windows)
+        if n == 0:
+            raise RuntimeError("Warmup signal produced no windows")
+
+        # Repetir ventanas si la detección de picos devolvió menos de las necesarias
+        idx = np.resize(np.arange(n), batch_size)
+        return ProcessedSignalData(
+            windows=[processed.windows[i] for i in idx],
+            rr_intervals=[processed.rr_intervals[i] for i in idx],
+            r_peaks=processed.r_peaks
+        )
+
+    async def run(self, model_version: Optional[str] = None) -> WarmupReport:
+        """
+        Ejecuta el warmup y devuelve las latencias medidas por tamaño de batch.
+
+        Args:
+            model_version: Versión a calentar (por defecto la del alias del servicio)
+        """
+        latencies: Dict[int, List[float]] = {}
+
+        for batch_size in self.batch_sizes:
+            latencies[batch_size] = []
+            for _ in range(self.iterations):
+                start = time.perf_counter()
+                processed = await self._build_batch(batch_size)
+                await self.predictor.predict(
+                    processed,
+                    apply_ruleguard=True,
+                    model_version=model_version
+                )
+                latencies[batch_size].append((time.perf_counter() - start) * 1000)
+
+        return WarmupReport(
+            batch_sizes=self.batch_sizes,
+            latencies_ms=latencies,
+            completed_at=datetime.utcnow()
+        )
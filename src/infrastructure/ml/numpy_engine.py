@@ -0,0 +1,301 @@
+"""
+NumPy Inference Engine
+Ejecuta la CNN exportada (pesos en .npz) con NumPy vectorizado, sin TensorFlow.
+
+Exportar y validar contra Keras (requiere TensorFlow solo en este paso):
+    python -m src.infrastructure.ml.numpy_engine models/ecg_nv_cnn/model_v7.keras
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+GRAPH_KEY = '__graph__'
+SUPPORTED_LAYERS = {
+    'InputLayer', 'Conv1D', 'SeparableConv1D', 'MaxPooling1D', 'GlobalAveragePooling1D',
+    'Dense', 'Concatenate', 'Dropout', 'Activation'
+}
+
+
+# ----------------------------------------------------------------------
+# Operadores
+# ----------------------------------------------------------------------
+
+def _activation(x: np.ndarray, name: str) -> np.ndarray:
+    if name in (None, 'linear'):
+        return x
+    if name == 'relu':
+        return np.maximum(x, 0)
+    if name == 'sigmoid':
+        # Forma estable (sin overflow de exp para logits grandes)
+        return 0.5 * (1.0 + np.tanh(0.5 * x))
+    if name == 'tanh':
+        return np.tanh(x)
+    if name == 'softmax':
+        e = np.exp(x - x.max(axis=-1, keepdims=True))
+        return e / e.sum(axis=-1, keepdims=True)
+    raise ValueError(f"Unsupported activation: {name}")
+
+
+def conv1d(
+    x: np.ndarray,
+    kernel: np.ndarray,
+    bias: np.ndarray,
+    stride: int = 1,
+    dilation: int = 1,
+    padding: str = 'same'
+) -> np.ndarray:
+    """
+    Conv1D via im2col + GEMM.
+    
+    Args:
+        x: (B, L, C_in)
+        kernel: (k, C_in, C_out) en el layout de Keras
+    Returns:
+        (B, L_out, C_out)
+    """
+    k = kernel.shape[0]
+    span = dilation * (k - 1) + 1
+    if padding == 'same':
+        total = max(span - 1, 0)
+        left = total // 2
+        x = np.pad(x, ((0, 0), (left, total - left), (0, 0)))
+    elif padding != 'valid':
+        raise ValueError(f"Unsupported padding: {padding}")
+    
+    # (B, L_out, C_in, span) -> taps con dilatación y stride
+    cols = sliding_window_view(x, span, axis=1)[:, ::stride, :, ::dilation]
+    # GEMM: contrae (C_in, k) contra el kernel reordenado a (C_in, k, C_out)
+    out = np.tensordot(cols, kernel.transpose(1, 0, 2), axes=([2, 3], [0, 1]))
+    out += bias
+    return out.astype(np.float32, copy=False)
+
+
+def separable_conv1d(
+    x: np.ndarray,
+    depthwise: np.ndarray,
+    pointwise: np.ndarray,
+    bias: np.ndarray,
+    stride: int = 1,
+    dilation: int = 1,
+    padding: str = 'same'
+) -> np.ndarray:
+    """
+    SeparableConv1D: conv depthwise por canal + conv pointwise (GEMM).
+    
+    Args:
+        x: (B, L, C_in)
+        depthwise: (k, C_in, mult) en el layout de Keras
+        pointwise: (1, C_in * mult, C_out)
+    Returns:
+        (B, L_out, C_out)
+    """
+    k, c_in, mult = depthwise.shape
+    span = dilation * (k - 1) + 1
+    if padding == 'same':
+        total = max(span - 1, 0)
+        left = total // 2
+        x = np.pad(x, ((0, 0), (left, total - left), (0, 0)))
+    elif padding != 'valid':
+        raise ValueError(f"Unsupported padding: {padding}")
+    
+    # (B, L_out, C_in, k): cada canal solo contra su propio filtro
+    cols = sliding_window_view(x, span, axis=1)[:, ::stride, :, ::dilation]
+    y = np.einsum('blck,kcm->blcm', cols, depthwise, optimize=True)
+    # Salida canal-mayor como Keras (canal c, multiplicador m -> c * mult + m)
+    y = y.reshape(y.shape[0], y.shape[1], c_in * mult)
+    return (y @ pointwise[0] + bias).astype(np.float32, copy=False)
+
+
+def max_pool1d(x: np.ndarray, pool: int, stride: int, padding: str = 'valid') -> np.ndarray:
+    """MaxPooling1D sobre (B, L, C) para todo el batch a la vez."""
+    if padding != 'valid':
+        raise ValueError(f"Unsupported pooling padding: {padding}")
+    n_out = (x.shape[1] - pool) // stride + 1
+    if pool == stride:
+        # Camino rápido: reshape sin copias intermedias
+        b, _, c = x.shape
+        return x[:, :n_out * pool].reshape(b, n_out, pool, c).max(axis=2)
+    return sliding_window_view(x, pool, axis=1)[:, ::stride][:, :n_out].max(axis=-1)
+
+
+def dense(x: np.ndarray, kernel: np.ndarray, bias: np.ndarray) -> np.ndarray:
+    return x @ kernel + bias
+
+
+# ----------------------------------------------------------------------
+# Modelo
+# ----------------------------------------------------------------------
+
+class NumpyCNNModel:
+    """
+    Modelo exportado a .npz ejecutado con NumPy.
+    
+    Expone `predict()` con la misma firma que usa ArrhythmiaPredictor sobre
+    un modelo Keras, por lo que es intercambiable en el ModelRepository.
+    """
+    
+    def __init__(self, graph: List[Dict], weights: Dict[str, np.ndarray]):
+        unsupported = {node['type'] for node in graph} - SUPPORTED_LAYERS
+        if unsupported:
+            raise ValueError(f"Unsupported layers for NumPy engine: {sorted(unsupported)}")
+        self.graph = graph
+        self.weights = {k: v.astype(np.float32) for k, v in weights.items()}
+        self.input_names = [n['name'] for n in graph if n['type'] == 'InputLayer']
+        self.output_name = graph[-1]['name']
+    
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "NumpyCNNModel":
+        with np.load(path, allow_pickle=False) as data:
+            graph = json.loads(str(data[GRAPH_KEY]))
+            weights = {k: data[k] for k in data.files if k != GRAPH_KEY}
+        return cls(graph, weights)
+    
+    def get_weights(self) -> List[np.ndarray]:
+        return list(self.weights.values())
+    
+    def _run(self, feeds: Dict[str, np.ndarray]) -> np.ndarray:
+        values: Dict[str, np.ndarray] = {}
+        for node in self.graph:
+            name, kind, cfg = node['name'], node['type'], node['config']
+            if kind == 'InputLayer':
+                values[name] = np.asarray(feeds[name], dtype=np.float32)
+                continue
+            
+            inputs = [values[i] for i in node['inputs']]
+            x = inputs[0]
+            if kind == 'Conv1D':
+                y = conv1d(
+                    x, self.weights[f'{name}/kernel'], self.weights[f'{name}/bias'],
+                    stride=cfg['strides'], dilation=cfg['dilation_rate'], padding=cfg['padding']
+                )
+                y = _activation(y, cfg['activation'])
+            elif kind == 'SeparableConv1D':
+                y = separable_conv1d(
+                    x, self.weights[f'{name}/depthwise_kernel'], self.weights[f'{name}/pointwise_kernel'],
+                    self.weights[f'{name}/bias'],
+                    stride=cfg['strides'], dilation=cfg['dilation_rate'], padding=cfg['padding']
+                )
+                y = _activation(y, cfg['activation'])
+            elif kind == 'MaxPooling1D':
+                y = max_pool1d(x, cfg['pool_size'], cfg['strides'], cfg['padding'])
+            elif kind == 'GlobalAveragePooling1D':
+                y = x.mean(axis=1)
+            elif kind == 'Dense':
+                y = _activation(
+                    dense(x, self.weights[f'{name}/kernel'], self.weights[f'{name}/bias']),
+                    cfg['activation']
+                )
+            elif kind == 'Concatenate':
+                y = np.concatenate(inputs, axis=cfg['axis'])
+            elif kind == 'Activation':
+                y = _activation(x, cfg['activation'])
+            else:  # Dropout: identidad en inferencia
+                y = x
+            values[name] = y
+        return values[self.output_name]
+    
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: int = 256, verbose: int = 0) -> np.ndarray:
+        """Inferencia por lotes. `inputs` es {'sig': (B,360,1), 'rr': (B,3)}."""
+        n = len(inputs[self.input_names[0]])
+        outputs = [
+            self._run({k: v[start:start + batch_size] for k, v in inputs.items()})
+            for start in range(0, n, batch_size)
+        ]
+        return np.concatenate(outputs, axis=0) if outputs else np.empty((0, 1), np.float32)
+    
+    __call__ = predict
+
+
+# ----------------------------------------------------------------------
+# Exportación y validación (requieren TensorFlow; solo offline)
+# ----------------------------------------------------------------------
+
+def _first(value):
+    return value[0] if isinstance(value, (list, tuple)) else value
+
+
+def export_keras_model(model, npz_path: Union[str, Path]) -> Path:
+    """
+    Exporta un modelo Keras funcional a un .npz plano: pesos por capa
+    ('<capa>/kernel', '<capa>/bias'; '<capa>/depthwise_kernel' y
+    '<capa>/pointwise_kernel' en SeparableConv1D) y el grafo serializado en
+    '__graph__'.
+    """
+    graph, weights = [], {}
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind not in SUPPORTED_LAYERS:
+            raise ValueError(f"Layer {layer.name} ({kind}) not supported by the NumPy engine")
+        
+        cfg = layer.get_config()
+        node = {'name': layer.name, 'type': kind, 'inputs': [], 'config': {}}
+        if kind != 'InputLayer':
+            tensors = layer.input if isinstance(layer.input, (list, tuple)) else [layer.input]
+            node['inputs'] = [t._keras_history[0].name for t in tensors]
+        
+        if kind in ('Conv1D', 'SeparableConv1D'):
+            node['config'] = {
+                'strides': int(_first(cfg['strides'])),
+                'dilation_rate': int(_first(cfg['dilation_rate'])),
+                'padding': cfg['padding'],
+                'activation': cfg['activation']
+            }
+        elif kind == 'MaxPooling1D':
+            node['config'] = {
+                'pool_size': int(_first(cfg['pool_size'])),
+                'strides': int(_first(cfg['strides'] or cfg['pool_size'])),
+                'padding': cfg['padding']
+            }
+        elif kind in ('Dense', 'Activation'):
+            node['config'] = {'activation': cfg['activation']}
+        elif kind == 'Concatenate':
+            node['config'] = {'axis': int(cfg['axis'])}
+        
+        if kind in ('Conv1D', 'Dense'):
+            kernel, bias = layer.get_weights()
+            weights[f'{layer.name}/kernel'] = kernel.astype(np.float32)
+            weights[f'{layer.name}/bias'] = bias.astype(np.float32)
+        elif kind == 'SeparableConv1D':
+            depthwise, pointwise, bias = layer.get_weights()
+            weights[f'{layer.name}/depthwise_kernel'] = depthwise.astype(np.float32)
+            weights[f'{layer.name}/pointwise_kernel'] = pointwise.astype(np.float32)
+            weights[f'{layer.name}/bias'] = bias.astype(np.float32)
+        graph.append(node)
+    
+    # El nodo de salida debe ser el último en orden topológico
+    output_name = model.outputs[0]._keras_history[0].name
+    if graph[-1]['name'] != output_name:
+        raise ValueError(f"Output layer {output_name} is not the last layer of the graph")
+    
+    npz_path = Path(npz_path)
+    np.savez(npz_path, **{GRAPH_KEY: np.array(json.dumps(graph))}, **weights)
+    return npz_path
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Exporta un modelo .keras al motor NumPy (.npz) y lo valida')
+    parser.add_argument('keras_path', type=Path, help='Ruta al modelo .keras (ej: models/ecg_nv_cnn/model_v7.keras)')
+    parser.add_argument('--out', type=Path, default=None, help='Ruta del .npz (default: junto al .keras)')
+    parser.add_argument('--atol', type=float, default=1e-4, help='Diferencia máxima de probabilidad permitida')
+    parser.add_argument('--samples', type=int, default=1024, help='Muestras para la validación')
+    args = parser.parse_args()
+    
+    import tensorflow as tf
+    from src.infrastructure.ml.parity import check_parity, print_parity_report
+    
+    keras_model = tf.keras.models.load_model(args.keras_path, compile=False)
+    out_path = export_keras_model(keras_model, args.out or args.keras_path.with_suffix('.npz'))
+    print(f"✅ Exportado: {out_path} ({out_path.stat().st_size / 1024:.1f} KB)")
+    
+    passed, report = check_parity(
+        keras_model, NumpyCNNModel.load(out_path), n_samples=args.samples, atol=args.atol
+    )
+    print_parity_report(report, passed, args.atol, backend='NumPy')
+    if not passed:
+        sys.exit(1)
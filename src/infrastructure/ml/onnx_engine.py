@@ -0,0 +1,180 @@
+"""
+ONNX Runtime Inference Engine
+Ejecuta el modelo exportado a ONNX con optimizaciones de grafo, hilos
+intra-op configurables e IO binding sobre buffers NumPy preasignados.
+
+Exportar (offline, requiere TensorFlow + tf2onnx de requirements-dev.txt) y verificar paridad con Keras:
+    python -m src.infrastructure.ml.onnx_engine models/ecg_nv_cnn/model_v7.keras
+    python -m src.infrastructure.ml.onnx_engine models/ecg_nv_cnn/saved_model_v7 --keras models/ecg_nv_cnn/model_v7.keras
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+INPUT_NAMES = ('sig', 'rr')
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+
+
+class OnnxModel:
+    """
+    Sesión de ONNX Runtime con IO binding.
+    
+    Los lotes se redondean a buckets potencia de 2 (hasta `max_batch`) para
+    reutilizar un número acotado de buffers de entrada/salida preasignados.
+    Expone `predict()` con la misma firma que un modelo Keras.
+    """
+    
+    def __init__(
+        self,
+        path: Union[str, Path],
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 1,
+        optimization_level: str = 'all',
+        max_batch: int = 256
+    ):
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[optimization_level]
+        )
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        
+        self.path = Path(path)
+        self.session = ort.InferenceSession(
+            str(path), sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_shapes = {
+            i.name: tuple(d if isinstance(d, int) else -1 for d in i.shape)
+            for i in self.session.get_inputs()
+        }
+        missing = set(INPUT_NAMES) - set(self.input_shapes)
+        if missing:
+            raise ValueError(f"ONNX model is missing inputs: {sorted(missing)}")
+        self.output_name = self.session.get_outputs()[0].name
+        self.max_batch = max_batch
+        self._buffers: Dict[int, Tuple[Dict[str, np.ndarray], np.ndarray, object]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _bucket(n: int, max_batch: int) -> int:
+        return min(max_batch, 1 << max(0, int(n - 1).bit_length()))
+    
+    def _binding(self, bucket: int):
+        """Crea (una vez por bucket) los buffers preasignados y su IO binding."""
+        if bucket not in self._buffers:
+            inputs = {
+                name: np.zeros((bucket,) + shape[1:], dtype=np.float32)
+                for name, shape in self.input_shapes.items()
+            }
+            output = np.zeros((bucket, 1), dtype=np.float32)
+            binding = self.session.io_binding()
+            for name, buf in inputs.items():
+                binding.bind_input(name, 'cpu', 0, np.float32, list(buf.shape), buf.ctypes.data)
+            binding.bind_output(self.output_name, 'cpu', 0, np.float32, list(output.shape), output.ctypes.data)
+            self._buffers[bucket] = (inputs, output, binding)
+        return self._buffers[bucket]
+    
+    def _run_chunk(self, chunk: Dict[str, np.ndarray]) -> np.ndarray:
+        n = len(chunk[INPUT_NAMES[0]])
+        inputs, output, binding = self._binding(self._bucket(n, self.max_batch))
+        for name, buf in inputs.items():
+            buf[:n] = chunk[name]
+            buf[n:] = 0.0
+        self.session.run_with_iobinding(binding)
+        return output[:n].copy()
+    
+    def predict(self, inputs: Dict[str, np.ndarray], batch_size: int = 256, verbose: int = 0) -> np.ndarray:
+        """Inferencia por lotes. `inputs` es {'sig': (B,360,1), 'rr': (B,3)}."""
+        n = len(inputs[INPUT_NAMES[0]])
+        step = min(batch_size, self.max_batch)
+        with self._lock:
+            outputs = [
+                self._run_chunk({k: inputs[k][start:start + step] for k in INPUT_NAMES})
+                for start in range(0, n, step)
+            ]
+        return np.concatenate(outputs, axis=0) if outputs else np.empty((0, 1), np.float32)
+
+
+# ----------------------------------------------------------------------
+# Exportación (offline; requiere TensorFlow + tf2onnx)
+# ----------------------------------------------------------------------
+
+def export_to_onnx(source: Union[str, Path], onnx_path: Union[str, Path], win: int = 360, opset: int = 17) -> Path:
+    """
+    Convierte un modelo `.keras` o un directorio SavedModel a ONNX con
+    entradas dinámicas en batch: sig (B, win, 1) y rr (B, 3).
+    """
+    import tensorflow as tf
+    import tf2onnx
+    
+    source = Path(source)
+    spec = (
+        tf.TensorSpec((None, win, 1), tf.float32, name='sig'),
+        tf.TensorSpec((None, 3), tf.float32, name='rr'),
+    )
+    
+    if source.is_dir():
+        # Mantener la referencia al objeto cargado: sus variables viven con él
+        loaded = tf.saved_model.load(str(source))
+        
+        @tf.function(input_signature=spec)
+        def serve(sig, rr):
+            outputs = loaded.signatures['serving_default'](sig=sig, rr=rr)
+            return next(iter(outputs.values()))
+    else:
+        model = tf.keras.models.load_model(source, compile=False)
+        
+        @tf.function(input_signature=spec)
+        def serve(sig, rr):
+            return model({'sig': sig, 'rr': rr}, training=False)
+    
+    onnx_path = Path(onnx_path)
+    tf2onnx.convert.from_function(serve, input_signature=spec, opset=opset, output_path=str(onnx_path))
+    return onnx_path
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Exporta model_v7.keras o saved_model_v7 a ONNX y verifica paridad con Keras')
+    parser.add_argument('source', type=Path, help='Modelo .keras o directorio SavedModel')
+    parser.add_argument('--out', type=Path, default=None, help='Ruta del .onnx (default: <MODEL_DIR>/model_vN.onnx)')
+    parser.add_argument('--keras', type=Path, default=None, help='Modelo .keras de referencia para la paridad (default: source si es .keras)')
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--atol', type=float, default=1e-4, help='Diferencia máxima de probabilidad permitida')
+    parser.add_argument('--samples', type=int, default=1024, help='Muestras para la validación')
+    args = parser.parse_args()
+    
+    import tensorflow as tf
+    from src.infrastructure.ml.parity import check_parity, print_parity_report
+    
+    source = args.source
+    default_out = (
+        source.parent / f"{source.name.replace('saved_', '')}.onnx" if source.is_dir()
+        else source.with_suffix('.onnx')
+    )
+    out_path = export_to_onnx(source, args.out or default_out, opset=args.opset)
+    print(f"✅ Exportado: {out_path} ({out_path.stat().st_size / 1024:.1f} KB)")
+    
+    reference_path = args.keras or (None if source.is_dir() else source)
+    if reference_path is None:
+        print("ℹ️  Sin modelo .keras de referencia (--keras); se omite la verificación de paridad")
+        sys.exit(0)
+    
+    keras_model = tf.keras.models.load_model(reference_path, compile=False)
+    passed, report = check_parity(keras_model, OnnxModel(out_path), n_samples=args.samples, atol=args.atol)
+    print_parity_report(report, passed, args.atol, backend='ONNX')
+    if not passed:
+        sys.exit(1)
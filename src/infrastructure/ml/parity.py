@@ -0,0 +1,60 @@
+"""
+Parity Check
+Compara las probabilidades de un backend de inferencia con las de Keras.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def synthetic_inputs(n_samples: int = 1024, win: int = 360, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Entradas aleatorias con la misma forma y escala que el pipeline:
+    ventanas z-score (B, win, 1) y RR [prev, next, ratio] (B, 3).
+    """
+    rng = np.random.default_rng(seed)
+    sig = rng.standard_normal((n_samples, win, 1)).astype(np.float32)
+    rr_prev = rng.uniform(0.4, 1.6, n_samples)
+    rr_next = rng.uniform(0.4, 1.6, n_samples)
+    rr = np.stack([rr_prev, rr_next, rr_next / rr_prev], axis=1).astype(np.float32)
+    return {'sig': sig, 'rr': rr}
+
+
+def compare_probabilities(reference: np.ndarray, candidate: np.ndarray, threshold: float = 0.5) -> Dict[str, float]:
+    """Diferencia máxima/media de probabilidad y acuerdo de etiquetas."""
+    reference = np.asarray(reference, dtype=np.float64).ravel()
+    candidate = np.asarray(candidate, dtype=np.float64).ravel()
+    diff = np.abs(reference - candidate)
+    return {
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+        'label_agreement': float(np.mean((reference >= threshold) == (candidate >= threshold)))
+    }
+
+
+def check_parity(
+    reference_model,
+    candidate_model,
+    n_samples: int = 1024,
+    win: int = 360,
+    atol: float = 1e-4,
+    seed: int = 0
+) -> Tuple[bool, Dict[str, float]]:
+    """
+    Ejecuta ambos modelos (cualquier objeto con `predict(inputs, batch_size=...)`)
+    sobre las mismas entradas y verifica que max|Δp| <= atol.
+    """
+    inputs = synthetic_inputs(n_samples, win, seed)
+    p_ref = reference_model.predict(inputs, batch_size=256, verbose=0)
+    p_cand = candidate_model.predict(inputs, batch_size=256, verbose=0)
+    report = compare_probabilities(p_ref, p_cand)
+    return report['max_abs_diff'] <= atol, report
+
+
+def print_parity_report(report: Dict[str, float], passed: bool, atol: float, backend: str):
+    print(f"   max|Δp|={report['max_abs_diff']:.2e} | mean|Δp|={report['mean_abs_diff']:.2e} | "
+          f"acuerdo etiquetas={report['label_agreement']:.4f}")
+    if passed:
+        print(f"✅ Paridad {backend} vs Keras verificada")
+    else:
+        print(f"❌ Diferencia por encima de la tolerancia ({atol})")
@@ -0,0 +1,228 @@
+"""
+Process-Pool Preprocessing
+Ejecuta filtrado, detección de picos R y extracción de ventanas en un pool de
+procesos. La señal de entrada y la matriz de ventanas resultante viajan por
+segmentos de `multiprocessing.shared_memory` reutilizados entre peticiones;
+por la cola del pool solo pasan nombres de segmento y contadores.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.domain.entities import ECGSignal
+from .signal_processor import SignalProcessor, ProcessedSignalData
+
+MIN_SEGMENT_BYTES = 64 * 1024
+
+
+class SharedMemoryPool:
+    """
+    Pool de segmentos de memoria compartida agrupados por capacidad
+    (potencias de 2). Los segmentos liberados se reutilizan en lugar de
+    crear y destruir uno por petición.
+    """
+    
+    def __init__(self, max_free_per_size: int = 8):
+        self.max_free_per_size = max_free_per_size
+        self._free: Dict[int, List[shared_memory.SharedMemory]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _capacity(nbytes: int) -> int:
+        return max(MIN_SEGMENT_BYTES, 1 << max(0, int(nbytes - 1).bit_length()))
+    
+    def acquire(self, nbytes: int) -> shared_memory.SharedMemory:
+        capacity = self._capacity(nbytes)
+        with self._lock:
+            free = self._free.get(capacity)
+            if free:
+                return free.pop()
+        return shared_memory.SharedMemory(create=True, size=capacity)
+    
+    def release(self, segment: shared_memory.SharedMemory):
+        capacity = self._capacity(segment.size)
+        with self._lock:
+            free = self._free.setdefault(capacity, [])
+            if len(free) < self.max_free_per_size:
+                free.append(segment)
+                return
+        segment.close()
+        segment.unlink()
+    
+    def close(self):
+        with self._lock:
+            segments = [s for free in self._free.values() for s in free]
+            self._free.clear()
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+
+# ----------------------------------------------------------------------
+# Lado worker (se ejecuta en los procesos del pool)
+# ----------------------------------------------------------------------
+
+MAX_ATTACHED_SEGMENTS = 64
+
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_processors: Dict[Tuple[int, int], SignalProcessor] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Abre (una vez por worker) un segmento del pool; los segmentos se reutilizan."""
+    segment = _attached.pop(name, None)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        if len(_attached) >= MAX_ATTACHED_SEGMENTS:
+            # El más antiguo probablemente ya fue desalojado del pool por el padre
+            _attached.pop(next(iter(_attached))).close()
+    _attached[name] = segment
+    return segment
+
+
+def output_layout(max_peaks: int, window_size: int) -> Tuple[int, int, int, int]:
+    """Offsets en bytes de (windows, rr, peaks) y tamaño total del segmento de salida."""
+    windows_bytes = max_peaks * window_size * 4
+    rr_bytes = max_peaks * 2 * 8
+    return 0, windows_bytes, windows_bytes + rr_bytes, windows_bytes + rr_bytes + max_peaks * 8
+
+
+def preprocess_shared(task: dict) -> Tuple[int, int]:
+    """
+    Preprocesa la señal del segmento de entrada y escribe en el de salida:
+    ventanas (N, W) float32, RR (N, 2) float64 y todos los picos R (P,) int64.
+    
+    Returns:
+        (número de picos R, número de ventanas)
+    """
+    key = (task['sampling_rate'], task['window_size'])
+    processor = _processors.get(key)
+    if processor is None:
+        processor = _processors[key] = SignalProcessor(*key)
+    
+    n, max_peaks, win = task['n_samples'], task['max_peaks'], task['window_size']
+    signal = np.ndarray((n,), dtype=np.float64, buffer=_attach(task['input']).buf)
+    
+    filtered = processor.bandpass_filter(signal)
+    r_peaks = processor.detect_r_peaks(filtered)
+    if len(r_peaks) > max_peaks:
+        raise ValueError(f"Detected {len(r_peaks)} R peaks, buffer holds {max_peaks}")
+    
+    out = _attach(task['output']).buf
+    windows_off, rr_off, peaks_off, _ = output_layout(max_peaks, win)
+    np.ndarray((len(r_peaks),), dtype=np.int64, buffer=out, offset=peaks_off)[:] = r_peaks
+    if len(r_peaks) < 2:
+        return len(r_peaks), 0
+    
+    windows, rr, _ = processor.extract_window_matrix(filtered, r_peaks)
+    count = len(windows)
+    np.ndarray((count, win), dtype=np.float32, buffer=out, offset=windows_off)[:] = windows
+    np.ndarray((count, 2), dtype=np.float64, buffer=out, offset=rr_off)[:] = rr
+    return len(r_peaks), count
+
+
+# ----------------------------------------------------------------------
+# Lado servicio
+# ----------------------------------------------------------------------
+
+class ParallelSignalProcessor(SignalProcessor):
+    """
+    SignalProcessor que delega el preprocesamiento a un pool de procesos.
+    
+    El pool y los segmentos se crean de forma perezosa en el proceso que los
+    usa: tras un fork (servidor pre-fork) cada worker crea los suyos en lugar
+    de heredar los del master. Señales cortas (< `min_samples`) se procesan en
+    el propio proceso, donde el coste de IPC no compensa.
+    """
+    
+    def __init__(
+        self,
+        sampling_rate: int = 360,
+        window_size: int = 360,
+        workers: int = 2,
+        min_samples: int = 20000,
+        mp_context: Optional[str] = None
+    ):
+        super().__init__(sampling_rate=sampling_rate, window_size=window_size)
+        self.workers = workers
+        self.min_samples = min_samples
+        self.mp_context = mp_context or (
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._segments: Optional[SharedMemoryPool] = None
+        self._owner_pid: Optional[int] = None
+        self._init_lock = threading.Lock()
+    
+    def _ensure_pool(self) -> Tuple[ProcessPoolExecutor, SharedMemoryPool]:
+        with self._init_lock:
+            if self._owner_pid != os.getpid():
+                # Lo heredado de otro proceso no se cierra: pertenece al padre
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.mp_context)
+                )
+                self._segments = SharedMemoryPool(max_free_per_size=2 * self.workers)
+                self._owner_pid = os.getpid()
+            return self._executor, self._segments
+    
+    def max_peaks(self, n_samples: int) -> int:
+        """Cota superior de picos R: find_peaks impone la distancia mínima de 200 ms."""
+        return n_samples // max(1, int(0.2 * self.sampling_rate)) + 1
+    
+    async def process_signal(self, ecg_signal: ECGSignal) -> ProcessedSignalData:
+        signal = np.asarray(ecg_signal.signal_data, dtype=np.float64)
+        if len(signal) < self.min_samples:
+            return await super().process_signal(ecg_signal)
+        
+        executor, segments = self._ensure_pool()
+        max_peaks = self.max_peaks(len(signal))
+        windows_off, rr_off, peaks_off, out_bytes = output_layout(max_peaks, self.window_size)
+        
+        seg_in = segments.acquire(signal.nbytes)
+        seg_out = segments.acquire(out_bytes)
+        try:
+            np.ndarray(signal.shape, dtype=np.float64, buffer=seg_in.buf)[:] = signal
+            task = {
+                'input': seg_in.name,
+                'output': seg_out.name,
+                'n_samples': len(signal),
+                'max_peaks': max_peaks,
+                'sampling_rate': self.sampling_rate,
+                'window_size': self.window_size,
+            }
+            n_peaks, count = await asyncio.get_running_loop().run_in_executor(
+                executor, preprocess_shared, task
+            )
+            
+            # Copiar fuera de los segmentos antes de devolverlos al pool
+            buf = seg_out.buf
+            r_peaks = np.ndarray((n_peaks,), dtype=np.int64, buffer=buf, offset=peaks_off).copy()
+            windows = np.ndarray((count, self.window_size), dtype=np.float32, buffer=buf, offset=windows_off).copy()
+            rr = np.ndarray((count, 2), dtype=np.float64, buffer=buf, offset=rr_off).copy()
+            del buf
+        finally:
+            segments.release(seg_in)
+            segments.release(seg_out)
+        
+        if n_peaks < 2:
+            return ProcessedSignalData(windows=[], rr_intervals=[], r_peaks=r_peaks)
+        
+        centers = r_peaks[self.window_mask(r_peaks, len(signal))]
+        signal_windows, rr_intervals = self.windows_to_value_objects(windows, rr, centers)
+        return ProcessedSignalData(windows=signal_windows, rr_intervals=rr_intervals, r_peaks=r_peaks)
+    
+    def shutdown(self):
+        """Detiene el pool y libera los segmentos creados por este proceso."""
+        with self._init_lock:
+            if self._owner_pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._segments.close()
+            self._executor = self._segments = self._owner_pid = None
+
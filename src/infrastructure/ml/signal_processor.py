@@ -4,13 +4,62 @@ Maneja el preprocesamiento de señales ECG: filtrado, detección de picos, extra
 """
 import numpy as np
 from scipy.signal import butter, filtfilt, find_peaks
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
 from src.domain.entities import ECGSignal
 from src.domain.value_objects import SignalWindow, RRInterval
 
 
+def qrs_widths_ms(
+    X: np.ndarray,
+    fs: int = 360,
+    rel_thr: float = 0.5,
+    max_ms: float = 200.0,
+    center: Optional[int] = None
+) -> np.ndarray:
+    """
+    Ancho QRS aproximado (ms) de cada ventana de X (N, L) o (N, L, 1).
+    
+    Envolvente de la derivada (media móvil de 5) y extensión desde el centro
+    mientras supera `rel_thr` x pico local (±20 muestras), con tope `max_ms`.
+    Es la única implementación: la usan la API (RuleGuard y monitor de drift)
+    y el entrenamiento (sintonía de RuleGuard y perfil de drift), así que los
+    umbrales de `ruleguard_config` y los histogramas de referencia se
+    calculan igual que en producción.
+    """
+    X = np.asarray(X)
+    if X.ndim == 3:
+        X = X[..., 0]
+    n, length = X.shape
+    if n == 0:
+        return np.empty(0)
+    c = length // 2 if center is None else center
+    
+    dv = np.abs(np.diff(X, axis=1, prepend=X[:, :1])).astype(np.float64)
+    # np.convolve(dv, ones(5)/5, mode='same') fila a fila
+    envelope = np.zeros((n, length))
+    for shift in range(-2, 3):
+        lo, hi = max(0, shift), length + min(0, shift)
+        envelope[:, lo - shift:hi - shift] += dv[:, lo:hi] / 5.0
+    
+    peak = envelope[:, max(0, c - 20):min(length, c + 20)].max(axis=1) + 1e-9
+    below = envelope <= (rel_thr * peak)[:, None]
+    
+    # Izquierda: último j en [2, c] bajo el umbral (si no hay, para en 1);
+    # derecha: primer j en [c, L-3] bajo el umbral (si no hay, para en L-2)
+    left_zone = below[:, 2:c + 1][:, ::-1]
+    right_zone = below[:, c:length - 2]
+    left = np.full(n, c)
+    right = np.full(n, c)
+    if c > 1:
+        left = np.where(left_zone.any(axis=1), c - left_zone.argmax(axis=1), 1)
+    if c < length - 2:
+        right = np.where(right_zone.any(axis=1), c + right_zone.argmax(axis=1), length - 2)
+    
+    return np.minimum(1000.0 * (right - left) / fs, max_ms)
+
+
 @dataclass
 class ProcessedSignalData:
     """Datos procesados de una señal ECG."""
@@ -28,6 +77,22 @@ class SignalProcessor:
         self.sampling_rate = sampling_rate
         self.window_size = window_size
         self.half_window = window_size // 2
+        # Banco de filtros: coeficientes (b, a) por (low, high, order), calculados una vez
+        self._filter_bank: Dict[Tuple[float, float, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self.filter_coefficients()
+    
+    def filter_coefficients(
+        self,
+        low: float = 0.5,
+        high: float = 40.0,
+        order: int = 4
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Coeficientes Butterworth pasa-banda (cacheados)."""
+        key = (low, high, order)
+        if key not in self._filter_bank:
+            nyquist = 0.5 * self.sampling_rate
+            self._filter_bank[key] = butter(order, [low / nyquist, high / nyquist], btype='band')
+        return self._filter_bank[key]
     
     def bandpass_filter(
         self,
@@ -37,10 +102,7 @@ class SignalProcessor:
         order: int = 4
     ) -> np.ndarray:
         """Aplica filtro pasa-banda a la señal."""
-        nyquist = 0.5 * self.sampling_rate
-        low_norm = low / nyquist
-        high_norm = high / nyquist
-        b, a = butter(order, [low_norm, high_norm], btype='band')
+        b, a = self.filter_coefficients(low, high, order)
         return filtfilt(b, a, signal, method="gust")
     
     def detect_r_peaks(self, signal: np.ndarray) -> np.ndarray:
@@ -59,48 +121,67 @@ class SignalProcessor:
         )
         return peaks
     
-    def extract_windows_and_rr(
+    def window_mask(self, r_peaks: np.ndarray, n_samples: int) -> np.ndarray:
+        """Picos R cuya ventana cabe completa en la señal."""
+        return (r_peaks - self.half_window >= 0) & (r_peaks + self.half_window <= n_samples)
+    
+    def extract_window_matrix(
         self,
         signal: np.ndarray,
         r_peaks: np.ndarray
-    ) -> Tuple[List[SignalWindow], List[RRInterval]]:
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Extrae ventanas centradas en picos R y calcula intervalos RR.
+        Extrae de forma vectorizada las ventanas centradas en picos R.
+        
+        Returns:
+            windows: (N, window_size) float32 normalizadas con z-score
+            rr: (N, 2) intervalos RR [anterior, siguiente] en segundos
+            centers: (N,) muestra central de cada ventana
         """
-        windows = []
-        rr_intervals = []
+        r_peaks = np.asarray(r_peaks, dtype=np.int64)
         
-        # Calcular intervalos RR en segundos
-        rr_samples = np.diff(r_peaks)
-        rr_seconds = rr_samples / self.sampling_rate
+        # RR por pico (sobre todos los picos, también los que no caben en la señal)
+        rr_seconds = np.diff(r_peaks) / self.sampling_rate
+        if len(rr_seconds) > 0:
+            rr_prev = np.concatenate([rr_seconds[:1], rr_seconds])
+            rr_next = np.concatenate([rr_seconds, rr_seconds[-1:]])
+        else:
+            rr_prev = rr_next = np.full(len(r_peaks), 0.8)
         
-        for i, peak in enumerate(r_peaks):
-            # Verificar que la ventana cabe en la señal
-            start = peak - self.half_window
-            end = peak + self.half_window
-            
-            if start < 0 or end > len(signal):
-                continue
-            
-            # Extraer ventana
-            window_data = signal[start:end]
-            
-            # Crear SignalWindow normalizado
-            window = SignalWindow.create_normalized(
-                data=window_data,
-                center_sample=peak,
-                sampling_rate=self.sampling_rate
-            )
-            windows.append(window)
-            
-            # Calcular RR intervals
-            rr_prev = rr_seconds[i-1] if i > 0 else rr_seconds[0] if len(rr_seconds) > 0 else 0.8
-            rr_next = rr_seconds[i] if i < len(rr_seconds) else rr_seconds[-1] if len(rr_seconds) > 0 else 0.8
-            
-            rr_interval = RRInterval(previous=rr_prev, next=rr_next)
-            rr_intervals.append(rr_interval)
+        valid = self.window_mask(r_peaks, len(signal))
+        centers = r_peaks[valid]
+        offsets = np.arange(-self.half_window, self.half_window)
+        segments = np.asarray(signal, dtype=np.float64)[centers[:, None] + offsets]
         
-        return windows, rr_intervals
+        mean = segments.mean(axis=1, keepdims=True)
+        std = segments.std(axis=1, keepdims=True)
+        windows = ((segments - mean) / (std + 1e-6)).astype(np.float32)
+        rr = np.stack([rr_prev[valid], rr_next[valid]], axis=1)
+        return windows, rr, centers
+    
+    def windows_to_value_objects(
+        self,
+        windows: np.ndarray,
+        rr: np.ndarray,
+        centers: np.ndarray
+    ) -> Tuple[List[SignalWindow], List[RRInterval]]:
+        """Envuelve la matriz de ventanas en los value objects del dominio."""
+        signal_windows = [
+            SignalWindow(data=windows[i], center_sample=int(centers[i]), sampling_rate=self.sampling_rate)
+            for i in range(len(centers))
+        ]
+        rr_intervals = [RRInterval(previous=float(p), next=float(n)) for p, n in rr]
+        return signal_windows, rr_intervals
+    
+    def extract_windows_and_rr(
+        self,
+        signal: np.ndarray,
+        r_peaks: np.ndarray
+    ) -> Tuple[List[SignalWindow], List[RRInterval]]:
+        """
+        Extrae ventanas centradas en picos R y calcula intervalos RR.
+        """
+        return self.windows_to_value_objects(*self.extract_window_matrix(signal, r_peaks))
     
     async def process_signal(self, ecg_signal: ECGSignal) -> ProcessedSignalData:
         """
@@ -134,29 +215,10 @@ class SignalProcessor:
     def estimate_qrs_width(self, window_data: np.ndarray) -> float:
         """
         Estima el ancho del complejo QRS en milisegundos.
-        Aproximación basada en la envolvente de la derivada.
+        Aproximación basada en la envolvente de la derivada (ver `qrs_widths_ms`).
         """
-        center = len(window_data) // 2
-        
-        # Calcular derivada y envolvente
-        dv = np.abs(np.diff(window_data, prepend=window_data[0]))
-        kernel = np.ones(5) / 5.0
-        envelope = np.convolve(dv, kernel, mode='same')
-        
-        # Encontrar ancho usando umbral relativo
-        peak_value = np.max(envelope[max(0, center-20):min(len(envelope), center+20)])
-        threshold = 0.5 * peak_value
-        
-        # Buscar límites izquierdo y derecho
-        left = center
-        while left > 1 and envelope[left] > threshold:
-            left -= 1
-        
-        right = center
-        while right < len(envelope) - 2 and envelope[right] > threshold:
-            right += 1
-        
-        width_samples = right - left
-        width_ms = (width_samples / self.sampling_rate) * 1000.0
-        
-        return min(width_ms, 200.0)  # Cap at 200ms
+        return float(qrs_widths_ms(np.asarray(window_data)[None, :], fs=self.sampling_rate)[0])
+    
+    def estimate_qrs_widths(self, windows: np.ndarray) -> np.ndarray:
+        """Ancho QRS (ms) de cada fila de una matriz de ventanas (N, L)."""
+        return qrs_widths_ms(windows, fs=self.sampling_rate)
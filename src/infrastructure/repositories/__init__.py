@@ -3,5 +3,6 @@ Repository implementations
 """
 from .model_repository import ModelRepository
 from .in_memory_prediction_repository import InMemoryPredictionRepository
+from .model_registry import ModelRegistry
 
-__all__ = ['ModelRepository', 'InMemoryPredictionRepository']
+__all__ = ['ModelRepository', 'InMemoryPredictionRepository', 'ModelRegistry']
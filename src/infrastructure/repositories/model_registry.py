@@ -0,0 +1,232 @@
+"""
+Model Registry
+Resuelve alias de modelo (ej: 'production') a versiones concretas y
+permite promover nuevas versiones en caliente sin downtime.
+"""
+import time
+import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.infrastructure.repositories.model_repository import ModelRepository
+
+
+class ModelRegistry:
+    """
+    Registro de versiones de modelo.
+    
+    - Alias -> versión (swap atómico al promover).
+    - Conteo de peticiones en vuelo por versión para drenar la versión anterior.
+    - Cache con presupuesto de memoria: se desalojan (LRU) las versiones sin
+      alias y sin peticiones en vuelo cuando se supera el presupuesto.
+    """
+    
+    def __init__(
+        self,
+        model_repository: ModelRepository,
+        default_alias: str,
+        default_version: str,
+        memory_budget_mb: float = 512.0,
+        drain_timeout_s: float = 30.0
+    ):
+        self.model_repository = model_repository
+        self.default_alias = default_alias
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.drain_timeout_s = drain_timeout_s
+        self._aliases: Dict[str, str] = {default_alias: default_version}
+        self._in_flight: Dict[str, int] = {}
+        self._promote_lock = asyncio.Lock()
+        self._warmup_fn: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._swap_fn: Optional[Callable[[str, str], Any]] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._watch_mtime: Optional[float] = None
+    
+    def set_warmup(self, warmup_fn: Callable[[str], Awaitable[Any]]):
+        """Registra la función que calienta una versión antes de promoverla."""
+        self._warmup_fn = warmup_fn
+    
+    def set_swap_hook(self, swap_fn: Callable[[str, str], Any]):
+        """Registra la función que se llama con (alias, versión) justo después de cada swap."""
+        self._swap_fn = swap_fn
+    
+    def resolve(self, name: Optional[str] = None) -> str:
+        """Resuelve un alias a su versión. Si no es alias, se asume que ya es una versión."""
+        name = name or self.default_alias
+        return self._aliases.get(name, name)
+    
+    @property
+    def aliases(self) -> Dict[str, str]:
+        return dict(self._aliases)
+    
+    def has_alias(self, alias: str) -> bool:
+        return alias in self._aliases
+    
+    def set_aliases(self, entries: Dict[str, str]):
+        """Fija alias sin promover (solo para el arranque, antes de recibir tráfico)."""
+        self._aliases.update(entries)
+    
+    @asynccontextmanager
+    async def acquire(self, name: Optional[str] = None):
+        """
+        Obtiene el modelo de un alias/versión y lo marca como en uso
+        mientras dure el bloque `async with`.
+        
+        Yields:
+            Tupla (versión, modelo)
+        """
+        version = self.resolve(name)
+        self._in_flight[version] = self._in_flight.get(version, 0) + 1
+        try:
+            model = await self.model_repository.load_model(version)
+            yield version, model
+        finally:
+            self._in_flight[version] -= 1
+    
+    async def promote(self, version: str, alias: Optional[str] = None) -> Dict:
+        """
+        Carga (en background, single-flight), calienta y promueve `version` al alias.
+        Luego drena las peticiones en vuelo de la versión anterior y aplica
+        el presupuesto de memoria.
+        """
+        alias = alias or self.default_alias
+        async with self._promote_lock:
+            previous = self._aliases.get(alias)
+            
+            await self.model_repository.load_model(version)
+            warmup_report = None
+            if self._warmup_fn is not None:
+                warmup_report = await self._warmup_fn(version)
+            
+            # Swap atómico: las nuevas peticiones ya resuelven a la nueva versión
+            self._aliases[alias] = version
+            if self._swap_fn is not None:
+                self._swap_fn(alias, version)
+            
+            drained = True
+            if previous and previous != version:
+                drained = await self._drain(previous)
+            evicted = self._enforce_memory_budget()
+        
+        return {
+            'alias': alias,
+            'version': version,
+            'previous_version': previous,
+            'drained': drained,
+            'evicted': evicted,
+            'warmup': warmup_report.summary() if warmup_report is not None else []
+        }
+    
+    async def _drain(self, version: str) -> bool:
+        """Espera a que terminen las peticiones en vuelo de una versión."""
+        deadline = time.monotonic() + self.drain_timeout_s
+        while self._in_flight.get(version, 0) > 0:
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+    
+    def _enforce_memory_budget(self) -> list:
+        """Desaloja versiones (LRU) no referenciadas por ningún alias ni en uso."""
+        evicted = []
+        pinned = set(self._aliases.values())
+        loaded = self.model_repository.loaded_models()
+        candidates = sorted(
+            (name for name in loaded
+             if name not in pinned and self._in_flight.get(name, 0) == 0),
+            key=lambda name: loaded[name]['last_used']
+        )
+        for name in candidates:
+            if self.model_repository.memory_used_bytes() <= self.memory_budget_bytes:
+                break
+            self.model_repository.unload_model(name)
+            evicted.append(name)
+        return evicted
+    
+    def status(self) -> Dict:
+        """Estado del registro para el endpoint de administración."""
+        loaded = self.model_repository.loaded_models()
+        return {
+            'aliases': self.aliases,
+            'loaded': [
+                {
+                    'version': name,
+                    'size_mb': round(info['size_bytes'] / (1024 * 1024), 3),
+                    'in_flight': self._in_flight.get(name, 0)
+                }
+                for name, info in loaded.items()
+            ],
+            'memory_used_mb': round(self.model_repository.memory_used_bytes() / (1024 * 1024), 3),
+            'memory_budget_mb': round(self.memory_budget_bytes / (1024 * 1024), 3)
+        }
+    
+    # ------------------------------------------------------------------
+    # Recarga por archivo vigilado en MODEL_DIR
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def parse_active_file(path: Path, default_alias: str) -> Dict[str, str]:
+        """
+        Lee el archivo de versiones activas. Formato, una entrada por línea:
+            model_v8                 (alias por defecto)
+            canary=model_v9          (alias explícito)
+        Las líneas vacías o que empiezan con '#' se ignoran.
+        """
+        entries = {}
+        for line in path.read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if '=' in line:
+                alias, version = (part.strip() for part in line.split('=', 1))
+            else:
+                alias, version = default_alias, line
+            entries[alias] = version
+        return entries
+    
+    def save_active_entry(self, path: Path, alias: str, version: str):
+        """Fija `alias` -> `version` en el archivo de versiones activas (conserva las demás entradas)."""
+        entries = self.parse_active_file(path, self.default_alias) if path.exists() else {}
+        entries[alias] = version
+        lines = [v if a == self.default_alias else f"{a}={v}" for a, v in entries.items()]
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text('\n'.join(lines) + '\n')
+        tmp.replace(path)
+    
+    async def apply_active_file(self, path: Path) -> list:
+        """Promueve las versiones declaradas en el archivo que difieran de las actuales."""
+        results = []
+        for alias, version in self.parse_active_file(path, self.default_alias).items():
+            if self._aliases.get(alias) != version:
+                results.append(await self.promote(version, alias))
+        return results
+    
+    def start_watching(self, path: Path, interval_s: float):
+        """Inicia la tarea que vigila el archivo de versiones activas."""
+        if self._watch_task is None and interval_s > 0:
+            self._watch_mtime = path.stat().st_mtime if path.exists() else None
+            self._watch_task = asyncio.create_task(self._watch(path, interval_s))
+    
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+    
+    async def _watch(self, path: Path, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            if not path.exists():
+                continue
+            mtime = path.stat().st_mtime
+            if mtime == self._watch_mtime:
+                continue
+            self._watch_mtime = mtime
+            try:
+                for result in await self.apply_active_file(path):
+                    print(f"🔄 Model alias '{result['alias']}' -> {result['version']}")
+            except Exception as e:
+                print(f"⚠️  Warning: Could not reload model from {path}: {e}")
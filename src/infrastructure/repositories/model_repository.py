@@ -4,9 +4,10 @@ Implementa la carga y gestión de modelos ML.
 """
 import os
 import json
+import time
+import asyncio
 from pathlib import Path
 from typing import Any, Optional, Dict
-import tensorflow as tf
 
 from src.domain.repositories import IModelRepository
 from src.shared.exceptions import ModelNotFoundError
@@ -15,13 +16,31 @@ from src.shared.exceptions import ModelNotFoundError
 class ModelRepository(IModelRepository):
     """
     Implementación del repositorio de modelos ML.
-    Carga y cachea modelos TensorFlow/Keras.
+    Carga y cachea modelos TensorFlow/Keras o sus exportaciones NumPy (.npz)
+    y ONNX (.onnx), según el backend configurado. TensorFlow solo se importa
+    con backend 'keras'.
+    
+    La carga es single-flight: peticiones concurrentes del mismo modelo
+    esperan la misma tarea en lugar de leerlo de disco varias veces.
     """
     
-    def __init__(self, model_dir: Path):
+    BACKEND_EXTENSIONS = {
+        'keras': '.keras',
+        'numpy': '.npz',
+        'onnx': '.onnx',
+    }
+    
+    def __init__(self, model_dir: Path, backend: str = 'keras', backend_options: Optional[dict] = None):
+        if backend not in self.BACKEND_EXTENSIONS:
+            raise ValueError(f"Unknown model backend: {backend}")
         self.model_dir = model_dir
+        self.backend = backend
+        self.backend_options = backend_options or {}
         self._model_cache: Dict[str, Any] = {}
         self._metadata_cache: Dict[str, dict] = {}
+        self._model_sizes: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
     
     async def load_model(self, model_name: str) -> Any:
         """
@@ -29,35 +48,75 @@ class ModelRepository(IModelRepository):
         
         Args:
             model_name: Nombre del modelo (ej: 'model_v7')
-            
+        
         Returns:
             Modelo de TensorFlow/Keras cargado
         """
         # Revisar cache
         if model_name in self._model_cache:
+            self._last_used[model_name] = time.monotonic()
             return self._model_cache[model_name]
         
-        # Buscar archivo .keras
-        model_path = self.model_dir / f"{model_name}.keras"
+        # Single-flight: reutilizar la carga en curso si existe
+        task = self._loading.get(model_name)
+        if task is None:
+            task = asyncio.ensure_future(self._load_into_cache(model_name))
+            self._loading[model_name] = task
+        
+        return await asyncio.shield(task)
+    
+    async def _load_into_cache(self, model_name: str) -> Any:
+        """Carga el modelo en un hilo (sin bloquear el event loop) y lo cachea."""
+        try:
+            model = await asyncio.to_thread(self._load_from_disk, model_name)
+            self._model_cache[model_name] = model
+            self._model_sizes[model_name] = self._estimate_size(model_name, model)
+            self._last_used[model_name] = time.monotonic()
+            return model
+        finally:
+            self._loading.pop(model_name, None)
+    
+    def model_path(self, model_name: str) -> Path:
+        """Ruta del artefacto del modelo para el backend configurado."""
+        return self.model_dir / f"{model_name}{self.BACKEND_EXTENSIONS[self.backend]}"
+    
+    def _load_from_disk(self, model_name: str) -> Any:
+        """Lee el artefacto del modelo (.keras, .npz u .onnx)."""
+        model_path = self.model_path(model_name)
         
         if not model_path.exists():
             raise ModelNotFoundError(f"Model not found: {model_path}")
         
         # Cargar modelo
         try:
-            model = tf.keras.models.load_model(model_path, compile=False)
-            self._model_cache[model_name] = model
-            return model
+            if self.backend == 'numpy':
+                from src.infrastructure.ml.numpy_engine import NumpyCNNModel
+                return NumpyCNNModel.load(model_path)
+            
+            if self.backend == 'onnx':
+                from src.infrastructure.ml.onnx_engine import OnnxModel
+                return OnnxModel(model_path, **self.backend_options)
+            
+            import tensorflow as tf
+            return tf.keras.models.load_model(model_path, compile=False)
         except Exception as e:
             raise ModelNotFoundError(f"Failed to load model {model_name}: {str(e)}")
     
+    def _estimate_size(self, model_name: str, model: Any) -> int:
+        """Estima la memoria ocupada por el modelo (bytes de los pesos o tamaño en disco)."""
+        try:
+            return int(sum(w.nbytes for w in model.get_weights()))
+        except Exception:
+            model_path = self.model_path(model_name)
+            return model_path.stat().st_size if model_path.exists() else 0
+    
     async def get_model_metadata(self, model_name: str) -> Optional[dict]:
         """
         Obtiene metadatos del modelo desde archivo JSON.
         
         Args:
             model_name: Nombre del modelo
-            
+        
         Returns:
             Diccionario con metadatos o None
         """
@@ -82,3 +141,25 @@ class ModelRepository(IModelRepository):
     def is_model_loaded(self, model_name: str) -> bool:
         """Verifica si el modelo está cargado en memoria."""
         return model_name in self._model_cache
+    
+    def unload_model(self, model_name: str) -> bool:
+        """Libera un modelo de la cache. Retorna True si estaba cargado."""
+        model = self._model_cache.pop(model_name, None)
+        self._metadata_cache.pop(model_name, None)
+        self._model_sizes.pop(model_name, None)
+        self._last_used.pop(model_name, None)
+        return model is not None
+    
+    def loaded_models(self) -> Dict[str, dict]:
+        """Modelos en cache con su tamaño estimado y último uso."""
+        return {
+            name: {
+                'size_bytes': self._model_sizes.get(name, 0),
+                'last_used': self._last_used.get(name, 0.0)
+            }
+            for name in self._model_cache
+        }
+    
+    def memory_used_bytes(self) -> int:
+        """Memoria total estimada de los modelos en cache."""
+        return int(sum(self._model_sizes.get(name, 0) for name in self._model_cache))
@@ -3,5 +3,6 @@ API routers
 """
 from .predictions import router as predictions_router
 from .health import router as health_router
+from .admin import router as admin_router
 
-__all__ = ['predictions_router', 'health_router']
+__all__ = ['predictions_router', 'health_router', 'admin_router']
@@ -0,0 +1,84 @@
+"""
+Admin endpoints: gestión de versiones de modelo
+"""
+import hmac
+import os
+import signal
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
+
+from src.presentation.schemas import ModelReloadRequest, ModelRegistryResponse, ModelReloadResponse
+from src.infrastructure.repositories import ModelRegistry
+from src.infrastructure.config.dependencies import get_model_registry
+from src.infrastructure.config.settings import settings
+from src.presentation.prefork import master_pid
+
+router = APIRouter(prefix="/admin/models", tags=["admin"])
+
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Valida el header X-Admin-Token. Sin ADMIN_TOKEN configurado los endpoints
+    admin quedan deshabilitados (403).
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled (ADMIN_TOKEN not configured)"
+        )
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
+
+
+@router.get(
+    "/",
+    response_model=ModelRegistryResponse,
+    summary="Model registry status",
+    description="Aliases, loaded versions and memory usage of the model cache",
+    dependencies=[Depends(verify_admin_token)]
+)
+async def registry_status(
+    registry: ModelRegistry = Depends(get_model_registry)
+) -> ModelRegistryResponse:
+    """Estado del registro de modelos."""
+    return ModelRegistryResponse(**registry.status())
+
+
+@router.post(
+    "/reload",
+    response_model=ModelReloadResponse,
+    summary="Promote a model version",
+    description="Loads and warms a model version, swaps the alias atomically and drains the previous version",
+    dependencies=[Depends(verify_admin_token)]
+)
+async def reload_model(
+    request: ModelReloadRequest,
+    registry: ModelRegistry = Depends(get_model_registry)
+) -> ModelReloadResponse:
+    """
+    Promueve una versión de modelo sin downtime.
+
+    - **version**: versión a promover (ej: model_v8)
+    - **alias**: alias a actualizar (default: alias del servicio)
+    
+    En modo pre-fork cada worker tiene su propio registro: la versión se
+    promueve en este worker, se escribe en MODEL_DIR/ACTIVE_MODEL y se envía
+    SIGHUP al master, que reinicia los workers de a uno con ella.
+    """
+    master = master_pid()
+    active_file = settings.MODEL_DIR / settings.MODEL_ACTIVE_FILE
+    if master is not None and not os.access(active_file.parent, os.W_OK):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(f"Pre-fork mode: {active_file.parent} is not writable, so the reload would reach only one "
+                    f"worker. Update {settings.MODEL_ACTIVE_FILE} or send SIGHUP to the master instead")
+        )
+    result = await registry.promote(request.version, request.alias)
+    if master is not None:
+        registry.save_active_entry(active_file, result['alias'], result['version'])
+        os.kill(master, signal.SIGHUP)
+        result['rolling_restart'] = True
+    return ModelReloadResponse(**result)
@@ -1,12 +1,13 @@
 """
 Health check and status endpoints
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, status
 from datetime import datetime
 
-from src.presentation.schemas import HealthResponse
-from src.infrastructure.repositories import ModelRepository
-from src.infrastructure.config.dependencies import get_model_repository
+from src.presentation.schemas import HealthResponse, LivenessResponse, ReadinessResponse
+from src.infrastructure.repositories import ModelRepository, ModelRegistry
+from src.infrastructure.ml import ServiceReadiness
+from src.infrastructure.config.dependencies import get_model_repository, get_model_registry, get_readiness
 from src.infrastructure.config.settings import settings
 
 router = APIRouter(tags=["health"])
@@ -19,22 +20,69 @@ router = APIRouter(tags=["health"])
     description="Check API health and model status"
 )
 async def health_check(
-    model_repo: ModelRepository = Depends(get_model_repository)
+    model_repo: ModelRepository = Depends(get_model_repository),
+    registry: ModelRegistry = Depends(get_model_registry),
+    readiness: ServiceReadiness = Depends(get_readiness)
 ) -> HealthResponse:
     """
     Endpoint de health check.
-    Verifica que la API está funcionando y que el modelo está cargado.
+    Verifica que la API está funcionando, que el modelo está cargado y que el warmup terminó.
     """
-    model_loaded = model_repo.is_model_loaded("model_v7")
-    
+    model_loaded = model_repo.is_model_loaded(registry.resolve())
+
     return HealthResponse(
-        status="healthy" if model_loaded else "degraded",
+        status="healthy" if model_loaded and readiness.ready else "degraded",
         version=settings.APP_VERSION,
         model_loaded=model_loaded,
         timestamp=datetime.utcnow()
     )
 
 
+@router.get(
+    "/health/live",
+    response_model=LivenessResponse,
+    summary="Liveness probe",
+    description="Returns 200 while the process is running"
+)
+async def liveness() -> LivenessResponse:
+    """Liveness probe: no depende del modelo."""
+    return LivenessResponse(status="alive", timestamp=datetime.utcnow())
+
+
+@router.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness probe",
+    description="Returns 200 only after the model is loaded and warmed up, 503 otherwise"
+)
+async def readiness_check(
+    response: Response,
+    model_repo: ModelRepository = Depends(get_model_repository),
+    registry: ModelRegistry = Depends(get_model_registry),
+    readiness: ServiceReadiness = Depends(get_readiness)
+) -> ReadinessResponse:
+    """
+    Readiness probe.
+    Solo responde 200 cuando el warmup terminó, de modo que los rolling deploys
+    no envíen tráfico a instancias frías.
+    """
+    model_loaded = model_repo.is_model_loaded(registry.resolve())
+    ready = readiness.ready and model_loaded
+
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    report = readiness.report
+    return ReadinessResponse(
+        ready=ready,
+        model_loaded=model_loaded,
+        warmup_latencies=report.summary() if report else [],
+        warmup_completed_at=report.completed_at if report else None,
+        error=readiness.error,
+        timestamp=datetime.utcnow()
+    )
+
+
 @router.get(
     "/",
     summary="Root endpoint",
@@ -46,5 +94,7 @@ async def root():
         "name": settings.APP_NAME,
         "version": settings.APP_VERSION,
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready"
     }
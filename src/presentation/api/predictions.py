@@ -32,6 +32,7 @@ async def predict_arrhythmia(
     - **derivation**: Derivación ECG (default: MLII)
     - **patient_id**: ID opcional del paciente
     - **apply_ruleguard**: Aplicar filtro de falsos positivos (default: true)
+    - **model_variant**: teacher | student | auto (default: auto, según carga)
     """
     try:
         # Convertir request a DTO
@@ -40,7 +41,8 @@ async def predict_arrhythmia(
             sampling_rate=request.sampling_rate,
             derivation=request.derivation,
             patient_id=request.patient_id,
-            apply_ruleguard=request.apply_ruleguard
+            apply_ruleguard=request.apply_ruleguard,
+            model_variant=request.model_variant
         )
         
         # Ejecutar use case
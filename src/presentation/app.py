@@ -7,10 +7,54 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from src.infrastructure.config.settings import settings
-from src.presentation.api import predictions_router, health_router
+from src.presentation.api import predictions_router, health_router, admin_router
 from src.shared.exceptions import DomainException
 
 
+async def initialize_model_service() -> bool:
+    """
+    Carga la versión activa del modelo (y la del student destilado, si está
+    configurado) y ejecuta el warmup. Marca el estado de readiness y retorna
+    True si el servicio quedó listo.
+    """
+    from src.infrastructure.config.dependencies import get_container
+    container = get_container()
+    registry = container.model_registry
+    active_file = settings.MODEL_DIR / settings.MODEL_ACTIVE_FILE
+    try:
+        # El archivo vigilado (si existe) tiene prioridad sobre MODEL_NAME
+        if active_file.exists():
+            registry.set_aliases(registry.parse_active_file(active_file, registry.default_alias))
+        await registry.model_repository.load_model(registry.resolve())
+        print(f"✅ Model loaded successfully ({registry.default_alias} -> {registry.resolve()})")
+        student_alias = settings.STUDENT_MODEL_ALIAS
+        if registry.has_alias(student_alias):
+            await registry.model_repository.load_model(registry.resolve(student_alias))
+            print(f"✅ Student model loaded ({student_alias} -> {registry.resolve(student_alias)})")
+    except Exception as e:
+        container.readiness.mark_failed(f"Model load failed: {e}")
+        print(f"⚠️  Warning: Could not preload model: {e}")
+        return False
+    
+    if settings.WARMUP_ENABLED:
+        try:
+            report = await container.model_warmup.run()
+            for row in report.summary():
+                print(f"🔥 Warmup batch={row['batch_size']}: cold={row['cold_ms']:.1f} ms, warm={row['warm_ms']:.1f} ms")
+            if registry.has_alias(settings.STUDENT_MODEL_ALIAS):
+                student_report = await container.model_warmup.run(model_version=settings.STUDENT_MODEL_ALIAS)
+                for row in student_report.summary():
+                    print(f"🔥 Warmup student batch={row['batch_size']}: cold={row['cold_ms']:.1f} ms, warm={row['warm_ms']:.1f} ms")
+            container.readiness.mark_ready(report)
+        except Exception as e:
+            container.readiness.mark_failed(f"Warmup failed: {e}")
+            print(f"⚠️  Warning: Warmup failed: {e}")
+            return False
+    else:
+        container.readiness.mark_ready(None)
+    return True
+
+
 def create_app() -> FastAPI:
     """
     Factory para crear la aplicación FastAPI.
@@ -36,6 +80,7 @@ def create_app() -> FastAPI:
     # Registrar routers
     app.include_router(health_router)
     app.include_router(predictions_router, prefix=settings.API_V1_PREFIX)
+    app.include_router(admin_router, prefix=settings.API_V1_PREFIX)
     
     # Exception handlers
     @app.exception_handler(DomainException)
@@ -45,17 +90,35 @@ def create_app() -> FastAPI:
             content={"detail": str(exc), "type": exc.__class__.__name__}
         )
     
-    # Startup event: precargar modelo
+    # Startup event: precargar modelo y calentar el pipeline
     @app.on_event("startup")
     async def startup_event():
-        """Precarga el modelo ML al iniciar la aplicación."""
+        """Precarga el modelo ML y ejecuta el warmup antes de marcar el servicio como ready."""
         from src.infrastructure.config.dependencies import get_container
         container = get_container()
-        try:
-            await container.model_repository.load_model("model_v7")
-            print("✅ Model loaded successfully")
-        except Exception as e:
-            print(f"⚠️  Warning: Could not preload model: {e}")
+        # En modo pre-fork el proceso master ya cargó y calentó el modelo
+        if not container.readiness.ready and not await initialize_model_service():
+            return
+        container.model_registry.start_watching(
+            settings.MODEL_DIR / settings.MODEL_ACTIVE_FILE, settings.MODEL_WATCH_INTERVAL_S
+        )
+        if container.drift_monitor is not None:
+            # Baseline de la versión activa (ACTIVE_MODEL puede diferir de MODEL_NAME);
+            # las promociones posteriores la actualizan con el swap hook del registro
+            container.refresh_drift_reference(container.model_registry.resolve())
+            container.drift_monitor.start(settings.DRIFT_CHECK_INTERVAL_S)
+    
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Detiene la vigilancia del archivo de versiones activas, el monitor de drift y el pool de preprocesamiento."""
+        from src.infrastructure.config.dependencies import get_container
+        from src.infrastructure.ml import ParallelSignalProcessor
+        container = get_container()
+        await container.model_registry.stop_watching()
+        if container.drift_monitor is not None:
+            await container.drift_monitor.stop()
+        if isinstance(container.signal_processor, ParallelSignalProcessor):
+            container.signal_processor.shutdown()
     
     return app
 
@@ -0,0 +1,312 @@
+"""
+Pre-fork Server
+Proceso master que carga modelo, banco de filtros y settings una sola vez y
+hace fork de N workers uvicorn que los comparten copy-on-write.
+
+El master no atiende peticiones: abre el socket de escucha, supervisa la
+salud de los workers (heartbeat desde el event loop de cada uno) y los
+reemplaza si mueren, no arrancan o se bloquean.
+
+Señales del master:
+    SIGTERM / SIGINT  apagado ordenado (drena peticiones en vuelo)
+    SIGHUP            reaplica ACTIVE_MODEL en el master y reinicia los workers uno a uno
+"""
+import asyncio
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import uvicorn
+
+from src.infrastructure.config.settings import settings
+
+# PID del master en los procesos worker (None fuera de pre-fork)
+_master_pid: Optional[int] = None
+
+
+def master_pid() -> Optional[int]:
+    """PID del master pre-fork si el proceso actual es uno de sus workers."""
+    return _master_pid
+
+
+# TensorFlow (y ONNX Runtime con pools de hilos) no sobreviven a un fork una vez
+# inicializados: con esos backends cada worker carga el modelo tras el fork.
+def preload_supported() -> bool:
+    """Indica si el backend configurado puede cargarse en el master antes del fork."""
+    if settings.MODEL_BACKEND == 'numpy':
+        return True
+    if settings.MODEL_BACKEND == 'onnx':
+        return settings.ONNX_INTRA_OP_THREADS == 1
+    return False
+
+
+@dataclass
+class WorkerProcess:
+    """Estado de un worker visto desde el master."""
+    pid: int
+    slot: int
+    started_at: float = field(default_factory=time.monotonic)
+    retiring_since: Optional[float] = None
+    
+    @property
+    def retiring(self) -> bool:
+        return self.retiring_since is not None
+
+
+class PreforkServer:
+    """
+    Supervisor pre-fork.
+    
+    Cada worker escribe `time.monotonic()` en su slot de un array compartido
+    mientras su event loop responde y el servicio está ready. El master retira
+    (SIGTERM, luego SIGKILL) a los workers que no quedan ready en
+    `boot_timeout_s` o cuyo heartbeat supera `heartbeat_timeout_s`.
+    """
+    
+    def __init__(
+        self,
+        app,
+        host: str,
+        port: int,
+        workers: int,
+        heartbeat_interval_s: float = 1.0,
+        heartbeat_timeout_s: float = 30.0,
+        boot_timeout_s: float = 120.0,
+        graceful_timeout_s: float = 30.0,
+        max_requests: int = 0,
+        backlog: int = 2048
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.heartbeat_interval_s = heartbeat_interval_s
+        self.heartbeat_timeout_s = heartbeat_timeout_s
+        self.boot_timeout_s = boot_timeout_s
+        self.graceful_timeout_s = graceful_timeout_s
+        self.max_requests = max_requests
+        self.backlog = backlog
+        
+        # El doble de slots: durante un reinicio conviven worker viejo y nuevo
+        self.heartbeats = multiprocessing.RawArray('d', 2 * workers)
+        self.workers: Dict[int, WorkerProcess] = {}
+        self.socket: Optional[socket.socket] = None
+        self._stopping = False
+        self._reload_requested = False
+        self._boot_failures = 0
+    
+    # ------------------------------------------------------------------
+    # Master
+    # ------------------------------------------------------------------
+    
+    def preload(self):
+        """Carga y calienta el modelo en el master para compartirlo con los workers."""
+        from src.infrastructure.config.dependencies import get_container
+        from src.presentation.app import initialize_model_service
+        
+        container = get_container()
+        if not preload_supported():
+            print(f"ℹ️  Backend '{settings.MODEL_BACKEND}' no es fork-safe: cada worker cargará el modelo")
+            return
+        asyncio.run(initialize_model_service())
+        if container.readiness.ready:
+            # Los objetos cargados pasan a la generación permanente: el GC de los
+            # workers no toca sus cabeceras y las páginas siguen compartidas
+            gc.collect()
+            gc.freeze()
+    
+    def run(self):
+        self.preload()
+        self.socket = self._bind()
+        print(f"🚀 Pre-fork master {os.getpid()} escuchando en {self.host}:{self.port} con {self.num_workers} workers")
+        
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        
+        try:
+            while not self._stopping:
+                self._reap()
+                self._check_health()
+                self._kill_overdue()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._rolling_restart()
+                self._spawn_missing()
+                time.sleep(self.heartbeat_interval_s)
+        finally:
+            self._shutdown()
+    
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        return sock
+    
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+    
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+    
+    def _active(self):
+        return [w for w in self.workers.values() if not w.retiring]
+    
+    def _free_slot(self) -> int:
+        used = {w.slot for w in self.workers.values()}
+        return next(i for i in range(len(self.heartbeats)) if i not in used)
+    
+    def _spawn(self) -> WorkerProcess:
+        slot = self._free_slot()
+        self.heartbeats[slot] = 0.0
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._worker_main(slot)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        worker = WorkerProcess(pid=pid, slot=slot)
+        self.workers[pid] = worker
+        return worker
+    
+    def _spawn_missing(self):
+        missing = self.num_workers - len(self._active())
+        if missing <= 0 or self._stopping:
+            return
+        if self._boot_failures:
+            # Backoff ante fallos de arranque repetidos (ej. modelo corrupto)
+            time.sleep(min(2 ** self._boot_failures, 30))
+        for _ in range(missing):
+            worker = self._spawn()
+            print(f"👷 Worker {worker.pid} iniciado (slot {worker.slot})")
+    
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is not None and not worker.retiring and not self._stopping:
+                code = os.waitstatus_to_exitcode(status)
+                if code == 0:
+                    print(f"♻️  Worker {pid} reciclado (límite de peticiones)")
+                else:
+                    print(f"⚠️  Worker {pid} terminó inesperadamente (código {code})")
+    
+    def _retire(self, worker: WorkerProcess, reason: str):
+        if worker.retiring:
+            return
+        print(f"♻️  Retirando worker {worker.pid}: {reason}")
+        worker.retiring_since = time.monotonic()
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    
+    def _check_health(self):
+        now = time.monotonic()
+        for worker in self._active():
+            beat = self.heartbeats[worker.slot]
+            if beat == 0.0:
+                if now - worker.started_at > self.boot_timeout_s:
+                    self._boot_failures += 1
+                    self._retire(worker, f"no quedó ready en {self.boot_timeout_s:.0f}s")
+            elif now - beat > self.heartbeat_timeout_s:
+                self._retire(worker, f"sin heartbeat hace {now - beat:.0f}s")
+            else:
+                self._boot_failures = 0
+    
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for worker in list(self.workers.values()):
+            if worker.retiring and now - worker.retiring_since > self.graceful_timeout_s:
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+    
+    def _wait_ready(self, worker: WorkerProcess) -> bool:
+        deadline = time.monotonic() + self.boot_timeout_s
+        while time.monotonic() < deadline and not self._stopping:
+            self._reap()
+            if worker.pid not in self.workers:
+                return False
+            if self.heartbeats[worker.slot] > 0.0:
+                return True
+            time.sleep(0.1)
+        return False
+    
+    def _rolling_restart(self):
+        """Reemplaza los workers de a uno: el viejo se retira cuando el nuevo está ready."""
+        print("🔄 Reinicio gradual de workers")
+        self.preload()
+        for old in self._active():
+            new = self._spawn()
+            if not self._wait_ready(new):
+                print(f"⚠️  Worker de reemplazo {new.pid} no quedó ready; se aborta el reinicio")
+                self._retire(new, "reemplazo fallido")
+                return
+            self._retire(old, "reinicio gradual")
+    
+    def _shutdown(self):
+        for worker in list(self.workers.values()):
+            self._retire(worker, "apagado")
+        deadline = time.monotonic() + self.graceful_timeout_s
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in list(self.workers.values()):
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+        if self.socket is not None:
+            self.socket.close()
+        print("👋 Pre-fork master detenido")
+    
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    
+    def _worker_main(self, slot: int):
+        global _master_pid
+        _master_pid = os.getppid()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        config = uvicorn.Config(
+            self.app,
+            log_level="info",
+            timeout_graceful_shutdown=int(self.graceful_timeout_s),
+            limit_max_requests=self.max_requests or None
+        )
+        asyncio.run(self._serve(uvicorn.Server(config), slot))
+    
+    async def _serve(self, server: uvicorn.Server, slot: int):
+        from src.infrastructure.config.dependencies import get_container
+        readiness = get_container().readiness
+        
+        async def heartbeat():
+            while True:
+                if readiness.ready:
+                    self.heartbeats[slot] = time.monotonic()
+                await asyncio.sleep(self.heartbeat_interval_s)
+        
+        task = asyncio.create_task(heartbeat())
+        try:
+            await server.serve(sockets=[self.socket])
+        finally:
+            task.cancel()
@@ -5,12 +5,26 @@ from .prediction_schemas import (
     PredictionRequest,
     BeatPredictionResponse,
     PredictionResponse,
-    HealthResponse
+    HealthResponse,
+    WarmupLatencyResponse,
+    LivenessResponse,
+    ReadinessResponse,
+    ModelReloadRequest,
+    LoadedModelResponse,
+    ModelRegistryResponse,
+    ModelReloadResponse
 )
 
 __all__ = [
     'PredictionRequest',
     'BeatPredictionResponse',
     'PredictionResponse',
-    'HealthResponse'
+    'HealthResponse',
+    'WarmupLatencyResponse',
+    'LivenessResponse',
+    'ReadinessResponse',
+    'ModelReloadRequest',
+    'LoadedModelResponse',
+    'ModelRegistryResponse',
+    'ModelReloadResponse'
 ]
@@ -1,7 +1,7 @@
 """
 Pydantic schemas for prediction endpoints
 """
-from typing import List, Optional, Dict
+from typing import List, Literal, Optional, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field, field_validator
 
@@ -32,6 +32,10 @@ class PredictionRequest(BaseModel):
         default=True,
         description="Apply RuleGuard to reduce false positives"
     )
+    model_variant: Optional[Literal['teacher', 'student', 'auto']] = Field(
+        default=None,
+        description="Model to use: production model (teacher), distilled student, or auto (by load; default)"
+    )
     
     @field_validator('signal_data')
     @classmethod
@@ -95,3 +99,71 @@ class HealthResponse(BaseModel):
     version: str = Field(description="API version")
     model_loaded: bool = Field(description="Whether ML model is loaded")
     timestamp: datetime = Field(description="Current timestamp")
+
+
+class WarmupLatencyResponse(BaseModel):
+    """Schema para la latencia de warmup de un tamaño de batch."""
+    batch_size: int = Field(description="Number of beats in the warmup batch")
+    cold_ms: float = Field(description="Latency of the first (cold) run in ms")
+    warm_ms: float = Field(description="Latency of the last (warm) run in ms")
+
+
+class LivenessResponse(BaseModel):
+    """Schema para liveness probe."""
+    status: str = Field(description="Process status")
+    timestamp: datetime = Field(description="Current timestamp")
+
+
+class ReadinessResponse(BaseModel):
+    """Schema para readiness probe."""
+    ready: bool = Field(description="Whether the service accepts traffic")
+    model_loaded: bool = Field(description="Whether ML model is loaded")
+    warmup_latencies: List[WarmupLatencyResponse] = Field(
+        default_factory=list,
+        description="Latencies measured during warmup per batch size"
+    )
+    warmup_completed_at: Optional[datetime] = Field(default=None, description="Warmup completion timestamp")
+    error: Optional[str] = Field(default=None, description="Reason why the service is not ready")
+    timestamp: datetime = Field(description="Current timestamp")
+
+
+class ModelReloadRequest(BaseModel):
+    """Schema para promover una versión de modelo a un alias."""
+    version: str = Field(
+        pattern=r"^model_[A-Za-z0-9_]+$",
+        description="Model version to promote (e.g. 'model_v8')"
+    )
+    alias: Optional[str] = Field(
+        default=None,
+        pattern=r"^[A-Za-z0-9_-]+$",
+        description="Alias to update (default: service alias)"
+    )
+
+
+class LoadedModelResponse(BaseModel):
+    """Schema de una versión de modelo cargada en memoria."""
+    version: str = Field(description="Model version")
+    size_mb: float = Field(description="Estimated memory footprint in MB")
+    in_flight: int = Field(description="Requests currently using this version")
+
+
+class ModelRegistryResponse(BaseModel):
+    """Schema del estado del registro de modelos."""
+    aliases: Dict[str, str] = Field(description="Alias to version mapping")
+    loaded: List[LoadedModelResponse] = Field(description="Versions loaded in memory")
+    memory_used_mb: float = Field(description="Estimated memory used by loaded models")
+    memory_budget_mb: float = Field(description="Memory budget for the model cache")
+
+
+class ModelReloadResponse(BaseModel):
+    """Schema del resultado de una promoción de modelo."""
+    alias: str = Field(description="Updated alias")
+    version: str = Field(description="Promoted version")
+    previous_version: Optional[str] = Field(default=None, description="Version previously served by the alias")
+    drained: bool = Field(description="Whether in-flight requests on the previous version finished")
+    evicted: List[str] = Field(description="Versions evicted to respect the memory budget")
+    warmup: List[WarmupLatencyResponse] = Field(description="Warmup latencies of the promoted version")
+    rolling_restart: bool = Field(
+        default=False,
+        description="Pre-fork mode: ACTIVE_MODEL was updated and the master restarts every worker with this version"
+    )
@@ -0,0 +1,222 @@
+"""
+Augmentation batched de ventanas ECG.
+
+Operadores sobre bloques (B, L) con parámetros independientes por fila:
+jitter gaussiano, gain, time-warp (gather con escala por fila y padding de
+borde) y z-score por fila. `augment_batch` los compone en el mismo orden que
+el antiguo `augment_block` del script, pero con un único sorteo por
+operador para todo el bloque en lugar de uno por ventana.
+
+Cada operador existe en NumPy (oversampling materializado, análisis) y en
+TensorFlow (`*_tf`, para el `map` del pipeline tf.data) con los mismos
+parámetros por defecto. El seeding es determinista en ambos: NumPy recibe
+una semilla o un Generator; TF usa semillas stateless de forma [2].
+"""
+import time
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import tensorflow as tf
+
+JITTER_STD = 0.01
+MAX_GAIN = 0.05
+WARP_RANGE = (0.98, 1.02)
+EPS = 1e-6
+
+Seed = Union[int, np.random.Generator, np.random.SeedSequence, None]
+
+
+def _rng(seed: Seed) -> np.random.Generator:
+    return seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+
+# ----------------------------------------------------------------------
+# NumPy
+# ----------------------------------------------------------------------
+
+def jitter(x: np.ndarray, rng: np.random.Generator, std: float = JITTER_STD) -> np.ndarray:
+    """Ruido gaussiano aditivo N(0, std) muestra a muestra."""
+    return x + std * rng.standard_normal(x.shape, dtype=np.float32)
+
+
+def gain(x: np.ndarray, rng: np.random.Generator, max_gain: float = MAX_GAIN) -> np.ndarray:
+    """Ganancia 1 + U(-max_gain, max_gain) por fila."""
+    g = 1.0 + rng.uniform(-max_gain, max_gain, size=(len(x), 1))
+    return x * g.astype(np.float32)
+
+
+def warp_indices(scale: np.ndarray, length: int) -> np.ndarray:
+    """Índices de gather (B, L) para escalas por fila; fuera de rango repite el borde."""
+    pos = np.rint(np.arange(length)[None, :] * np.asarray(scale).reshape(-1, 1))
+    return np.clip(pos, 0, length - 1).astype(np.intp)
+
+
+def time_warp(x: np.ndarray, rng: np.random.Generator, warp_range: Tuple[float, float] = WARP_RANGE) -> np.ndarray:
+    """Re-muestreo lineal con escala U(warp_range) por fila (padding 'edge')."""
+    scale = rng.uniform(warp_range[0], warp_range[1], size=len(x))
+    return np.take_along_axis(x, warp_indices(scale, x.shape[1]), axis=1)
+
+
+def normalize_rows(x: np.ndarray, eps: float = EPS) -> np.ndarray:
+    """z-score por fila (mismo criterio que `robust_z`)."""
+    mu = x.mean(axis=1, keepdims=True)
+    std = x.std(axis=1, keepdims=True)
+    return (x - mu) / (std + eps)
+
+
+def augment_batch(
+    x: np.ndarray,
+    seed: Seed = None,
+    jitter_std: float = JITTER_STD,
+    max_gain: float = MAX_GAIN,
+    warp_range: Tuple[float, float] = WARP_RANGE
+) -> np.ndarray:
+    """
+    Jitter -> gain -> time-warp -> z-score sobre un bloque (B, L).
+    Retorna un array float32 nuevo; `x` no se modifica.
+    """
+    rng = _rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    x = jitter(x, rng, jitter_std)
+    x = gain(x, rng, max_gain)
+    x = time_warp(x, rng, warp_range)
+    return normalize_rows(x).astype(np.float32, copy=False)
+
+
+def augment_rows(X: np.ndarray, rows: np.ndarray, seed: Optional[int] = None, chunk: int = 16384, **kwargs) -> np.ndarray:
+    """
+    Augmenta en sitio las filas `rows` de `X` (n, L) por bloques de `chunk`
+    filas, acotando la memoria temporal. Cada bloque usa la semilla
+    (seed, número de bloque): el resultado solo depende de `seed` y `chunk`.
+    `X` puede ser una vista (p. ej. `X_cnn[:, :, 0]`).
+    """
+    rows = np.asarray(rows)
+    for k, start in enumerate(range(0, len(rows), chunk)):
+        sel = rows[start:start + chunk]
+        block_seed = None if seed is None else [seed, k]
+        X[sel] = augment_batch(X[sel], seed=block_seed, **kwargs)
+    return X
+
+
+# ----------------------------------------------------------------------
+# TensorFlow (pipeline tf.data)
+# ----------------------------------------------------------------------
+
+def jitter_tf(x: tf.Tensor, seed: tf.Tensor, std: float = JITTER_STD) -> tf.Tensor:
+    return x + tf.random.stateless_normal(tf.shape(x), seed, stddev=std)
+
+
+def gain_tf(x: tf.Tensor, seed: tf.Tensor, max_gain: float = MAX_GAIN) -> tf.Tensor:
+    return x * (1.0 + tf.random.stateless_uniform([tf.shape(x)[0], 1], seed, -max_gain, max_gain))
+
+
+def warp_indices_tf(scale: tf.Tensor, length: tf.Tensor) -> tf.Tensor:
+    pos = tf.round(tf.cast(tf.range(length), tf.float64)[None, :] * tf.reshape(tf.cast(scale, tf.float64), [-1, 1]))
+    return tf.clip_by_value(tf.cast(pos, tf.int32), 0, length - 1)
+
+
+def time_warp_tf(x: tf.Tensor, seed: tf.Tensor, warp_range: Tuple[float, float] = WARP_RANGE) -> tf.Tensor:
+    scale = tf.random.stateless_uniform([tf.shape(x)[0]], seed, warp_range[0], warp_range[1], dtype=tf.float64)
+    return tf.gather(x, warp_indices_tf(scale, tf.shape(x)[1]), batch_dims=1)
+
+
+def normalize_rows_tf(x: tf.Tensor, eps: float = EPS) -> tf.Tensor:
+    mu = tf.reduce_mean(x, axis=1, keepdims=True)
+    std = tf.math.reduce_std(x, axis=1, keepdims=True)
+    return (x - mu) / (std + eps)
+
+
+def augment_batch_tf(
+    x: tf.Tensor,
+    seed: tf.Tensor,
+    jitter_std: float = JITTER_STD,
+    max_gain: float = MAX_GAIN,
+    warp_range: Tuple[float, float] = WARP_RANGE
+) -> tf.Tensor:
+    """Equivalente TF de `augment_batch`; `seed` es una semilla stateless [2]."""
+    x = tf.convert_to_tensor(x, tf.float32)
+    s_jitter, s_gain, s_warp = tf.unstack(tf.random.experimental.stateless_split(seed, 3))
+    x = jitter_tf(x, s_jitter, jitter_std)
+    x = gain_tf(x, s_gain, max_gain)
+    x = time_warp_tf(x, s_warp, warp_range)
+    return normalize_rows_tf(x)
+
+
+# ----------------------------------------------------------------------
+# Verificación y benchmark
+# ----------------------------------------------------------------------
+
+def _augment_window_loop(w: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """`augment_block` original (una ventana por llamada); referencia de tiempos."""
+    x = w.copy()
+    x += rng.normal(0, JITTER_STD, size=x.shape).astype(np.float32)
+    x = (1.0 + rng.uniform(-MAX_GAIN, MAX_GAIN)) * x
+    scale = rng.uniform(*WARP_RANGE)
+    idx = np.clip((np.arange(len(x)) * scale).round().astype(int), 0, len(x)-1)
+    x = x[idx]
+    return (x - np.mean(x)) / (np.std(x) + EPS)
+
+
+def check_operators(n: int = 512, length: int = 360, seed: int = 0) -> bool:
+    """
+    Propiedades de los operadores: determinismo, identidad con parámetros
+    nulos, warp igual al gather por ventana original, filas normalizadas y
+    mismos índices de warp en NumPy y TF para la misma escala.
+    """
+    x = np.random.default_rng(seed).standard_normal((n, length)).astype(np.float32)
+    checks = {}
+    checks['determinista'] = np.array_equal(augment_batch(x, seed=1), augment_batch(x, seed=1))
+    checks['semillas distintas'] = not np.array_equal(augment_batch(x, seed=1), augment_batch(x, seed=2))
+    checks['identidad sin perturbación'] = np.allclose(
+        augment_batch(x, seed=1, jitter_std=0.0, max_gain=0.0, warp_range=(1.0, 1.0)), normalize_rows(x)
+    )
+    
+    scale = np.random.default_rng(seed).uniform(*WARP_RANGE, size=n)
+    ref = np.stack([row[np.clip((np.arange(length) * s).round().astype(int), 0, length - 1)]
+                    for row, s in zip(x, scale)])
+    checks['warp == gather por ventana'] = np.array_equal(np.take_along_axis(x, warp_indices(scale, length), axis=1), ref)
+    
+    out = augment_batch(x, seed=3)
+    checks['z-score por fila'] = np.allclose(out.mean(axis=1), 0, atol=1e-4) and np.allclose(out.std(axis=1), 1, atol=1e-3)
+    
+    checks['TF: warp == NumPy'] = np.array_equal(warp_indices_tf(scale, length).numpy(), warp_indices(scale, length))
+    
+    out_tf = augment_batch_tf(x, tf.constant([3, 0], tf.int64)).numpy()
+    checks['TF: forma y z-score'] = out_tf.shape == x.shape and np.allclose(out_tf.std(axis=1), 1, atol=1e-3)
+    checks['TF: determinista'] = np.array_equal(out_tf, augment_batch_tf(x, tf.constant([3, 0], tf.int64)).numpy())
+    
+    ok = True
+    for name, passed in checks.items():
+        ok &= bool(passed)
+        print(f"  {'✅' if passed else '❌'} {name}")
+    return ok
+
+
+def benchmark(n: int = 100000, length: int = 360, seed: int = 0):
+    """Tiempo de augmentar `n` ventanas: bucle por ventana vs `augment_rows`."""
+    X = np.random.default_rng(seed).standard_normal((n, length)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    for i in range(n):
+        X[i] = _augment_window_loop(X[i], rng)
+    t_loop = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    augment_rows(X, np.arange(n), seed=seed)
+    t_batch = time.perf_counter() - t0
+    print(f"  bucle por ventana: {t_loop:.2f}s | batched: {t_batch:.2f}s | x{t_loop / t_batch:.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Verifica y mide los operadores de augmentation batched')
+    parser.add_argument('--n', type=int, default=100000, help='Ventanas para el benchmark')
+    parser.add_argument('--no-benchmark', action='store_true')
+    args = parser.parse_args()
+    
+    passed = check_operators()
+    if not args.no_benchmark:
+        benchmark(args.n)
+    print("✅ Operadores de augmentation OK" if passed else "❌ Operadores de augmentation con fallas")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,212 @@
+"""
+Checkpoints de entrenamiento reanudables.
+
+`TrainingCheckpoint` es un callback de Keras que cada `every` épocas guarda
+todo lo necesario para continuar `model.fit` donde quedó:
+  
+  - pesos del modelo y del optimizador (`model.weights.h5`: iteración,
+    learning rate y momentos de Adam)
+  - estado de ReduceLROnPlateau / EarlyStopping (wait, best, cooldown y los
+    mejores pesos de EarlyStopping)
+  - historia por época hasta el checkpoint
+  - estado de los RNG globales (random, NumPy)
+
+Cada checkpoint se escribe en un directorio temporal que se renombra al
+terminar, y `latest.json` se actualiza al final: un corte a mitad de la
+escritura deja intacto el checkpoint anterior.
+    
+    ckpt = TrainingCheckpoint(directorio, callback_list=cb)
+    initial_epoch = ckpt.restore(model)   # 0 si no hay checkpoint
+    model.fit(..., initial_epoch=initial_epoch, callbacks=cb + [ckpt])
+"""
+import json
+import os
+import random
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from tensorflow.keras import callbacks
+
+# Atributos de estado que los callbacks reinician en on_train_begin
+CALLBACK_STATE = {
+    'EarlyStopping': ('wait', 'stopped_epoch', 'best', 'best_epoch'),
+    'ReduceLROnPlateau': ('wait', 'best', 'cooldown_counter'),
+}
+
+
+def _to_json(value):
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return repr(value)
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, str) and value in ('inf', '-inf', 'nan'):
+        return float(value)
+    return value
+
+
+def _rng_state() -> Dict:
+    version, state, gauss = random.getstate()
+    np_state = np.random.get_state()
+    return {
+        'python': [version, list(state), gauss],
+        'numpy': [np_state[0], np_state[1].tolist(), *[_to_json(v) for v in np_state[2:]]],
+    }
+
+
+def _set_rng_state(state: Dict):
+    version, internal, gauss = state['python']
+    random.setstate((version, tuple(internal), gauss))
+    name, keys, pos, has_gauss, cached = state['numpy']
+    np.random.set_state((name, np.asarray(keys, dtype=np.uint32), pos, has_gauss, cached))
+
+
+def latest_checkpoint(directory) -> Optional[Path]:
+    """Directorio del último checkpoint completo, o None."""
+    pointer = Path(directory) / 'latest.json'
+    if not pointer.exists():
+        return None
+    with open(pointer) as f:
+        path = Path(directory) / json.load(f)['checkpoint']
+    return path if path.exists() else None
+
+
+class TrainingCheckpoint(callbacks.Callback):
+    """
+    Guarda y restaura el estado completo del entrenamiento.
+    
+    Debe ir al final de la lista de callbacks: guarda después de que
+    ReduceLROnPlateau/EarlyStopping actualizan su estado en la época y, al
+    reanudar, re-aplica ese estado después de que lo reinician en
+    on_train_begin.
+    
+    Args:
+        directory: Directorio de checkpoints del run
+        callback_list: Callbacks cuyo estado se guarda (ver CALLBACK_STATE)
+        every: Épocas entre checkpoints
+        keep: Checkpoints que se conservan (los más recientes)
+    """
+    
+    def __init__(self, directory, callback_list: Sequence[callbacks.Callback] = (), every: int = 1, keep: int = 2):
+        super().__init__()
+        self.directory = Path(directory)
+        self.callback_list = [c for c in callback_list if type(c).__name__ in CALLBACK_STATE]
+        self.every = max(1, int(every))
+        self.keep = max(1, int(keep))
+        self.history: Dict[str, List[float]] = {}
+        self.stopped = False
+        self._pending_state = None
+    
+    # ------------------------------------------------------------------
+    # Callback
+    # ------------------------------------------------------------------
+    
+    def on_train_begin(self, logs=None):
+        if self._pending_state is not None:
+            self._apply_callback_state(self._pending_state)
+            self._pending_state = None
+    
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        self.stopped = bool(self.model.stop_training)
+        if (epoch + 1) % self.every == 0 or self.stopped:
+            self.save(epoch)
+    
+    # ------------------------------------------------------------------
+    # Guardar / restaurar
+    # ------------------------------------------------------------------
+    
+    def save(self, epoch: int) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f'epoch_{epoch + 1:04d}'
+        final = self.directory / name
+        tmp = self.directory / f'.{name}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        
+        self.model.save_weights(tmp / 'model.weights.h5')
+        callback_state = []
+        for i, cb in enumerate(self.callback_list):
+            state = {attr: _to_json(getattr(cb, attr, None)) for attr in CALLBACK_STATE[type(cb).__name__]}
+            best_weights = getattr(cb, 'best_weights', None)
+            if best_weights is not None:
+                np.savez(tmp / f'best_weights_{i}.npz', *best_weights)
+                state['best_weights'] = f'best_weights_{i}.npz'
+            callback_state.append({'class': type(cb).__name__, 'state': state})
+        with open(tmp / 'state.json', 'w') as f:
+            json.dump({
+                'epoch': epoch,
+                'iterations': int(self.model.optimizer.iterations.numpy()),
+                'stopped': self.stopped,
+                'history': self.history,
+                'callbacks': callback_state,
+                'rng': _rng_state(),
+            }, f)
+        
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+        pointer_tmp = self.directory / f'.latest.{os.getpid()}.tmp'
+        with open(pointer_tmp, 'w') as f:
+            json.dump({'checkpoint': name, 'epoch': epoch}, f)
+        os.replace(pointer_tmp, self.directory / 'latest.json')
+        self._prune()
+        return final
+    
+    def _prune(self):
+        done = sorted(p for p in self.directory.glob('epoch_*') if p.is_dir())
+        for old in done[:-self.keep]:
+            shutil.rmtree(old, ignore_errors=True)
+    
+    def restore(self, model, epochs: Optional[int] = None) -> int:
+        """
+        Carga el último checkpoint en `model` (ya compilado con el mismo
+        optimizador) y deja pendiente el estado de los callbacks.
+        
+        Returns:
+            initial_epoch para `model.fit` (0 si no hay checkpoint; `epochs`
+            si el entrenamiento ya había terminado por EarlyStopping)
+        """
+        path = latest_checkpoint(self.directory)
+        if path is None:
+            return 0
+        with open(path / 'state.json') as f:
+            state = json.load(f)
+        
+        # Con el optimizador construido, load_weights restaura también su estado
+        optimizer = model.optimizer
+        if not optimizer.built:
+            optimizer.build(model.trainable_variables)
+        model.load_weights(path / 'model.weights.h5')
+        if int(optimizer.iterations.numpy()) != state['iterations']:
+            raise ValueError(f"Checkpoint {path} incompatible: el optimizador no se restauró "
+                             f"({int(optimizer.iterations.numpy())} de {state['iterations']} iteraciones)")
+        
+        for entry in state['callbacks']:
+            best_weights = entry['state'].get('best_weights')
+            if best_weights:
+                with np.load(path / best_weights) as saved:
+                    entry['state']['best_weights'] = [saved[f'arr_{i}'] for i in range(len(saved.files))]
+        self._pending_state = state['callbacks']
+        self.history = state['history']
+        self.stopped = state['stopped']
+        _set_rng_state(state['rng'])
+        
+        next_epoch = state['epoch'] + 1
+        if self.stopped and epochs is not None:
+            return epochs
+        return next_epoch
+    
+    def _apply_callback_state(self, saved: List[Dict]):
+        if len(saved) != len(self.callback_list):
+            raise ValueError(f"El checkpoint tiene estado de {len(saved)} callbacks y la lista actual {len(self.callback_list)}")
+        for cb, entry in zip(self.callback_list, saved):
+            if type(cb).__name__ != entry['class']:
+                raise ValueError(f"Callback {type(cb).__name__} no coincide con el del checkpoint ({entry['class']})")
+            for attr, value in entry['state'].items():
+                setattr(cb, attr, _from_json(value))
@@ -0,0 +1,572 @@
+"""
+Compresión del modelo entrenado: poda por magnitud y clustering de pesos.
+
+Pasos (todos opcionales) sobre una copia del modelo denso:
+  
+  - Poda por magnitud durante un fine-tuning corto, con sparsity objetivo
+    creciente (schedule polinomial, como PolynomialDecay de TF-MOT):
+      * 'unstructured': pesos individuales de menor |w| en kernels Conv1D/Dense
+      * 'filters': filtros Conv1D completos de menor norma L2; al terminar se
+        reconstruye la red con menos filtros (menos parámetros y latencia)
+  - Clustering: k-means 1-D por capa sobre los pesos no nulos (los ceros de
+    la poda se conservan) y fine-tuning de los centroides
+
+Las máscaras y asignaciones viven en callbacks de Keras y se re-aplican
+después de cada paso del optimizador, así que el modelo resultante es un
+modelo Keras plano (no hay wrappers que quitar) exportable a .keras, TFLite,
+NumPy y ONNX. El reporte compara contra el modelo denso: sparsity, tamaño en
+disco (crudo y gzip, donde se nota la sparsity/clustering), latencia TFLite
+y métricas de test con la regla de decisión completa de cada modelo.
+    
+    python -m training.compression --model models/ecg_nv_cnn/model_v7.keras --sparsity 0.5 --cluster 16
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras import callbacks, layers
+
+from training.distillation import latency_profile, tflite_bytes
+from training.finetune import fit_decision, evaluate
+from training.input_pipeline import oversampling_plan
+from training.model import build_model, compile_model, fit_streaming, resolve_hparams, training_callbacks
+from training.ruleguard import meta_config
+from training.thresholds import decision_meta
+
+RANDOM_SEED = 42
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVE_DIR = os.path.join(PROJECT_ROOT, 'models', 'ecg_nv_cnn')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'datasets')
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+EXPERIMENT_NAME = "compression"
+
+PRUNE_STRUCTURES = ('unstructured', 'filters')
+# Fine-tuning de la poda / del clustering (sobre DEFAULT_HPARAMS)
+COMPRESSION_HPARAMS = {'learning_rate': 1e-4, 'epochs': 6}
+CLUSTER_EPOCHS = 2
+
+
+def polynomial_sparsity(step: int, final_sparsity: float, begin_step: int, end_step: int,
+                        initial_sparsity: float = 0.0, power: float = 3.0) -> float:
+    """Sparsity objetivo en `step`: sube de `initial` a `final` entre begin y end (rápido al inicio)."""
+    if step < begin_step:
+        return 0.0
+    progress = min(1.0, (step - begin_step) / max(1, end_step - begin_step))
+    return final_sparsity + (initial_sparsity - final_sparsity) * (1.0 - progress) ** power
+
+
+def prunable_layers(model: tf.keras.Model, structure: str = 'unstructured') -> List[layers.Layer]:
+    """
+    Capas con kernel a podar: Conv1D (y Dense en 'unstructured'). La capa de
+    salida no se poda (pocos pesos y sensible).
+    """
+    if structure not in PRUNE_STRUCTURES:
+        raise ValueError(f"Estructura de poda desconocida: {structure} (usa {PRUNE_STRUCTURES})")
+    kinds = (layers.Conv1D,) if structure == 'filters' else (layers.Conv1D, layers.Dense)
+    output_layer = model.outputs[0]._keras_history[0]
+    return [l for l in model.layers
+            if type(l) in kinds and l is not output_layer]
+
+
+def _magnitude_mask(kernel: np.ndarray, sparsity: float) -> np.ndarray:
+    k = int(np.floor(sparsity * kernel.size))
+    mask = np.ones(kernel.size, dtype=np.float32)
+    if k > 0:
+        mask[np.argpartition(np.abs(kernel).ravel(), k - 1)[:k]] = 0.0
+    return mask.reshape(kernel.shape)
+
+
+def _filter_mask(kernel: np.ndarray, sparsity: float) -> np.ndarray:
+    """Máscara (C_out,) que apaga los filtros de menor norma L2 (al menos uno sobrevive)."""
+    n_out = kernel.shape[-1]
+    k = min(int(np.floor(sparsity * n_out)), n_out - 1)
+    mask = np.ones(n_out, dtype=np.float32)
+    if k > 0:
+        norms = np.sqrt((kernel.reshape(-1, n_out) ** 2).sum(axis=0))
+        mask[np.argsort(norms, kind='stable')[:k]] = 0.0
+    return mask
+
+
+class MagnitudePruning(callbacks.Callback):
+    """
+    Poda por magnitud con schedule polinomial. Cada `frequency` pasos
+    recalcula las máscaras con la sparsity objetivo del paso; después de cada
+    batch re-aplica las máscaras (los pesos podados siguen en cero aunque el
+    optimizador los mueva).
+    
+    Args:
+        target_sparsity: Fracción final de pesos (o filtros) en cero por capa
+        end_step: Paso en que se alcanza la sparsity final
+        structure: 'unstructured' o 'filters'
+    """
+    
+    def __init__(self, target_sparsity: float, end_step: int, begin_step: int = 0, frequency: int = 50,
+                 initial_sparsity: float = 0.0, structure: str = 'unstructured'):
+        super().__init__()
+        if not 0.0 <= target_sparsity < 1.0:
+            raise ValueError(f"target_sparsity debe estar en [0, 1): {target_sparsity}")
+        self.target_sparsity = float(target_sparsity)
+        self.begin_step = int(begin_step)
+        self.end_step = max(int(end_step), self.begin_step + 1)
+        self.frequency = max(1, int(frequency))
+        self.initial_sparsity = float(initial_sparsity)
+        self.structure = structure
+        self.masks: Dict[str, np.ndarray] = {}
+        self.step = 0
+    
+    def on_train_begin(self, logs=None):
+        self.layers = prunable_layers(self.model, self.structure)
+    
+    def current_sparsity(self) -> float:
+        return polynomial_sparsity(self.step, self.target_sparsity, self.begin_step, self.end_step,
+                                   self.initial_sparsity)
+    
+    def update_masks(self, sparsity: Optional[float] = None):
+        sparsity = self.current_sparsity() if sparsity is None else sparsity
+        for layer in self.layers:
+            kernel = layer.kernel.numpy()
+            if self.structure == 'filters':
+                self.masks[layer.name] = _filter_mask(kernel, sparsity)
+            else:
+                self.masks[layer.name] = _magnitude_mask(kernel, sparsity)
+    
+    def apply_masks(self):
+        for layer in self.layers:
+            mask = self.masks.get(layer.name)
+            if mask is None:
+                continue
+            layer.kernel.assign(layer.kernel.numpy() * mask)
+            if self.structure == 'filters' and layer.use_bias:
+                # Filtro apagado = salida relu(0) = 0: removerlo después es exacto
+                layer.bias.assign(layer.bias.numpy() * mask)
+    
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.step >= self.begin_step and (self.step - self.begin_step) % self.frequency == 0 \
+                and self.step <= self.end_step:
+            self.update_masks()
+            self.apply_masks()
+    
+    def on_train_batch_end(self, batch, logs=None):
+        self.step += 1
+        self.apply_masks()
+    
+    def finalize(self):
+        """Máscaras con la sparsity final, aplicadas al modelo (fin del fine-tuning)."""
+        self.update_masks(self.target_sparsity)
+        self.apply_masks()
+        return self.masks
+
+
+def kmeans_1d(values: np.ndarray, n_clusters: int, iters: int = 25) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    K-means 1-D con centroides iniciales equiespaciados (init lineal de
+    TF-MOT). Returns (centroides ordenados, asignación por valor).
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    n_clusters = max(1, min(int(n_clusters), len(np.unique(values))))
+    centroids = np.linspace(values.min(), values.max(), n_clusters)
+    for _ in range(iters):
+        assign = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+        sums = np.bincount(assign, weights=values, minlength=n_clusters)
+        counts = np.bincount(assign, minlength=n_clusters)
+        updated = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+        if np.allclose(updated, centroids):
+            break
+        centroids = np.sort(updated)
+    assign = np.searchsorted((centroids[1:] + centroids[:-1]) / 2, values)
+    return centroids.astype(np.float32), assign
+
+
+class WeightClustering(callbacks.Callback):
+    """
+    Clustering de pesos que preserva la sparsity: los kernels de las capas
+    podables toman solo `n_clusters` valores distintos (más el cero de la
+    poda). Durante el fine-tuning, después de cada batch, cada peso vuelve al
+    promedio de su cluster (equivalente a entrenar los centroides).
+    """
+    
+    def __init__(self, model: tf.keras.Model, n_clusters: int = 16):
+        super().__init__()
+        self.n_clusters = int(n_clusters)
+        self.layers = prunable_layers(model)
+        self.assignments: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for layer in self.layers:
+            kernel = layer.kernel.numpy()
+            nonzero = kernel.ravel() != 0
+            if not nonzero.any():
+                continue
+            centroids, assign = kmeans_1d(kernel.ravel()[nonzero], self.n_clusters)
+            self.assignments[layer.name] = (nonzero, assign)
+            clustered = np.zeros(kernel.size, dtype=np.float32)
+            clustered[nonzero] = centroids[assign]
+            layer.kernel.assign(clustered.reshape(kernel.shape))
+    
+    def apply_clusters(self):
+        for layer in self.layers:
+            if layer.name not in self.assignments:
+                continue
+            nonzero, assign = self.assignments[layer.name]
+            kernel = layer.kernel.numpy()
+            flat = kernel.ravel()
+            counts = np.bincount(assign, minlength=assign.max() + 1)
+            centroids = np.bincount(assign, weights=flat[nonzero]) / np.maximum(counts, 1)
+            clustered = np.zeros(kernel.size, dtype=np.float32)
+            clustered[nonzero] = centroids[assign]
+            layer.kernel.assign(clustered.reshape(kernel.shape))
+    
+    def on_train_batch_end(self, batch, logs=None):
+        self.apply_clusters()
+
+
+def shrink_filters(model: tf.keras.Model, masks: Dict[str, np.ndarray], hparams: Optional[Dict] = None) -> tf.keras.Model:
+    """
+    Reconstruye un modelo de `build_model` sin los filtros apagados por la
+    poda 'filters': cada Conv1D pierde sus filtros podados y la capa
+    siguiente (Conv1D o la densa tras el Concatenate) los canales de entrada
+    correspondientes. La salida es idéntica a la del modelo enmascarado.
+    """
+    convs = [l for l in model.layers if type(l) is layers.Conv1D]
+    if len(convs) != 3 or any(type(l) is layers.SeparableConv1D for l in model.layers):
+        raise ValueError("shrink_filters requiere la arquitectura de build_model (3 Conv1D)")
+    keep = [np.flatnonzero(masks[l.name]) if l.name in masks else np.arange(l.filters) for l in convs]
+    hidden = next(l for l in model.layers if type(l) is layers.Dense
+                  and type(l.input._keras_history[0]) is layers.Concatenate)
+    
+    hp = resolve_hparams({
+        **(hparams or {}),
+        'conv1_filters': len(keep[0]), 'conv2_filters': len(keep[1]), 'conv3_filters': len(keep[2]),
+        'dense_units': hidden.units,
+    })
+    small = build_model(model.inputs[0].shape[1], hp, compile=False)
+    small_convs = [l for l in small.layers if type(l) is layers.Conv1D]
+    for i, (old, new) in enumerate(zip(convs, small_convs)):
+        kernel, bias = old.get_weights()
+        in_keep = keep[i - 1] if i else np.arange(kernel.shape[1])
+        new.set_weights([kernel[:, in_keep][:, :, keep[i]], bias[keep[i]]])
+    
+    n_conv = convs[-1].filters
+    small_hidden = next(l for l in small.layers if type(l) is layers.Dense
+                        and type(l.input._keras_history[0]) is layers.Concatenate)
+    kernel, bias = hidden.get_weights()
+    rows = np.concatenate([keep[2], np.arange(n_conv, kernel.shape[0])])
+    small_hidden.set_weights([kernel[rows], bias])
+    
+    # Resto de las capas con pesos (rama RR y salida): mismos shapes
+    old_rest = [l for l in model.layers if l.weights and type(l) is layers.Dense and l is not hidden]
+    new_rest = [l for l in small.layers if l.weights and type(l) is layers.Dense and l is not small_hidden]
+    for old, new in zip(old_rest, new_rest):
+        new.set_weights(old.get_weights())
+    return small
+
+
+def uncompiled_copy(model: tf.keras.Model) -> tf.keras.Model:
+    """Copia con los mismos pesos, sin compilar (sin optimizador ni loss)."""
+    copy = tf.keras.Model.from_config(model.get_config())
+    copy.set_weights(model.get_weights())
+    return copy
+
+
+def sparsity_report(model: tf.keras.Model) -> Dict:
+    """Fracción de ceros y valores distintos por kernel podable, y sparsity global del modelo."""
+    per_layer = {}
+    for layer in prunable_layers(model):
+        kernel = layer.kernel.numpy()
+        per_layer[layer.name] = {
+            'params': int(kernel.size),
+            'sparsity': float((kernel == 0).mean()),
+            'unique_values': int(len(np.unique(kernel))),
+        }
+    weights = model.get_weights()
+    total = int(sum(w.size for w in weights))
+    zeros = int(sum((w == 0).sum() for w in weights))
+    return {'layers': per_layer, 'params': total, 'zeros': zeros, 'sparsity': zeros / max(total, 1)}
+
+
+def _sizes_kb(path: str) -> Dict[str, float]:
+    with open(path, 'rb') as f:
+        content = f.read()
+    return {'raw': round(len(content) / 1024, 1), 'gzip': round(len(gzip.compress(content, 9)) / 1024, 1)}
+
+
+def compress_model(
+    model: tf.keras.Model,
+    X_sig: np.ndarray,
+    X_rr: np.ndarray,
+    y: np.ndarray,
+    train_idx: np.ndarray,
+    validation: Tuple[Dict, np.ndarray],
+    test_data: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    tag: str = 'v7',
+    meta: Optional[Dict] = None,
+    dense_tflite: Optional[bytes] = None,
+    prune: bool = True,
+    target_sparsity: float = 0.5,
+    structure: str = 'unstructured',
+    cluster: bool = False,
+    n_clusters: int = 16,
+    hparams: Optional[Dict] = None,
+    cluster_epochs: int = CLUSTER_EPOCHS,
+    target_prec: float = 0.83,
+    target_rec: float = 0.85,
+    augment: bool = True,
+    seed: int = RANDOM_SEED,
+    save_dir: str = SAVE_DIR,
+    verbose: int = 1
+) -> Dict:
+    """
+    Poda y/o clustering de una copia de `model` y exportación de
+    `model_<tag>_compressed.{keras,tflite}`, `saved_model_...`,
+    `history_...csv` y `meta_...json`.
+    
+    Args:
+        X_sig / X_rr / y: Dataset de entrenamiento (y binaria; pueden ser memmaps)
+        validation: (inputs, yval) para callbacks, Platt, umbral y RuleGuard
+        test_data: (X_sig, X_rr, y_bin) para las métricas de ambos modelos
+        meta: meta_<tag>.json del modelo denso (se copian clases, fs, win, ...)
+        dense_tflite: TFLite float del modelo denso (si no, se convierte)
+        hparams: Fine-tuning sobre DEFAULT_HPARAMS + COMPRESSION_HPARAMS
+    
+    Returns:
+        dict con tag, paths, meta del comprimido y el bloque `compression`
+        para el meta del denso
+    """
+    if not (prune or cluster):
+        raise ValueError("Nada que hacer: activa prune y/o cluster")
+    hp = resolve_hparams({**COMPRESSION_HPARAMS, **(hparams or {})})
+    meta = meta or {}
+    fs = int(meta.get('fs', 360))
+    out_tag = f"{tag}_compressed"
+    val_inputs, yval = validation
+    # Sin EarlyStopping: restaurar pesos de una época previa desharía la sparsity final
+    finetune_callbacks = [c for c in training_callbacks() if not isinstance(c, callbacks.EarlyStopping)]
+    
+    tf.keras.utils.set_random_seed(seed)
+    compressed = uncompiled_copy(model)
+    history: Dict[str, List[float]] = {}
+    
+    if prune:
+        _, epoch_samples = oversampling_plan(np.asarray(y)[train_idx])
+        steps = max(1, epoch_samples // hp['batch_size']) * hp['epochs']
+        # La sparsity final se alcanza al ~70% del fine-tuning; el resto recupera accuracy
+        pruning = MagnitudePruning(target_sparsity, end_step=int(0.7 * steps), structure=structure,
+                                   frequency=max(1, steps // 100))
+        compile_model(compressed, hp)
+        print(f"✂️  Poda {structure} → sparsity {target_sparsity:.0%} en {hp['epochs']} épocas ({steps} pasos)")
+        h = fit_streaming(compressed, X_sig, X_rr, y, train_idx, validation, hp, augment=augment, seed=seed,
+                          callback_list=finetune_callbacks + [pruning], verbose=verbose)
+        history.update(h.history)
+        masks = pruning.finalize()
+        if structure == 'filters':
+            compressed = shrink_filters(compressed, masks, hp)
+    
+    if cluster:
+        clustering = WeightClustering(compressed, n_clusters)
+        if cluster_epochs > 0:
+            compile_model(compressed, hp)
+            print(f"🧩 Clustering: {n_clusters} centroides por capa, fine-tuning {cluster_epochs} épocas")
+            h = fit_streaming(compressed, X_sig, X_rr, y, train_idx, validation, {**hp, 'epochs': cluster_epochs},
+                              augment=augment, seed=seed + 1,
+                              callback_list=finetune_callbacks + [clustering], verbose=verbose)
+            for key, values in h.history.items():
+                history.setdefault(f"cluster_{key}", []).extend(values)
+            clustering.apply_clusters()
+    
+    # Copia sin compilar: el .keras no arrastra el estado del optimizador del fine-tuning
+    compressed = uncompiled_copy(compressed)
+    
+    decisions = {name: fit_decision(m, val_inputs, yval, target_prec, target_rec, fs)
+                 for name, m in (('dense', model), ('compressed', compressed))}
+    metrics = {name: evaluate(m, decisions[name], *test_data, fs=fs)
+               for name, m in (('dense', model), ('compressed', compressed))}
+    
+    os.makedirs(save_dir, exist_ok=True)
+    paths = {
+        'keras': os.path.join(save_dir, f'model_{out_tag}.keras'),
+        'saved_model': os.path.join(save_dir, f'saved_model_{out_tag}'),
+        'tflite': os.path.join(save_dir, f'model_{out_tag}.tflite'),
+        'history': os.path.join(save_dir, f'history_{out_tag}.csv'),
+        'meta': os.path.join(save_dir, f'meta_{out_tag}.json'),
+    }
+    compressed.save(paths['keras'])
+    compressed.export(paths['saved_model'])
+    compressed_tflite = tf.lite.TFLiteConverter.from_saved_model(paths['saved_model']).convert()
+    with open(paths['tflite'], 'wb') as f:
+        f.write(compressed_tflite)
+    pd.DataFrame({k: pd.Series(v) for k, v in history.items()}).to_csv(paths['history'], index=False)
+    
+    dense_tflite = dense_tflite or tflite_bytes(model)
+    with tempfile.TemporaryDirectory() as tmp:
+        dense_keras, dense_tflite_path = os.path.join(tmp, 'dense.keras'), os.path.join(tmp, 'dense.tflite')
+        model.save(dense_keras)
+        with open(dense_tflite_path, 'wb') as f:
+            f.write(dense_tflite)
+        size_kb = {
+            'dense': {'keras': _sizes_kb(dense_keras), 'tflite': _sizes_kb(dense_tflite_path)},
+            'compressed': {'keras': _sizes_kb(paths['keras']), 'tflite': _sizes_kb(paths['tflite'])},
+        }
+    latency = {
+        'dense': latency_profile(dense_tflite, test_data[0], test_data[1]),
+        'compressed': latency_profile(compressed_tflite, test_data[0], test_data[1]),
+    }
+    sparsity = {'dense': sparsity_report(model), 'compressed': sparsity_report(compressed)}
+    
+    out_meta = {
+        **{k: meta[k] for k in ('classes', 'fs', 'win', 'deriv_idx', 'normalizacion', 'inputs',
+                                'train_records', 'test_records') if k in meta},
+        "augmentation": bool(augment),
+        "ruleguard": True,
+        "ruleguard_config": meta_config(decisions['compressed']['ruleguard']),
+        "decision": decision_meta(decisions['compressed']['platt'], decisions['compressed']['selection']),
+        "threshold_note": "thr_opt re-seleccionado tras la compresión (validación de distribución real + Platt)",
+        "compression": {
+            "base_model": f"model_{tag}",
+            "base_mlflow_run_id": meta.get('mlflow_run_id'),
+            "pruning": {"structure": structure, "target_sparsity": float(target_sparsity)} if prune else None,
+            "clustering": {"n_clusters": int(n_clusters), "epochs": int(cluster_epochs)} if cluster else None,
+            "learning_rate": hp['learning_rate'],
+            "epochs": int(hp['epochs']) if prune else 0,
+            "sparsity": sparsity['compressed'],
+        },
+        "size_kb": size_kb['compressed'],
+        "latency_ms": latency['compressed'],
+        "metrics": metrics['compressed'],
+        "dense_size_kb": size_kb['dense'],
+        "dense_latency_ms": latency['dense'],
+        "dense_metrics": metrics['dense'],
+        "timestamp": datetime.now().isoformat()
+    }
+    with open(paths['meta'], 'w') as f:
+        json.dump(out_meta, f, indent=2)
+    
+    # Resumen para meta_<tag>.json
+    compression_block = {
+        "model": f"model_{out_tag}",
+        "params": sparsity['compressed']['params'],
+        "dense_params": sparsity['dense']['params'],
+        "sparsity": sparsity['compressed']['sparsity'],
+        "size_kb": size_kb['compressed'],
+        "latency_ms": latency['compressed'],
+        "metrics": metrics['compressed'],
+        "dense_metrics": metrics['dense'],
+    }
+    return {'tag': out_tag, 'paths': paths, 'meta': out_meta, 'compression_block': compression_block,
+            'history': history, 'model': compressed}
+
+
+def compression_mlflow_metrics(result: Dict) -> Dict[str, float]:
+    """Métricas planas para MLflow (prefijo `compressed_` / `dense_`)."""
+    meta = result['meta']
+    out = {
+        'compressed_sparsity': float(meta['compression']['sparsity']['sparsity']),
+        'compressed_params': float(meta['compression']['sparsity']['params']),
+    }
+    for who, prefix in (('compressed', ''), ('dense', 'dense_')):
+        for fmt, sizes in meta[f'{prefix}size_kb'].items():
+            out.update({f"{who}_{fmt}_{kind}_kb": float(v) for kind, v in sizes.items()})
+        out.update({f"{who}_latency_{bs}_ms": float(v) for bs, v in meta[f'{prefix}latency_ms'].items()})
+        out.update({f"{who}_test_{k}": float(v) for k, v in meta[f'{prefix}metrics'].items() if np.isfinite(v)})
+    return out
+
+
+def print_compression_report(result: Dict):
+    meta = result['meta']
+    info = meta['compression']
+    print("\n" + "=" * 80)
+    print(f"🗜️  COMPRESIÓN → model_{result['tag']} | poda {info['pruning']} | clustering {info['clustering']}")
+    print("=" * 80)
+    print(f"  {'':<11} {'params':>8} {'sparsity':>9} {'keras KB (gz)':>15} {'tflite KB (gz)':>16} "
+          f"{'ms b1':>7} {'ms b256':>8} {'Prec_V':>7} {'Rec_V':>6} {'F1_V':>6}")
+    for who, prefix in (('dense', 'dense_'), ('compressed', '')):
+        sp = info['sparsity'] if who == 'compressed' else None
+        params = sp['params'] if sp else result['compression_block']['dense_params']
+        sizes, lat, m = meta[f'{prefix}size_kb'], meta[f'{prefix}latency_ms'], meta[f'{prefix}metrics']
+        print(f"  {who:<11} {params:>8,} {(sp['sparsity'] if sp else 0.0):>9.1%} "
+              f"{sizes['keras']['raw']:>7.1f} ({sizes['keras']['gzip']:>5.1f}) "
+              f"{sizes['tflite']['raw']:>8.1f} ({sizes['tflite']['gzip']:>5.1f}) "
+              f"{lat['batch_1']:>7.3f} {lat['batch_256']:>8.2f} "
+              f"{m['precision_V']:>7.3f} {m['recall_V']:>6.3f} {m['f1_V']:>6.3f}")
+    for key, path in result['paths'].items():
+        print(f"  {key}: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    from sklearn.model_selection import StratifiedShuffleSplit
+    
+    from training.dataset_cache import DatasetCache
+    from training.ecg_dataset import TRAIN_RECORDS, TEST_RECORDS, extract_windows, preprocessing_params
+    from training.model import validation_arrays
+    
+    parser = argparse.ArgumentParser(description='Poda por magnitud y clustering de pesos del modelo entrenado')
+    parser.add_argument('--model', default=os.path.join(SAVE_DIR, 'model_v7.keras'), help='Modelo denso (.keras)')
+    parser.add_argument('--sparsity', type=float, default=0.5, help='Sparsity final (0 = sin poda)')
+    parser.add_argument('--structure', choices=PRUNE_STRUCTURES, default='unstructured')
+    parser.add_argument('--cluster', type=int, default=0, metavar='N', help='Centroides por capa (0 = sin clustering)')
+    parser.add_argument('--cluster-epochs', type=int, default=CLUSTER_EPOCHS)
+    parser.add_argument('--epochs', type=int, default=COMPRESSION_HPARAMS['epochs'])
+    parser.add_argument('--learning-rate', type=float, default=COMPRESSION_HPARAMS['learning_rate'])
+    parser.add_argument('--no-mlflow', action='store_true')
+    args = parser.parse_args()
+    
+    name = os.path.splitext(os.path.basename(args.model))[0]
+    tag = name.replace('model_', '')
+    meta_path = os.path.join(os.path.dirname(args.model), f"meta_{tag}.json")
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    
+    cache = DatasetCache(CACHE_DIR, preprocessing_params())
+    extract_fn = partial(extract_windows, base_path=BASE_PATH)
+    Xtr_sig, Xtr_rr, ytr = cache.load_dataset(TRAIN_RECORDS, extract_fn, workers=os.cpu_count())
+    Xte_sig, Xte_rr, yte = cache.load_dataset(TEST_RECORDS, extract_fn, workers=os.cpu_count())
+    ytr_bin = (np.asarray(ytr) == 'V').astype(np.int32)
+    yte_bin = (np.asarray(yte) == 'V').astype(np.int32)
+    
+    # Mismo hold-out que el script ([C05]: 15% estratificado, semilla fija)
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=0.15, random_state=RANDOM_SEED)
+    tr_idx, val_idx = next(sss.split(np.zeros(len(ytr_bin)), ytr_bin))
+    
+    dense = tf.keras.models.load_model(args.model, compile=False)
+    result = compress_model(
+        dense, Xtr_sig, Xtr_rr, ytr_bin, tr_idx, validation_arrays(Xtr_sig, Xtr_rr, ytr_bin, val_idx),
+        (Xte_sig, Xte_rr, yte_bin), tag=tag, meta=meta,
+        prune=args.sparsity > 0, target_sparsity=args.sparsity, structure=args.structure,
+        cluster=args.cluster > 0, n_clusters=args.cluster or 16, cluster_epochs=args.cluster_epochs,
+        hparams={'epochs': args.epochs, 'learning_rate': args.learning_rate},
+        save_dir=os.path.dirname(args.model)
+    )
+    
+    if meta:
+        meta['compression'] = result['compression_block']
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    if not args.no_mlflow:
+        import mlflow
+        mlflow.set_tracking_uri("file:./mlruns")
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        with mlflow.start_run(run_name=f"CMP_{result['tag']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}") as run:
+            mlflow.set_tag("model_tag", result['tag'])
+            mlflow.log_params({
+                'base_model': name, 'sparsity': args.sparsity, 'structure': args.structure,
+                'n_clusters': args.cluster, 'cluster_epochs': args.cluster_epochs,
+                'epochs': args.epochs, 'learning_rate': args.learning_rate,
+            })
+            mlflow.log_metrics(compression_mlflow_metrics(result))
+            result['meta']['mlflow_run_id'] = run.info.run_id
+            with open(result['paths']['meta'], 'w') as f:
+                json.dump(result['meta'], f, indent=2)
+            for key in ('keras', 'tflite'):
+                mlflow.log_artifact(result['paths'][key], "models")
+            mlflow.log_artifact(result['paths']['meta'], "metadata")
+    
+    print_compression_report(result)
@@ -0,0 +1,420 @@
+"""
+Validación cruzada leave-records-out (por paciente) en procesos paralelos.
+
+El split fijo TRAIN_RECORDS/TEST_RECORDS mide una sola partición de
+pacientes. Aquí los registros se reparten en k folds (balanceados por
+cantidad de V) y cada fold entrena el modelo de training/model.py con los
+demás registros, elige umbral (Platt + metas de Prec/Rec) y RuleGuard en un
+hold-out estratificado de su train, y evalúa en los registros del fold:
+exactamente la receta de deteccionarritmias.py.
+
+Los folds corren en un pool de procesos (spawn, un proceso nuevo por fold)
+con los hilos de TensorFlow acotados: `workers x threads` ocupa la máquina
+sin sobre-suscribirla. La cache de dataset se puebla y consolida antes de
+arrancar, así que los workers solo leen splits memory-mapped.
+
+El proceso padre registra un run de MLflow con un run hijo por fold
+(parámetros, historia por época, umbral, RuleGuard y métricas de test) y
+las métricas agregadas (media/desvío entre folds y pooled) en el padre.
+    
+    python -m training.cross_validation --folds 5 --workers 5 --epochs 30
+"""
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+RANDOM_SEED = 42
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'datasets')
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'cv_results')
+EXPERIMENT_NAME = "cross_validation"
+
+# Métricas de test por fold que se agregan entre folds
+FOLD_METRICS = ('accuracy', 'precision_V', 'recall_V', 'f1_V', 'pr_auc')
+
+
+def record_folds(v_counts: Dict, k: int, seed: int = RANDOM_SEED) -> List[List]:
+    """
+    Reparte los registros en `k` folds balanceando la cantidad de V:
+    de mayor a menor V (empates en orden aleatorio por `seed`), cada registro
+    va al fold con menos V y, a igualdad, con menos registros.
+    """
+    records = list(v_counts)
+    if k < 2 or k > len(records):
+        raise ValueError(f"folds debe estar entre 2 y {len(records)} (registros), no {k}")
+    order = np.random.default_rng(seed).permutation(len(records))
+    order = sorted(order, key=lambda i: -v_counts[records[i]])  # sort estable: conserva la permutación en empates
+    folds = [[] for _ in range(k)]
+    load = [0] * k
+    for i in order:
+        f = min(range(k), key=lambda j: (load[j], len(folds[j])))
+        folds[f].append(records[i])
+        load[f] += v_counts[records[i]]
+    return [sorted(fold, key=records.index) for fold in folds]
+
+
+def _make_cache(config):
+    from training.dataset_cache import DatasetCache
+    from training.ecg_dataset import preprocessing_params
+    return DatasetCache(config['cache_dir'], preprocessing_params(fs=config['fs'], deriv_idx=config['deriv_idx']))
+
+
+def _extract_fn(config):
+    from training.ecg_dataset import extract_windows
+    return partial(extract_windows, base_path=config['base_path'], deriv_idx=config['deriv_idx'], fs=config['fs'])
+
+
+def prepare_folds(config) -> List[Dict]:
+    """
+    Puebla la cache con todos los registros (extracción en paralelo),
+    arma los folds y consolida los splits train/test de cada uno para que
+    los workers solo los lean.
+    """
+    cache = _make_cache(config)
+    extract_fn = _extract_fn(config)
+    cache.load_dataset(config['records'], extract_fn, workers=config['extract_workers'])
+    failed = {r.record_id for r in cache.extraction_results if not r.usable}
+    records = [r for r in config['records'] if r not in failed and cache.record_info(r)['n'] > 0]
+    if failed:
+        print(f"⚠️  Registros sin datos (fuera de la CV): {sorted(failed)}")
+    
+    v_counts = {r: cache.record_info(r)['counts'].get('V', 0) for r in records}
+    folds = []
+    for fold, test_records in enumerate(record_folds(v_counts, config['folds'], config['seed'])):
+        train_records = [r for r in records if r not in test_records]
+        for split in (train_records, test_records):
+            cache.load_dataset(split, extract_fn, workers=1)
+        folds.append({
+            'fold': fold,
+            'train_records': train_records,
+            'test_records': test_records,
+            'test_V': int(sum(v_counts[r] for r in test_records)),
+        })
+    return folds
+
+
+def _init_worker(threads: int):
+    """Inicializador del pool: acota hilos antes de que TF ejecute ops."""
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    from training.model import limit_tf_threads
+    limit_tf_threads(threads, 1)
+
+
+def run_fold(fold: Dict, config: Dict) -> Dict:
+    """
+    Entrena y evalúa un fold (en el proceso worker). Retorna un dict
+    serializable con la historia, el umbral, RuleGuard y las métricas de
+    test con y sin RuleGuard.
+    """
+    from sklearn.model_selection import StratifiedShuffleSplit
+    from training.model import train_model
+    from training.ruleguard import (
+        RR_LO_GRID, RR_HI_GRID, QRS_GRID, qrs_widths_ms, rr_ratio, sweep_grid, select_config, apply_ruleguard, meta_config
+    )
+    from training.thresholds import fit_platt, calibrate, select_threshold, decision_metrics
+    
+    t0 = time.perf_counter()
+    cache = _make_cache(config)
+    extract_fn = _extract_fn(config)
+    X_sig, X_rr, y = cache.load_dataset(fold['train_records'], extract_fn, workers=1)
+    Xte_sig, Xte_rr, yte = cache.load_dataset(fold['test_records'], extract_fn, workers=1)
+    y_bin = (np.asarray(y) == 'V').astype(np.int32)
+    yte_bin = (np.asarray(yte) == 'V').astype(np.int32)
+    
+    seed = config['seed'] + fold['fold']
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=config['val_size'], random_state=seed)
+    train_idx, val_idx = next(sss.split(np.zeros(len(y_bin)), y_bin))
+    model, history, (val_inputs, yval) = train_model(
+        X_sig, X_rr, y_bin, train_idx, val_idx,
+        hparams=config['hparams'], augment=config['augment'], seed=seed,
+        threads=config['threads'], verbose=0
+    )
+    
+    test_inputs = {'sig': np.expand_dims(Xte_sig, -1).astype(np.float32), 'rr': np.asarray(Xte_rr, np.float32)}
+    proba_val_raw = model.predict(val_inputs, batch_size=1024, verbose=0).ravel()
+    platt = fit_platt(proba_val_raw, yval)
+    proba_val = calibrate(platt, proba_val_raw)
+    proba_test = calibrate(platt, model.predict(test_inputs, batch_size=1024, verbose=0).ravel())
+    thr = select_threshold(yval, proba_val, config['target_prec'], config['target_rec'])
+    ypred = (proba_test >= thr['threshold']).astype(np.int32)
+    
+    rg = select_config(
+        sweep_grid(yval, (proba_val >= thr['threshold']).astype(np.int32),
+                   rr_ratio(val_inputs['rr']), qrs_widths_ms(val_inputs['sig'][:, :, 0], fs=config['fs']),
+                   RR_LO_GRID, RR_HI_GRID, QRS_GRID),
+        max(0.85, config['target_prec'])
+    )
+    ypred_rg = apply_ruleguard(ypred, rr_ratio(Xte_rr), qrs_widths_ms(Xte_sig, fs=config['fs']),
+                               rg['rr_lo'], rg['rr_hi'], rg['qrs_thr'])
+    
+    return {
+        **fold,
+        'pid': os.getpid(),
+        'n_train': int(len(train_idx)),
+        'n_val': int(len(val_idx)),
+        'n_test': int(len(yte_bin)),
+        'history': {k: [float(v) for v in vals] for k, vals in history.history.items()},
+        'threshold': thr,
+        'ruleguard': {**meta_config(rg), 'feasible': rg['feasible'], 'f1_val': rg['f1']},
+        'test': decision_metrics(yte_bin, ypred, proba_test),
+        'test_ruleguard': decision_metrics(yte_bin, ypred_rg, proba_test),
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def _run_fold_task(task):
+    fold, config = task
+    return run_fold(fold, config)
+
+
+def aggregate_folds(results: Sequence[Dict]) -> Dict:
+    """
+    Media y desvío entre folds de las métricas de test (con y sin
+    RuleGuard), del umbral y de la configuración de RuleGuard, más las
+    métricas pooled (matriz de confusión sumada sobre todos los folds).
+    """
+    def stats(values):
+        values = np.asarray(values, dtype=float)
+        return {'mean': float(np.nanmean(values)), 'std': float(np.nanstd(values)),
+                'min': float(np.nanmin(values)), 'max': float(np.nanmax(values))}
+    
+    def pooled(key):
+        tn, fp, fn, tp = (sum(r[key][c] for r in results) for c in ('TN', 'FP', 'FN', 'TP'))
+        prec = tp / (tp + fp) if tp + fp else 0.0
+        rec = tp / (tp + fn) if tp + fn else 0.0
+        return {'accuracy': (tp + tn) / max(1, tp + tn + fp + fn), 'precision_V': prec, 'recall_V': rec,
+                'f1_V': 2 * prec * rec / (prec + rec + 1e-9), 'TN': tn, 'FP': fp, 'FN': fn, 'TP': tp}
+    
+    return {
+        'folds': len(results),
+        'test': {m: stats([r['test'][m] for r in results]) for m in FOLD_METRICS},
+        'test_ruleguard': {m: stats([r['test_ruleguard'][m] for r in results]) for m in FOLD_METRICS},
+        'pooled': pooled('test'),
+        'pooled_ruleguard': pooled('test_ruleguard'),
+        'threshold': stats([r['threshold']['threshold'] for r in results]),
+        'ruleguard': {k: stats([r['ruleguard'][k] for r in results]) for k in ('rr_low', 'rr_high', 'qrs_threshold')},
+    }
+
+
+def _flat_metrics(prefix: str, metrics: Dict) -> Dict[str, float]:
+    return {f"{prefix}_{k}": float(v) for k, v in metrics.items() if np.isfinite(v)}
+
+
+def log_fold_run(result: Dict, config: Dict):
+    """Run hijo de MLflow (anidado en el run activo) con los resultados de un fold."""
+    import mlflow
+    
+    with mlflow.start_run(run_name=f"fold_{result['fold']}", nested=True):
+        mlflow.log_params({
+            'fold': result['fold'],
+            'test_records': ','.join(map(str, result['test_records'])),
+            'n_train': result['n_train'],
+            'n_val': result['n_val'],
+            'n_test': result['n_test'],
+            'seed': config['seed'] + result['fold'],
+            'threshold_selection_method': result['threshold']['method'],
+        })
+        for epoch in range(len(result['history'].get('loss', []))):
+            mlflow.log_metrics({k: v[epoch] for k, v in result['history'].items()}, step=epoch)
+        mlflow.log_metrics({
+            'threshold_optimal': result['threshold']['threshold'],
+            'threshold_precision_val': result['threshold']['precision'],
+            'threshold_recall_val': result['threshold']['recall'],
+            'ruleguard_rr_lo': result['ruleguard']['rr_low'],
+            'ruleguard_rr_hi': result['ruleguard']['rr_high'],
+            'ruleguard_qrs_thr': result['ruleguard']['qrs_threshold'],
+            'fold_seconds': result['seconds'],
+            **_flat_metrics('test', result['test']),
+            **_flat_metrics('test_rg', result['test_ruleguard']),
+        })
+        mlflow.log_dict(result, f"fold_{result['fold']}.json")
+
+
+def log_summary(summary: Dict):
+    """Métricas agregadas en el run padre."""
+    import mlflow
+    
+    metrics = {}
+    for group in ('test', 'test_ruleguard'):
+        prefix = 'cv' if group == 'test' else 'cv_rg'
+        for m, s in summary[group].items():
+            metrics[f"{prefix}_{m}_mean"] = s['mean']
+            metrics[f"{prefix}_{m}_std"] = s['std']
+    metrics.update(_flat_metrics('pooled', summary['pooled']))
+    metrics.update(_flat_metrics('pooled_rg', summary['pooled_ruleguard']))
+    metrics['cv_threshold_mean'] = summary['threshold']['mean']
+    metrics['cv_threshold_std'] = summary['threshold']['std']
+    mlflow.log_metrics({k: v for k, v in metrics.items() if np.isfinite(v)})
+    mlflow.log_dict(summary, "cv_summary.json")
+
+
+def print_summary(results: Sequence[Dict], summary: Dict):
+    print("\n" + "=" * 80)
+    print(f"📊 VALIDACIÓN CRUZADA LEAVE-RECORDS-OUT ({summary['folds']} folds)")
+    print("=" * 80)
+    for r in results:
+        t, g = r['test'], r['test_ruleguard']
+        print(f"  Fold {r['fold']} ({len(r['test_records'])} registros, {r['test_V']} V) "
+              f"thr={r['threshold']['threshold']:.3f} | F1_V={t['f1_V']:.3f} → RG {g['f1_V']:.3f} "
+              f"| P={g['precision_V']:.3f} R={g['recall_V']:.3f} | {r['seconds']:.0f}s")
+    for group, label in (('test', 'Sin RuleGuard'), ('test_ruleguard', 'Con RuleGuard')):
+        s = summary[group]
+        print(f"  {label}: " + " | ".join(f"{m}={s[m]['mean']:.3f}±{s[m]['std']:.3f}" for m in FOLD_METRICS))
+    p = summary['pooled_ruleguard']
+    print(f"  Pooled (RG): P={p['precision_V']:.3f} R={p['recall_V']:.3f} F1={p['f1_V']:.3f}")
+    print(f"  Umbral: {summary['threshold']['mean']:.3f}±{summary['threshold']['std']:.3f}")
+
+
+def run_cross_validation(
+    folds: int = 5,
+    workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    epochs: Optional[int] = None,
+    records: Optional[Sequence] = None,
+    hparams: Optional[Dict] = None,
+    target_prec: float = 0.83,
+    target_rec: float = 0.85,
+    augment: bool = True,
+    seed: int = RANDOM_SEED,
+    use_mlflow: bool = True,
+    results_dir: str = RESULTS_DIR
+) -> Dict:
+    """
+    Corre la validación cruzada completa.
+    
+    Args:
+        folds: Cantidad de folds (grupos de registros)
+        workers: Folds entrenando a la vez (default: min(folds, núcleos))
+        threads_per_worker: Hilos de TF por worker (default: núcleos/workers)
+        epochs: Épocas máximas (default: las de DEFAULT_HPARAMS)
+        records: Registros MIT-BIH (default: TRAIN_RECORDS + TEST_RECORDS)
+        hparams: Hiperparámetros sobre DEFAULT_HPARAMS (p. ej. best_params de Optuna)
+    
+    Returns:
+        {'folds': [resultado por fold], 'summary': agregado, 'path': JSON guardado}
+    """
+    from training.ecg_dataset import TRAIN_RECORDS, TEST_RECORDS
+    from training.model import resolve_hparams
+    
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, folds))
+    threads = max(1, threads_per_worker or cores // workers)
+    hparams = resolve_hparams({**(hparams or {}), **({'epochs': epochs} if epochs else {})})
+    config = {
+        'cache_dir': CACHE_DIR,
+        'base_path': BASE_PATH,
+        'records': list(records or (list(TRAIN_RECORDS) + list(TEST_RECORDS))),
+        'folds': folds,
+        'fs': 360,
+        'deriv_idx': 0,
+        'val_size': 0.15,
+        'seed': seed,
+        'hparams': hparams,
+        'augment': augment,
+        'target_prec': target_prec,
+        'target_rec': target_rec,
+        'threads': threads,
+        'extract_workers': cores,
+    }
+    
+    fold_specs = prepare_folds(config)
+    print(f"🔁 Validación cruzada: {len(fold_specs)} folds sobre {len(config['records'])} registros "
+          f"| Workers: {workers} x {threads} hilos TF")
+    for f in fold_specs:
+        print(f"   Fold {f['fold']}: test={f['test_records']} ({f['test_V']} V)")
+    
+    run = None
+    if use_mlflow:
+        import mlflow
+        mlflow.set_tracking_uri("file:./mlruns")
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        run = mlflow.start_run(run_name=f"CV_{folds}fold_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        mlflow.log_params({
+            'folds': folds, 'workers': workers, 'threads_per_worker': threads,
+            'records': ','.join(map(str, config['records'])), 'random_seed': seed,
+            'augment': augment, 'target_prec': target_prec, 'target_rec': target_rec,
+            **{f"hp_{k}": v for k, v in hparams.items()},
+        })
+    
+    results = []
+    
+    def collect(result):
+        print(f"✅ Fold {result['fold']} listo en {result['seconds']:.0f}s "
+              f"(F1_V RG={result['test_ruleguard']['f1_V']:.3f})")
+        results.append(result)
+        if run is not None:
+            log_fold_run(result, config)
+    
+    try:
+        tasks = [(f, config) for f in fold_specs]
+        if workers == 1:
+            _init_worker(threads)
+            for task in tasks:
+                collect(_run_fold_task(task))
+        else:
+            # maxtasksperchild=1: cada fold en un proceso nuevo (sin grafo ni memoria de TF previos)
+            ctx = multiprocessing.get_context('spawn')
+            with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,), maxtasksperchild=1) as pool:
+                for result in pool.imap_unordered(_run_fold_task, tasks):
+                    collect(result)
+        
+        results.sort(key=lambda r: r['fold'])
+        summary = aggregate_folds(results)
+        print_summary(results, summary)
+        
+        os.makedirs(results_dir, exist_ok=True)
+        path = os.path.join(results_dir, f"cv_{folds}fold_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w') as f:
+            json.dump({'config': config, 'folds': results, 'summary': summary}, f, indent=2)
+        print(f"\n💾 Resultados guardados en: {path}")
+        
+        if run is not None:
+            log_summary(summary)
+            import mlflow
+            mlflow.log_artifact(path)
+    finally:
+        if run is not None:
+            import mlflow
+            mlflow.end_run()
+    
+    return {'folds': results, 'summary': summary, 'path': path}
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Validación cruzada leave-records-out en procesos paralelos')
+    parser.add_argument('--folds', type=int, default=5, help='Cantidad de folds (default: 5)')
+    parser.add_argument('--workers', type=int, default=None, help='Folds en paralelo (default: min(folds, núcleos))')
+    parser.add_argument('--threads-per-worker', type=int, default=None, help='Hilos de TF por worker (default: núcleos/workers)')
+    parser.add_argument('--epochs', type=int, default=None, help='Épocas máximas por fold')
+    parser.add_argument('--records', type=int, nargs='*', default=None, help='Registros (default: TRAIN_RECORDS + TEST_RECORDS)')
+    parser.add_argument('--hparams', default=None, help='JSON de hiperparámetros (p. ej. best_params_*.json de Optuna)')
+    parser.add_argument('--no-augment', action='store_true')
+    parser.add_argument('--no-mlflow', action='store_true', help='No registrar en MLflow')
+    args = parser.parse_args()
+    
+    hparams = None
+    if args.hparams:
+        with open(args.hparams) as f:
+            hparams = json.load(f)
+    
+    run_cross_validation(
+        folds=args.folds,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        epochs=args.epochs,
+        records=args.records,
+        hparams=hparams,
+        augment=not args.no_augment,
+        use_mlflow=not args.no_mlflow
+    )
@@ -0,0 +1,225 @@
+"""
+Cache de dataset de latidos en shards .npy memory-mapped.
+
+Cada registro MIT-BIH se extrae una sola vez a tres shards (ventanas, RR y
+etiquetas) bajo un directorio identificado por el hash de los parámetros de
+preprocesamiento (fs, banda, orden, ventana, derivación, mapeo de clases).
+Cambiar cualquiera de ellos genera una cache nueva; nunca se mezclan datos
+preprocesados de forma distinta.
+
+Los splits (lista ordenada de registros) se consolidan en un único .npy por
+array y se cargan con mmap_mode='r': experimentos repetidos arrancan en
+segundos y varios procesos comparten la misma copia en el page cache.
+    
+    cache/datasets/<hash>/
+        params.json                 parámetros que originan el hash
+        manifest.json               índice de registros y splits
+        record_<id>_{sig,rr,y}.npy  + record_<id>.json
+        split_<id>_{sig,rr,y}.npy   + split_<id>.json
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from training.parallel_extraction import extract_records
+
+CACHE_FORMAT_VERSION = 1
+ARRAYS = ('sig', 'rr', 'y')
+
+Dataset = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def preprocessing_key(params: Dict) -> str:
+    """Hash estable de los parámetros de preprocesamiento (y del formato de la cache)."""
+    payload = json.dumps({'format': CACHE_FORMAT_VERSION, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _atomic_save(path: Path, array: np.ndarray):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp, path)
+
+
+def _atomic_json(path: Path, payload: Dict):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _load(path: Path, mmap: bool) -> np.ndarray:
+    if mmap:
+        try:
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        except ValueError:
+            pass  # mmap no admite arrays vacíos
+    return np.load(path, allow_pickle=False)
+
+
+class DatasetCache:
+    """
+    Cache de (X_sig, X_rr, y) por registro, con splits consolidados.
+    
+    Los archivos se escriben a un temporal y se renombran (os.replace), y la
+    entrada JSON de cada registro/split se escribe al final: un shard solo
+    existe para la cache cuando su JSON existe. Varios procesos pueden
+    poblar la misma cache en paralelo sin corromperla.
+    """
+    
+    def __init__(self, cache_dir, params: Dict):
+        self.params = params
+        self.extraction_results = []
+        self.key = preprocessing_key(params)
+        self.root = Path(cache_dir) / self.key
+        self.root.mkdir(parents=True, exist_ok=True)
+        params_path = self.root / 'params.json'
+        if not params_path.exists():
+            _atomic_json(params_path, {'format': CACHE_FORMAT_VERSION, **params})
+    
+    # ------------------------------------------------------------------
+    # Registros
+    # ------------------------------------------------------------------
+    
+    def _record_path(self, record_id, name: str) -> Path:
+        return self.root / f'record_{record_id}_{name}.npy'
+    
+    def has_record(self, record_id) -> bool:
+        return (self.root / f'record_{record_id}.json').exists()
+    
+    def save_record(self, record_id, X_sig: np.ndarray, X_rr: np.ndarray, y: np.ndarray):
+        y = np.asarray(y, dtype='<U1') if len(y) else np.empty(0, dtype='<U1')
+        for name, array in zip(ARRAYS, (X_sig, X_rr, y)):
+            _atomic_save(self._record_path(record_id, name), np.ascontiguousarray(array))
+        classes, counts = np.unique(y, return_counts=True)
+        _atomic_json(self.root / f'record_{record_id}.json', {
+            'record_id': record_id,
+            'n': int(len(y)),
+            'counts': {str(c): int(n) for c, n in zip(classes, counts)},
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+    
+    def load_record(self, record_id, mmap: bool = True) -> Dataset:
+        return tuple(_load(self._record_path(record_id, name), mmap) for name in ARRAYS)
+    
+    def record_info(self, record_id) -> Dict:
+        with open(self.root / f'record_{record_id}.json') as f:
+            return json.load(f)
+    
+    # ------------------------------------------------------------------
+    # Splits consolidados
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def split_id(records: Iterable) -> str:
+        return hashlib.sha256(json.dumps([str(r) for r in records]).encode('utf-8')).hexdigest()[:12]
+    
+    def _split_path(self, split: str, name: str) -> Path:
+        return self.root / f'split_{split}_{name}.npy'
+    
+    def _consolidate(self, split: str, records: List) -> Dict:
+        """Concatena los shards de los registros en un .npy por array, sin cargarlos enteros."""
+        infos = [self.record_info(r) for r in records]
+        total = sum(info['n'] for info in infos)
+        for name in ARRAYS:
+            shards = [_load(self._record_path(r, name), mmap=True) for r in records]
+            first = shards[0]
+            path = self._split_path(split, name)
+            tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+            out = np.lib.format.open_memmap(tmp, mode='w+', dtype=first.dtype, shape=(total,) + first.shape[1:])
+            offset = 0
+            for shard in shards:
+                out[offset:offset + len(shard)] = shard
+                offset += len(shard)
+            out.flush()
+            del out
+            os.replace(tmp, path)
+        info = {
+            'records': [str(r) for r in records],
+            'n': total,
+            'offsets': np.cumsum([0] + [i['n'] for i in infos]).tolist(),
+        }
+        _atomic_json(self.root / f'split_{split}.json', info)
+        return info
+    
+    def load_dataset(
+        self,
+        records: List,
+        extract_fn: Callable[[object], Dataset],
+        mmap: bool = True,
+        workers: Optional[int] = 1
+    ) -> Dataset:
+        """
+        Devuelve (X_sig, X_rr, y) de los registros en el orden dado.
+        
+        Extrae con `extract_fn(record_id)` (en `workers` procesos) solo los
+        registros que faltan en la cache y carga el split consolidado
+        (memory-mapped si `mmap`). Los registros ausentes o con error no se
+        cachean ni entran en el split; su detalle queda en
+        `self.extraction_results`.
+        """
+        records = list(records)
+        if not records:
+            raise ValueError("load_dataset requiere al menos un registro")
+        cached = [r for r in records if self.has_record(r)]
+        missing = [r for r in records if not self.has_record(r)]
+        self.extraction_results = extract_records(missing, extract_fn, workers=workers) if missing else []
+        for result in self.extraction_results:
+            if result.usable:
+                self.save_record(result.record_id, *result.data)
+                result.data = None
+        self._warn_empty(cached)
+        
+        failed = {r.record_id for r in self.extraction_results if not r.usable}
+        records = [r for r in records if r not in failed]
+        if not records:
+            win = int(self.params.get('win', 0))
+            return (np.empty((0, win), np.float32), np.empty((0, 3), np.float32), np.array([]))
+        split = self.split_id(records)
+        if not (self.root / f'split_{split}.json').exists():
+            self._consolidate(split, records)
+        self.write_manifest()
+        
+        return tuple(_load(self._split_path(split, name), mmap) for name in ARRAYS)
+    
+    def _warn_empty(self, records: List):
+        for record_id in records:
+            if self.record_info(record_id)['n'] == 0:
+                print(f'[ADVERTENCIA] Record {record_id} sin ventanas válidas ({self.key}).')
+    
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+    
+    def manifest(self) -> Dict:
+        records, splits = {}, {}
+        for path in sorted(self.root.glob('record_*.json')):
+            with open(path) as f:
+                info = json.load(f)
+            records[str(info['record_id'])] = info
+        for path in sorted(self.root.glob('split_*.json')):
+            with open(path) as f:
+                splits[path.stem.replace('split_', '')] = json.load(f)
+        return {'key': self.key, 'params': self.params, 'records': records, 'splits': splits}
+    
+    def write_manifest(self) -> Path:
+        path = self.root / 'manifest.json'
+        _atomic_json(path, self.manifest())
+        return path
+
+
+def load_cached_dataset(
+    cache_dir,
+    params: Dict,
+    records: List,
+    extract_fn: Callable[[object], Dataset],
+    mmap: bool = True
+) -> Dataset:
+    """Atajo: abre la cache para `params` y carga el split de `records`."""
+    return DatasetCache(cache_dir, params).load_dataset(records, extract_fn, mmap=mmap)
@@ -0,0 +1,349 @@
+"""
+Destilación de conocimiento: CNN compacta (student) entrenada con las
+probabilidades del modelo de producción (teacher).
+
+El student tiene la misma topología que `build_model` (tres bloques conv +
+rama RR) con menos filtros y, opcionalmente, convoluciones depthwise-separable
+en los bloques 2 y 3. La pérdida combina:
+  
+  - focal loss contra la etiqueta real (peso `alpha`)
+  - BCE contra la probabilidad del teacher suavizada con temperatura T
+    (sigmoid(logit(p) / T), escalada por T², peso 1 - alpha)
+
+El teacher se evalúa al vuelo sobre el mismo batch (con la augmentation del
+pipeline tf.data), así que no hace falta precalcular etiquetas blandas.
+Después se eligen Platt, umbral y RuleGuard propios del student, se mide la
+latencia TFLite de ambos modelos y se exporta el set `model_<tag>_student.*`
+junto al del teacher.
+    
+    python -m training.distillation --teacher models/ecg_nv_cnn/model_v7.keras --epochs 20
+"""
+import json
+import os
+import tempfile
+from datetime import datetime
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from training.finetune import fit_decision, evaluate
+from training.model import binary_focal_loss, build_model, fit_streaming, resolve_hparams, training_callbacks
+from training.quantization import measure_latency
+from training.ruleguard import meta_config
+from training.thresholds import decision_meta
+
+RANDOM_SEED = 42
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVE_DIR = os.path.join(PROJECT_ROOT, 'models', 'ecg_nv_cnn')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'datasets')
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+EXPERIMENT_NAME = "distillation"
+
+# Arquitectura del student por defecto (sobre DEFAULT_HPARAMS; teacher: 32/64/128 + 64)
+STUDENT_HPARAMS = {'conv1_filters': 16, 'conv2_filters': 32, 'conv3_filters': 48, 'dense_units': 32}
+DISTILL_ALPHA = 0.5
+DISTILL_TEMPERATURE = 4.0
+LATENCY_BATCH_SIZES = (1, 256)
+
+
+def _soften(p: tf.Tensor, temperature: float) -> tf.Tensor:
+    p = tf.clip_by_value(tf.cast(p, tf.float32), 1e-7, 1 - 1e-7)
+    return tf.sigmoid((tf.math.log(p) - tf.math.log1p(-p)) / temperature)
+
+
+class Distiller(tf.keras.Model):
+    """
+    Envoltorio de entrenamiento: `call` es el student y `compute_loss`
+    agrega el término de destilación contra el teacher (congelado). Las
+    métricas compiladas (accuracy, PR-AUC) se calculan sobre el student, así
+    que los callbacks estándar sobre val_pr_auc funcionan sin cambios.
+    """
+    
+    def __init__(self, student: tf.keras.Model, teacher: tf.keras.Model, alpha: float = DISTILL_ALPHA,
+                 temperature: float = DISTILL_TEMPERATURE, focal_gamma: float = 2.0, focal_alpha: float = 0.35):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.alpha = float(alpha)
+        self.temperature = float(temperature)
+        self.hard_loss = binary_focal_loss(gamma=focal_gamma, alpha=focal_alpha)
+    
+    def call(self, inputs, training=False):
+        return self.student(inputs, training=training)
+    
+    def compute_loss(self, x=None, y=None, y_pred=None, sample_weight=None, training=True):
+        y = tf.reshape(tf.cast(y, y_pred.dtype), tf.shape(y_pred))
+        teacher_soft = _soften(self.teacher(x, training=False), self.temperature)
+        student_soft = _soften(y_pred, self.temperature)
+        soft = tf.reduce_mean(tf.keras.losses.binary_crossentropy(teacher_soft, student_soft))
+        loss = self.alpha * self.hard_loss(y, y_pred) + (1 - self.alpha) * self.temperature ** 2 * soft
+        # Regularización L2 del student
+        return loss + tf.add_n(self.student.losses) if self.student.losses else loss
+
+
+def build_student(win: int = 360, hparams: Optional[Dict] = None, separable: bool = False) -> tf.keras.Model:
+    """Student sin compilar: `build_model` con STUDENT_HPARAMS (o `hparams`) encima."""
+    return build_model(win, {**STUDENT_HPARAMS, **(hparams or {})}, compile=False, separable=separable)
+
+
+def tflite_bytes(model: tf.keras.Model) -> bytes:
+    """Conversión TFLite float de un modelo en memoria (vía SavedModel temporal)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        model.export(tmp)
+        return tf.lite.TFLiteConverter.from_saved_model(tmp).convert()
+
+
+def latency_profile(tflite_model: bytes, X_sig: np.ndarray, X_rr: np.ndarray,
+                    batch_sizes=LATENCY_BATCH_SIZES, repeats: int = 50) -> Dict[str, float]:
+    """Latencia mediana TFLite (ms, 1 hilo) por tamaño de batch: {'batch_1': ..., 'batch_256': ...}."""
+    return {
+        f'batch_{bs}': measure_latency(tflite_model, X_sig, X_rr, batch_size=bs,
+                                       repeats=repeats if bs == 1 else max(5, repeats // 5))
+        for bs in batch_sizes
+    }
+
+
+def distill_student(
+    teacher: tf.keras.Model,
+    X_sig: np.ndarray,
+    X_rr: np.ndarray,
+    y: np.ndarray,
+    train_idx: np.ndarray,
+    validation: Tuple[Dict, np.ndarray],
+    test_data: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    teacher_tag: str = 'v7',
+    teacher_meta: Optional[Dict] = None,
+    teacher_tflite: Optional[bytes] = None,
+    hparams: Optional[Dict] = None,
+    separable: bool = False,
+    alpha: float = DISTILL_ALPHA,
+    temperature: float = DISTILL_TEMPERATURE,
+    target_prec: float = 0.83,
+    target_rec: float = 0.85,
+    augment: bool = True,
+    seed: int = RANDOM_SEED,
+    save_dir: str = SAVE_DIR,
+    verbose: int = 1
+) -> Dict:
+    """
+    Entrena el student contra `teacher`, le elige su propia regla de decisión
+    y guarda `model_<teacher_tag>_student.{keras,tflite}`, `saved_model_...`,
+    `history_...csv` y `meta_...json`.
+    
+    Args:
+        X_sig / X_rr / y: Dataset de entrenamiento (y binaria; pueden ser memmaps)
+        train_idx: Índices de entrenamiento (sin la validación)
+        validation: (inputs, yval) para callbacks, Platt, umbral y RuleGuard
+        test_data: (X_sig, X_rr, y_bin) para las métricas de ambos modelos
+        teacher_meta: meta_<teacher_tag>.json (se copian clases, fs, win, ...)
+        teacher_tflite: TFLite float del teacher (si no, se convierte)
+        hparams: Sobre DEFAULT_HPARAMS + STUDENT_HPARAMS (filtros, lr, epochs, ...)
+    
+    Returns:
+        dict con tag, paths, meta del student y el bloque `student` para el
+        meta del teacher
+    """
+    hp = resolve_hparams({**STUDENT_HPARAMS, **(hparams or {})})
+    teacher_meta = teacher_meta or {}
+    fs = int(teacher_meta.get('fs', 360))
+    tag = f"{teacher_tag}_student"
+    val_inputs, yval = validation
+    
+    tf.keras.utils.set_random_seed(seed)
+    student = build_student(X_sig.shape[1], hp, separable=separable)
+    distiller = Distiller(student, teacher, alpha=alpha, temperature=temperature,
+                          focal_gamma=hp['focal_gamma'], focal_alpha=hp['focal_alpha'])
+    distiller.compile(
+        optimizer=tf.keras.optimizers.Adam(hp['learning_rate']),
+        metrics=['accuracy', tf.keras.metrics.AUC(curve='PR', name='pr_auc')]
+    )
+    print(f"🎓 Destilación model_{teacher_tag} ({teacher.count_params():,} params) → "
+          f"model_{tag} ({student.count_params():,} params) | alpha={alpha} T={temperature}")
+    history = fit_streaming(
+        distiller, X_sig, X_rr, y, train_idx, validation, hp,
+        augment=augment, seed=seed, callback_list=training_callbacks(), verbose=verbose
+    )
+    
+    # Cada modelo con su propia regla (Platt + umbral + RuleGuard) sobre la misma validación
+    decisions = {name: fit_decision(model, val_inputs, yval, target_prec, target_rec, fs)
+                 for name, model in (('teacher', teacher), ('student', student))}
+    metrics = {name: evaluate(model, decisions[name], *test_data, fs=fs)
+               for name, model in (('teacher', teacher), ('student', student))}
+    
+    # Artefactos del student
+    os.makedirs(save_dir, exist_ok=True)
+    paths = {
+        'keras': os.path.join(save_dir, f'model_{tag}.keras'),
+        'saved_model': os.path.join(save_dir, f'saved_model_{tag}'),
+        'tflite': os.path.join(save_dir, f'model_{tag}.tflite'),
+        'history': os.path.join(save_dir, f'history_{tag}.csv'),
+        'meta': os.path.join(save_dir, f'meta_{tag}.json'),
+    }
+    student.save(paths['keras'])
+    student.export(paths['saved_model'])
+    student_tflite = tf.lite.TFLiteConverter.from_saved_model(paths['saved_model']).convert()
+    with open(paths['tflite'], 'wb') as f:
+        f.write(student_tflite)
+    pd.DataFrame(history.history).to_csv(paths['history'], index=False)
+    
+    teacher_tflite = teacher_tflite or tflite_bytes(teacher)
+    latency = {
+        'teacher': latency_profile(teacher_tflite, test_data[0], test_data[1]),
+        'student': latency_profile(student_tflite, test_data[0], test_data[1]),
+    }
+    
+    meta = {
+        **{k: teacher_meta[k] for k in ('classes', 'fs', 'win', 'deriv_idx', 'normalizacion', 'inputs',
+                                        'train_records', 'test_records') if k in teacher_meta},
+        "augmentation": bool(augment),
+        "ruleguard": True,
+        "ruleguard_config": meta_config(decisions['student']['ruleguard']),
+        "decision": decision_meta(decisions['student']['platt'], decisions['student']['selection']),
+        "threshold_note": "thr_opt del student (validación de distribución real + Platt)",
+        "distillation": {
+            "teacher": f"model_{teacher_tag}",
+            "teacher_mlflow_run_id": teacher_meta.get('mlflow_run_id'),
+            "alpha": float(alpha),
+            "temperature": float(temperature),
+            "separable": bool(separable),
+            "architecture": {k: hp[k] for k in STUDENT_HPARAMS},
+            "params": int(student.count_params()),
+            "teacher_params": int(teacher.count_params()),
+            "epochs": len(history.history['loss']),
+        },
+        "latency_ms": latency['student'],
+        "tflite_size_kb": round(len(student_tflite) / 1024, 1),
+        "metrics": metrics['student'],
+        "teacher_latency_ms": latency['teacher'],
+        "teacher_metrics": metrics['teacher'],
+        "teacher_tflite_size_kb": round(len(teacher_tflite) / 1024, 1),
+        "timestamp": datetime.now().isoformat()
+    }
+    with open(paths['meta'], 'w') as f:
+        json.dump(meta, f, indent=2)
+    
+    # Resumen para meta_<teacher_tag>.json
+    student_block = {
+        "model": f"model_{tag}",
+        "params": meta['distillation']['params'],
+        "tflite_size_kb": meta['tflite_size_kb'],
+        "latency_ms": latency['student'],
+        "teacher_latency_ms": latency['teacher'],
+        "speedup": {bs: round(latency['teacher'][bs] / max(latency['student'][bs], 1e-9), 2) for bs in latency['student']},
+        "metrics": metrics['student'],
+        "teacher_metrics": metrics['teacher'],
+    }
+    return {'tag': tag, 'paths': paths, 'meta': meta, 'student_block': student_block,
+            'history': history.history, 'model': student}
+
+
+def distillation_mlflow_metrics(result: Dict) -> Dict[str, float]:
+    """Métricas planas para MLflow (prefijo `student_` / `teacher_`)."""
+    meta = result['meta']
+    out = {'student_params': float(meta['distillation']['params'])}
+    for who, lat_key, met_key in (('student', 'latency_ms', 'metrics'), ('teacher', 'teacher_latency_ms', 'teacher_metrics')):
+        out.update({f"{who}_latency_{bs}_ms": float(v) for bs, v in meta[lat_key].items()})
+        out.update({f"{who}_test_{k}": float(v) for k, v in meta[met_key].items() if np.isfinite(v)})
+    return out
+
+
+def print_distillation_report(result: Dict):
+    meta = result['meta']
+    print("\n" + "=" * 80)
+    print(f"🎓 DESTILACIÓN → model_{result['tag']} "
+          f"({meta['distillation']['params']:,} vs {meta['distillation']['teacher_params']:,} params)")
+    print("=" * 80)
+    for who, lat_key, met_key in (('teacher', 'teacher_latency_ms', 'teacher_metrics'), ('student', 'latency_ms', 'metrics')):
+        m = meta[met_key]
+        print(f"  {who:<8} Prec_V {m['precision_V']:.3f} | Rec_V {m['recall_V']:.3f} | F1_V {m['f1_V']:.3f} | "
+              + " | ".join(f"{bs} {ms:.3f} ms" for bs, ms in meta[lat_key].items()))
+    print(f"  Speedup: {result['student_block']['speedup']}")
+    for key, path in result['paths'].items():
+        print(f"  {key}: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    from sklearn.model_selection import StratifiedShuffleSplit
+    
+    from training.dataset_cache import DatasetCache
+    from training.ecg_dataset import TRAIN_RECORDS, TEST_RECORDS, extract_windows, preprocessing_params
+    from training.model import validation_arrays
+    
+    parser = argparse.ArgumentParser(description='Destilación del modelo de producción en una CNN compacta')
+    parser.add_argument('--teacher', default=os.path.join(SAVE_DIR, 'model_v7.keras'), help='Teacher (.keras)')
+    parser.add_argument('--alpha', type=float, default=DISTILL_ALPHA, help='Peso de la focal loss con la etiqueta real')
+    parser.add_argument('--temperature', type=float, default=DISTILL_TEMPERATURE)
+    parser.add_argument('--separable', action='store_true', help='Conv depthwise-separable en los bloques 2 y 3')
+    parser.add_argument('--filters', type=int, nargs=3, default=None, metavar=('C1', 'C2', 'C3'))
+    parser.add_argument('--dense-units', type=int, default=None)
+    parser.add_argument('--epochs', type=int, default=None)
+    parser.add_argument('--no-mlflow', action='store_true')
+    args = parser.parse_args()
+    
+    hparams = {}
+    if args.filters:
+        hparams.update(conv1_filters=args.filters[0], conv2_filters=args.filters[1], conv3_filters=args.filters[2])
+    if args.dense_units:
+        hparams['dense_units'] = args.dense_units
+    if args.epochs:
+        hparams['epochs'] = args.epochs
+    
+    teacher_name = os.path.splitext(os.path.basename(args.teacher))[0]
+    teacher_tag = teacher_name.replace('model_', '')
+    teacher_meta_path = os.path.join(os.path.dirname(args.teacher), f"meta_{teacher_tag}.json")
+    teacher_meta = {}
+    if os.path.exists(teacher_meta_path):
+        with open(teacher_meta_path) as f:
+            teacher_meta = json.load(f)
+    
+    cache = DatasetCache(CACHE_DIR, preprocessing_params())
+    extract_fn = partial(extract_windows, base_path=BASE_PATH)
+    Xtr_sig, Xtr_rr, ytr = cache.load_dataset(TRAIN_RECORDS, extract_fn, workers=os.cpu_count())
+    Xte_sig, Xte_rr, yte = cache.load_dataset(TEST_RECORDS, extract_fn, workers=os.cpu_count())
+    ytr_bin = (np.asarray(ytr) == 'V').astype(np.int32)
+    yte_bin = (np.asarray(yte) == 'V').astype(np.int32)
+    
+    # Mismo hold-out que el script ([C05]: 15% estratificado, semilla fija)
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=0.15, random_state=RANDOM_SEED)
+    tr_idx, val_idx = next(sss.split(np.zeros(len(ytr_bin)), ytr_bin))
+    
+    teacher = tf.keras.models.load_model(args.teacher, compile=False)
+    result = distill_student(
+        teacher, Xtr_sig, Xtr_rr, ytr_bin, tr_idx, validation_arrays(Xtr_sig, Xtr_rr, ytr_bin, val_idx),
+        (Xte_sig, Xte_rr, yte_bin), teacher_tag=teacher_tag, teacher_meta=teacher_meta,
+        hparams=hparams, separable=args.separable, alpha=args.alpha, temperature=args.temperature,
+        save_dir=os.path.dirname(args.teacher)
+    )
+    
+    if teacher_meta:
+        teacher_meta['student'] = result['student_block']
+        with open(teacher_meta_path, 'w') as f:
+            json.dump(teacher_meta, f, indent=2)
+    
+    if not args.no_mlflow:
+        import mlflow
+        mlflow.set_tracking_uri("file:./mlruns")
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        with mlflow.start_run(run_name=f"KD_{result['tag']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}") as run:
+            mlflow.set_tag("model_tag", result['tag'])
+            mlflow.log_params({
+                'teacher': teacher_name, 'alpha': args.alpha, 'temperature': args.temperature,
+                'separable': args.separable, **{f"hp_{k}": v for k, v in resolve_hparams({**STUDENT_HPARAMS, **hparams}).items()},
+            })
+            for epoch in range(len(result['history']['loss'])):
+                mlflow.log_metrics({k: float(v[epoch]) for k, v in result['history'].items()}, step=epoch)
+            mlflow.log_metrics(distillation_mlflow_metrics(result))
+            result['meta']['mlflow_run_id'] = run.info.run_id
+            with open(result['paths']['meta'], 'w') as f:
+                json.dump(result['meta'], f, indent=2)
+            for key in ('keras', 'tflite'):
+                mlflow.log_artifact(result['paths'][key], "models")
+            mlflow.log_artifact(result['paths']['meta'], "metadata")
+    
+    print_distillation_report(result)
@@ -0,0 +1,212 @@
+"""
+Extracción de latidos de registros MIT-BIH (WFDB).
+
+Funciones de señal y dataset usadas por deteccionarritmias.py. Viven en un
+módulo importable para que los procesos del pool de extracción puedan
+ejecutarlas sin re-ejecutar el script de entrenamiento.
+"""
+import os
+
+import numpy as np
+from scipy.signal import butter, filtfilt
+
+CLASSES = ('N', 'V')
+# Mapeo AAMI de símbolos de anotación a clase (el resto -> 'Q', descartado)
+AAMI_MAP = {'N': 'N', 'L': 'N', 'R': 'N', 'e': 'N', 'j': 'N', 'V': 'V', 'E': 'V'}
+
+# Split fijo por paciente del entrenamiento principal
+TRAIN_RECORDS = [100,101,102,103,104,105,106,107,108,109,
+                 111,112,113,114,115,116,117,118,119,
+                 121,122,123,124]
+TEST_RECORDS  = [200,201,202,203,205,207,208,209,210,
+                 212,213,214,215,217,219,220,221,222,
+                 223,228,230,231,232,233,234]
+
+
+def preprocessing_params(fs=360, deriv_idx=0, classes=CLASSES, aami=AAMI_MAP, band=(0.5, 40.0), order=4):
+    """Todo lo que cambia las ventanas/etiquetas extraídas (clave de la cache de dataset)."""
+    classes = list(classes)
+    return {
+        'fs': fs, 'band': list(band), 'order': order, 'win': 2*int(0.5*fs), 'deriv_idx': deriv_idx,
+        'classes': classes, 'aami': {k: v for k, v in aami.items() if v in classes},
+    }
+
+
+def bandpass(signal, fs=360, low=0.5, high=40.0, order=4):
+    nyq = 0.5*fs
+    b, a = butter(order, [low/nyq, high/nyq], btype='band')
+    return filtfilt(b, a, signal, method="gust")
+
+
+def robust_z(x, eps=1e-6):
+    # z-score robusto (por ventana)
+    mu  = np.mean(x)
+    std = np.std(x)
+    return (x - mu) / (std + eps)
+
+
+def read_record(record_id, base_path, deriv_idx=0):
+    """Lee la derivación y las anotaciones 'atr' de un registro WFDB."""
+    import wfdb
+    rec = wfdb.rdrecord(os.path.join(base_path, f'{record_id}'))
+    ann = wfdb.rdann   (os.path.join(base_path, f'{record_id}'), 'atr')
+    return rec.p_signal[:, deriv_idx].astype(np.float32), ann.sample, ann.symbol
+
+
+def beat_windows(sig, samples, symbols, fs=360, classes=CLASSES, aami=AAMI_MAP, chunk=65536):
+    """
+    Ventanas, RR y etiquetas de todas las anotaciones como pipeline de arrays:
+    máscara de anotaciones válidas, un gather (n, WIN) por bloque de `chunk`
+    latidos, z-score por fila y mapeo AAMI vectorizado.
+    
+    Idéntico bit a bit a `_beat_windows_loop` (ver `check_vectorized`).
+    """
+    half = int(0.5*fs)
+    win = 2*half
+    samples = np.asarray(samples, dtype=np.int64)
+    n = len(samples)
+    if n == 0:
+        return _empty(win)
+    
+    # Ventana completa dentro de la señal y RR previo/siguiente definidos
+    idx = np.arange(n)
+    keep = (samples - half >= 0) & (samples + half <= len(sig)) & (idx >= 1) & (idx < n - 1)
+    
+    # AAMI: se mapea cada símbolo distinto una sola vez
+    uniq, inverse = np.unique(np.asarray(symbols, dtype=str), return_inverse=True)
+    labels = np.array([aami.get(sym, 'Q') for sym in uniq])[inverse]
+    keep &= np.isin(labels, list(classes))
+    
+    sel = np.flatnonzero(keep)
+    if len(sel) == 0:
+        return _empty(win)
+    
+    rr_sec = np.diff(samples) / fs
+    rr_prev = rr_sec[sel - 1]
+    rr_next = rr_sec[sel]
+    X_rr = np.stack([rr_prev, rr_next, rr_next / (rr_prev + 1e-6)], axis=1).astype(np.float32)
+    
+    sig = np.asarray(sig)
+    offsets = np.arange(-half, half)
+    X_sig = np.empty((len(sel), win), np.float32)
+    for start in range(0, len(sel), chunk):
+        centers = samples[sel[start:start + chunk]]
+        seg = sig[centers[:, None] + offsets]
+        mu = seg.mean(axis=1, keepdims=True)
+        std = seg.std(axis=1, keepdims=True)
+        X_sig[start:start + chunk] = (seg - mu) / (std + 1e-6)
+    
+    return X_sig, X_rr, labels[sel]
+
+
+def _empty(win):
+    return (np.empty((0, win), np.float32),
+            np.empty((0, 3),  np.float32),
+            np.array([]))
+
+
+def _beat_windows_loop(sig, samples, symbols, fs=360, classes=CLASSES, aami=AAMI_MAP):
+    """Implementación original latido a latido; referencia para `check_vectorized`."""
+    half = int(0.5*fs)
+    win = 2*half
+    rr_sec = np.diff(samples) / fs
+    
+    X_sig, X_rr, y = [], [], []
+    for i, (samp, sym) in enumerate(zip(samples, symbols)):
+        s0, s1 = samp - half, samp + half
+        if s0 < 0 or s1 > len(sig):  # ventana incompleta
+            continue
+        
+        w = sig[s0:s1]
+        w = robust_z(w)
+        
+        rr_prev = rr_sec[i-1] if 0 <= i-1 < len(rr_sec) else np.nan
+        rr_next = rr_sec[i]   if i < len(rr_sec)      else np.nan
+        if np.isnan(rr_prev) or np.isnan(rr_next):
+            continue
+        ratio = rr_next / (rr_prev + 1e-6)
+        
+        cls = aami.get(sym, 'Q')
+        if cls in classes:
+            X_sig.append(w); X_rr.append([rr_prev, rr_next, ratio]); y.append(cls)
+    
+    if not X_sig:
+        return _empty(win)
+    return (np.stack(X_sig).astype(np.float32),
+            np.stack(X_rr).astype(np.float32),
+            np.array(y))
+
+
+def extract_windows(record_id, base_path, deriv_idx=0, fs=360, classes=CLASSES, aami=AAMI_MAP):
+    """
+    Salida:
+      X_sig: (n, WIN)  ventana ECG filtrada y normalizada (z-score)
+      X_rr : (n, 3)    [RR_prev, RR_next, ratio]
+      y    : (n,)      'N' o 'V'
+    """
+    sig, samples, symbols = read_record(record_id, base_path, deriv_idx)
+    sig = bandpass(sig, fs=fs, low=0.5, high=40.0, order=4)
+    return beat_windows(sig, samples, symbols, fs=fs, classes=classes, aami=aami)
+
+
+# ----------------------------------------------------------------------
+# Verificación: vectorizado == bucle original
+# ----------------------------------------------------------------------
+
+def _same(a, b) -> bool:
+    a, b = np.asarray(a), np.asarray(b)
+    return a.shape == b.shape and a.dtype == b.dtype and np.array_equal(a, b)
+
+
+def synthetic_record(n_beats=2000, fs=360, seed=0):
+    """
+    Señal filtrada y anotaciones sintéticas con los casos borde del bucle:
+    latidos pegados a los extremos, símbolos no-latido ('+', '~', '|') y
+    clases fuera de N/V.
+    """
+    rng = np.random.default_rng(seed)
+    rr = rng.integers(int(0.3*fs), int(1.6*fs), size=n_beats)
+    samples = np.cumsum(rr) - rr[0] + rng.integers(0, fs)
+    sig = bandpass(rng.standard_normal(samples[-1] + rng.integers(0, fs)).astype(np.float32), fs=fs)
+    pool = list('NNNNNNLRVVEAJSF/Qf') + ['+', '~', '|', 'e', 'j']
+    symbols = [pool[k] for k in rng.integers(0, len(pool), size=n_beats)]
+    return sig, samples, symbols
+
+
+def check_vectorized(records=None, base_path=None, deriv_idx=0, n_synthetic=20, fs=360) -> bool:
+    """
+    Compara `beat_windows` con `_beat_windows_loop` (forma, dtype y valores
+    exactos) sobre registros reales (si se indican) y sintéticos.
+    """
+    cases = []
+    for record_id in records or []:
+        sig, samples, symbols = read_record(record_id, base_path, deriv_idx)
+        cases.append((f'record {record_id}', bandpass(sig, fs=fs), samples, symbols))
+    for seed in range(n_synthetic):
+        cases.append((f'synthetic {seed}', *synthetic_record(n_beats=50 + 200*seed, fs=fs, seed=seed)))
+    cases.append(('sin anotaciones', np.zeros(10*fs), np.array([], dtype=np.int64), []))
+    
+    ok = True
+    for name, sig, samples, symbols in cases:
+        ref = _beat_windows_loop(sig, samples, symbols, fs=fs)
+        vec = beat_windows(sig, samples, symbols, fs=fs, chunk=97)
+        same = all(_same(a, b) for a, b in zip(ref, vec))
+        ok &= same
+        print(f"  {'✅' if same else '❌'} {name}: {len(ref[2])} latidos")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Verifica que la extracción vectorizada sea idéntica al bucle original')
+    parser.add_argument('--records', nargs='*', default=[], help='Registros MIT-BIH a comparar (requiere wfdb)')
+    parser.add_argument('--base-path', default='mit-bih')
+    parser.add_argument('--deriv-idx', type=int, default=0)
+    parser.add_argument('--synthetic', type=int, default=20, help='Casos sintéticos')
+    args = parser.parse_args()
+    
+    passed = check_vectorized(args.records, args.base_path, args.deriv_idx, args.synthetic)
+    print("✅ Extracción vectorizada idéntica" if passed else "❌ La extracción vectorizada difiere")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,327 @@
+"""
+Fine-tuning warm-start del modelo de producción con datos etiquetados nuevos.
+
+En lugar de reentrenar desde cero sobre todo MIT-BIH, parte de los pesos de
+`model_v7.keras` (u otra versión) y entrena unas pocas épocas sobre:
+  
+  - latidos nuevos: archivos .npz con `sig` (n, WIN), `rr` (n, 3) e `y`
+    ('N'/'V'), con el mismo preprocesamiento que `extract_windows`
+    (band-pass + z-score por ventana), o registros WFDB propios
+  - replay: una muestra de los registros de entrenamiento MIT-BIH (cache de
+    dataset), para no olvidar la distribución original
+
+Opcionalmente congela el tronco convolucional (solo se ajustan las capas
+densas). Después vuelve a elegir umbral (Platt + metas de Prec/Rec) y
+RuleGuard sobre la validación, compara contra el modelo base con la misma
+regla y emite un set de artefactos versionado (model_vN.keras,
+saved_model_vN, model_vN.tflite, history_vN.csv y meta_vN.json).
+    
+    python -m training.finetune --new-data nuevos.npz --freeze-trunk --epochs 5
+"""
+import json
+import os
+import re
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from training.model import compile_model, fit_streaming, resolve_hparams, training_callbacks
+from training.ruleguard import (
+    RR_LO_GRID, RR_HI_GRID, QRS_GRID, qrs_widths_ms, rr_ratio, sweep_grid, select_config, apply_ruleguard, meta_config
+)
+from training.thresholds import fit_platt, calibrate, select_threshold, decision_meta, decision_metrics
+
+RANDOM_SEED = 42
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVE_DIR = os.path.join(PROJECT_ROOT, 'models', 'ecg_nv_cnn')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'datasets')
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+EXPERIMENT_NAME = "fine_tuning"
+
+# Hiperparámetros por defecto del fine-tuning (sobre DEFAULT_HPARAMS)
+FINETUNE_HPARAMS = {'learning_rate': 1e-4, 'epochs': 5}
+
+
+def next_version(save_dir=SAVE_DIR) -> str:
+    """Siguiente tag libre 'vN' según los model_v*/meta_v* de `save_dir`."""
+    versions = [int(m.group(1)) for name in os.listdir(save_dir)
+                if (m := re.match(r'(?:model|meta)_v(\d+)\.(?:keras|json)$', name))]
+    return f"v{max(versions, default=0) + 1}"
+
+
+def load_new_data(npz_paths: Sequence[str] = (), records: Sequence = (), records_dir: Optional[str] = None,
+                  fs: int = 360, deriv_idx: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ventanas etiquetadas nuevas de archivos .npz (`sig`, `rr`, `y`) y/o de
+    registros WFDB en `records_dir` (extraídas como los de MIT-BIH).
+    Se descartan las etiquetas fuera de N/V.
+    """
+    from training.ecg_dataset import extract_windows
+    
+    parts = []
+    for path in npz_paths:
+        with np.load(path, allow_pickle=False) as data:
+            parts.append((data['sig'], data['rr'], data['y'].astype(str)))
+    for record_id in records:
+        parts.append(extract_windows(record_id, base_path=records_dir, deriv_idx=deriv_idx, fs=fs))
+    if not parts:
+        raise ValueError("No se indicaron datos nuevos (npz o registros)")
+    
+    X_sig = np.concatenate([p[0] for p in parts]).astype(np.float32)
+    X_rr = np.concatenate([p[1] for p in parts]).astype(np.float32)
+    y = np.concatenate([np.asarray(p[2]).astype(str) for p in parts])
+    keep = np.isin(y, ('N', 'V'))
+    return X_sig[keep], X_rr[keep], y[keep]
+
+
+def replay_indices(n_available: int, n_new: int, ratio: float, seed: int = RANDOM_SEED) -> np.ndarray:
+    """`ratio * n_new` índices al azar (sin reposición) del set de replay, ordenados."""
+    n = min(n_available, int(round(ratio * n_new)))
+    return np.sort(np.random.default_rng(seed).choice(n_available, size=n, replace=False))
+
+
+def freeze_trunk(model: tf.keras.Model, trainable: bool = False) -> List[str]:
+    """Marca las capas convolucionales como (no) entrenables; retorna sus nombres."""
+    names = []
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Conv1D):
+            layer.trainable = trainable
+            names.append(layer.name)
+    return names
+
+
+def fit_decision(model, val_inputs: Dict, yval: np.ndarray, target_prec: float, target_rec: float, fs: int = 360) -> Dict:
+    """Platt, umbral y RuleGuard sobre la validación (misma receta que [C09]/[C10] del script)."""
+    proba_raw = model.predict(val_inputs, batch_size=1024, verbose=0).ravel()
+    platt = fit_platt(proba_raw, yval)
+    proba = calibrate(platt, proba_raw)
+    selection = select_threshold(yval, proba, target_prec, target_rec)
+    rg = select_config(
+        sweep_grid(yval, (proba >= selection['threshold']).astype(np.int32),
+                   rr_ratio(val_inputs['rr']), qrs_widths_ms(val_inputs['sig'][:, :, 0], fs=fs),
+                   RR_LO_GRID, RR_HI_GRID, QRS_GRID),
+        max(0.85, target_prec)
+    )
+    return {'platt': platt, 'selection': selection, 'ruleguard': rg}
+
+
+def evaluate(model, decision: Dict, X_sig: np.ndarray, X_rr: np.ndarray, y_bin: np.ndarray, fs: int = 360) -> Dict:
+    """Métricas de V con la regla de decisión completa (Platt + umbral + RuleGuard)."""
+    inputs = {'sig': np.expand_dims(X_sig, -1).astype(np.float32), 'rr': np.asarray(X_rr, np.float32)}
+    proba = calibrate(decision['platt'], model.predict(inputs, batch_size=1024, verbose=0).ravel())
+    y_pred = (proba >= decision['selection']['threshold']).astype(np.int32)
+    rg = decision['ruleguard']
+    y_pred = apply_ruleguard(y_pred, rr_ratio(X_rr), qrs_widths_ms(X_sig, fs=fs), rg['rr_lo'], rg['rr_hi'], rg['qrs_thr'])
+    return decision_metrics(y_bin, y_pred, proba)
+
+
+def fine_tune(
+    base_model_path: str,
+    new_data: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    replay_data: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+    test_data: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+    replay_ratio: float = 1.0,
+    freeze: bool = False,
+    hparams: Optional[Dict] = None,
+    val_size: float = 0.2,
+    target_prec: float = 0.83,
+    target_rec: float = 0.85,
+    seed: int = RANDOM_SEED,
+    save_dir: str = SAVE_DIR,
+    tag: Optional[str] = None,
+    use_mlflow: bool = True
+) -> Dict:
+    """
+    Ajusta el modelo base sobre nuevos + replay y guarda el set versionado.
+    
+    Args:
+        base_model_path: .keras del modelo base (p. ej. model_v7.keras)
+        new_data / replay_data / test_data: (X_sig, X_rr, y) con y 'N'/'V'
+        replay_ratio: Muestras de replay por cada muestra nueva
+        freeze: Congelar el tronco convolucional
+        hparams: Sobre DEFAULT_HPARAMS + FINETUNE_HPARAMS (lr, epochs, batch_size, ...)
+        tag: Versión de salida (default: la siguiente libre en save_dir)
+    
+    Returns:
+        dict con tag, paths, decisión y métricas del modelo base y del ajustado
+    """
+    from sklearn.model_selection import StratifiedShuffleSplit
+    
+    hp = resolve_hparams({**FINETUNE_HPARAMS, **(hparams or {})})
+    tag = tag or next_version(save_dir)
+    base_name = os.path.splitext(os.path.basename(base_model_path))[0]
+    base_meta_path = os.path.join(os.path.dirname(base_model_path), f"meta_{base_name.replace('model_', '')}.json")
+    base_meta = {}
+    if os.path.exists(base_meta_path):
+        with open(base_meta_path) as f:
+            base_meta = json.load(f)
+    fs = int(base_meta.get('fs', 360))
+    
+    # Nuevos + replay; el split estratifica por clase y origen
+    X_sig, X_rr, y = new_data
+    source = np.zeros(len(y), np.int8)
+    n_replay = 0
+    if replay_data is not None and replay_ratio > 0:
+        take = replay_indices(len(replay_data[2]), len(y), replay_ratio, seed)
+        n_replay = len(take)
+        X_sig = np.concatenate([X_sig, np.asarray(replay_data[0][take], np.float32)])
+        X_rr = np.concatenate([X_rr, np.asarray(replay_data[1][take], np.float32)])
+        y = np.concatenate([y, np.asarray(replay_data[2][take]).astype(str)])
+        source = np.concatenate([source, np.ones(n_replay, np.int8)])
+    y_bin = (y == 'V').astype(np.int32)
+    sss = StratifiedShuffleSplit(n_splits=1, test_size=val_size, random_state=seed)
+    train_idx, val_idx = next(sss.split(np.zeros(len(y)), y_bin * 2 + source))
+    val_inputs = {'sig': np.expand_dims(X_sig[val_idx], -1), 'rr': X_rr[val_idx]}
+    yval = y_bin[val_idx]
+    new_val = val_idx[source[val_idx] == 0]
+    print(f"🔧 Fine-tuning {base_name} → model_{tag}: {len(new_data[2])} nuevos + {n_replay} replay "
+          f"| train {len(train_idx)} / val {len(val_idx)} | V={int(y_bin.sum())}")
+    
+    tf.keras.utils.set_random_seed(seed)
+    model = tf.keras.models.load_model(base_model_path, compile=False)
+    
+    # Modelo base con la misma regla re-ajustada sobre esta validación: referencia justa
+    base_decision = fit_decision(model, val_inputs, yval, target_prec, target_rec, fs)
+    eval_sets = {'new_val': (X_sig[new_val], X_rr[new_val], y_bin[new_val])} if len(new_val) else {}
+    if test_data is not None:
+        eval_sets['test'] = (test_data[0], test_data[1], (np.asarray(test_data[2]) == 'V').astype(np.int32))
+    base_metrics = {name: evaluate(model, base_decision, *data, fs=fs) for name, data in eval_sets.items()}
+    
+    frozen = freeze_trunk(model) if freeze else []
+    compile_model(model, hp)
+    history = fit_streaming(
+        model, X_sig, X_rr, y_bin, train_idx, (val_inputs, yval), hp,
+        augment=True, seed=seed, callback_list=training_callbacks(), verbose=1
+    )
+    freeze_trunk(model, trainable=True)
+    
+    decision = fit_decision(model, val_inputs, yval, target_prec, target_rec, fs)
+    metrics = {name: evaluate(model, decision, *data, fs=fs) for name, data in eval_sets.items()}
+    
+    # Artefactos versionados
+    os.makedirs(save_dir, exist_ok=True)
+    paths = {
+        'keras': os.path.join(save_dir, f'model_{tag}.keras'),
+        'saved_model': os.path.join(save_dir, f'saved_model_{tag}'),
+        'tflite': os.path.join(save_dir, f'model_{tag}.tflite'),
+        'history': os.path.join(save_dir, f'history_{tag}.csv'),
+        'meta': os.path.join(save_dir, f'meta_{tag}.json'),
+    }
+    model.save(paths['keras'])
+    model.export(paths['saved_model'])
+    tflite_model = tf.lite.TFLiteConverter.from_saved_model(paths['saved_model']).convert()
+    with open(paths['tflite'], 'wb') as f:
+        f.write(tflite_model)
+    pd.DataFrame(history.history).to_csv(paths['history'], index=False)
+    
+    meta = {
+        **{k: base_meta[k] for k in ('classes', 'fs', 'win', 'deriv_idx', 'normalizacion', 'inputs',
+                                     'train_records', 'test_records') if k in base_meta},
+        "augmentation": True,
+        "ruleguard": True,
+        "ruleguard_config": meta_config(decision['ruleguard']),
+        "decision": decision_meta(decision['platt'], decision['selection']),
+        "threshold_note": "thr_opt re-seleccionado tras el fine-tuning (validación nuevos + replay, Platt)",
+        "fine_tuning": {
+            "base_model": base_name,
+            "base_mlflow_run_id": base_meta.get('mlflow_run_id'),
+            "n_new": int(len(new_data[2])),
+            "n_new_V": int((np.asarray(new_data[2]) == 'V').sum()),
+            "n_replay": int(n_replay),
+            "replay_ratio": float(replay_ratio),
+            "frozen_layers": frozen,
+            "epochs": len(history.history['loss']),
+            "learning_rate": hp['learning_rate'],
+            "metrics": metrics,
+            "base_metrics": base_metrics,
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    run_id = None
+    if use_mlflow:
+        import mlflow
+        mlflow.set_tracking_uri("file:./mlruns")
+        mlflow.set_experiment(EXPERIMENT_NAME)
+        with mlflow.start_run(run_name=f"FT_{tag}_{datetime.now().strftime('%Y%m%d_%H%M%S')}") as run:
+            run_id = run.info.run_id
+            mlflow.set_tag("model_tag", tag)
+            mlflow.log_params({
+                'base_model': base_name, 'freeze_trunk': freeze, 'replay_ratio': replay_ratio,
+                'n_new': meta['fine_tuning']['n_new'], 'n_replay': n_replay, 'random_seed': seed,
+                **{f"hp_{k}": v for k, v in hp.items()},
+            })
+            for epoch in range(len(history.history['loss'])):
+                mlflow.log_metrics({k: float(v[epoch]) for k, v in history.history.items()}, step=epoch)
+            for name in metrics:
+                mlflow.log_metrics({f"{name}_{k}": float(v) for k, v in metrics[name].items() if np.isfinite(v)})
+                mlflow.log_metrics({f"base_{name}_{k}": float(v) for k, v in base_metrics[name].items() if np.isfinite(v)})
+            mlflow.log_metric("threshold_optimal", decision['selection']['threshold'])
+            meta["mlflow_run_id"] = run_id
+            with open(paths['meta'], 'w') as f:
+                json.dump(meta, f, indent=2)
+            for key in ('keras', 'tflite'):
+                mlflow.log_artifact(paths[key], "models")
+            mlflow.log_artifact(paths['history'], "metrics")
+            mlflow.log_artifact(paths['meta'], "metadata")
+    else:
+        with open(paths['meta'], 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    return {'tag': tag, 'paths': paths, 'meta': meta, 'metrics': metrics,
+            'base_metrics': base_metrics, 'mlflow_run_id': run_id}
+
+
+def print_report(result: Dict):
+    print("\n" + "=" * 80)
+    print(f"✅ FINE-TUNING → model_{result['tag']}")
+    print("=" * 80)
+    for name, metrics in result['metrics'].items():
+        base = result['base_metrics'][name]
+        print(f"  {name}: " + " | ".join(
+            f"{k} {base[k]:.3f} → {metrics[k]:.3f}" for k in ('precision_V', 'recall_V', 'f1_V')
+        ))
+    decision = result['meta']['decision']
+    print(f"  Umbral: {decision['threshold']:.4f} (crudo {decision['threshold_raw']}) "
+          f"| RuleGuard: {result['meta']['ruleguard_config']}")
+    for key, path in result['paths'].items():
+        print(f"  {key}: {path}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    from training.dataset_cache import DatasetCache
+    from training.ecg_dataset import TRAIN_RECORDS, TEST_RECORDS, extract_windows, preprocessing_params
+    
+    parser = argparse.ArgumentParser(description='Fine-tuning warm-start del modelo de producción')
+    parser.add_argument('--base', default=os.path.join(SAVE_DIR, 'model_v7.keras'), help='Modelo base (.keras)')
+    parser.add_argument('--new-data', nargs='*', default=[], help='Archivos .npz con sig, rr, y')
+    parser.add_argument('--new-records', nargs='*', default=[], help='Registros WFDB propios')
+    parser.add_argument('--records-dir', default=None, help='Directorio de --new-records')
+    parser.add_argument('--replay-ratio', type=float, default=1.0, help='Muestras MIT-BIH por muestra nueva (0 = sin replay)')
+    parser.add_argument('--freeze-trunk', action='store_true', help='Congelar las capas convolucionales')
+    parser.add_argument('--epochs', type=int, default=FINETUNE_HPARAMS['epochs'])
+    parser.add_argument('--learning-rate', type=float, default=FINETUNE_HPARAMS['learning_rate'])
+    parser.add_argument('--tag', default=None, help='Versión de salida (default: siguiente libre)')
+    parser.add_argument('--no-test', action='store_true', help='No evaluar en TEST_RECORDS de MIT-BIH')
+    parser.add_argument('--no-mlflow', action='store_true')
+    args = parser.parse_args()
+    
+    new_data = load_new_data(args.new_data, args.new_records, args.records_dir)
+    cache = DatasetCache(CACHE_DIR, preprocessing_params())
+    extract_fn = partial(extract_windows, base_path=BASE_PATH)
+    replay = cache.load_dataset(TRAIN_RECORDS, extract_fn, workers=os.cpu_count()) if args.replay_ratio > 0 else None
+    test = None if args.no_test else cache.load_dataset(TEST_RECORDS, extract_fn, workers=os.cpu_count())
+    
+    result = fine_tune(
+        args.base, new_data, replay_data=replay, test_data=test,
+        replay_ratio=args.replay_ratio, freeze=args.freeze_trunk,
+        hparams={'epochs': args.epochs, 'learning_rate': args.learning_rate},
+        tag=args.tag, use_mlflow=not args.no_mlflow
+    )
+    print_report(result)
@@ -0,0 +1,143 @@
+"""
+Pipeline tf.data de entrenamiento con oversampling y augmentation al vuelo.
+
+Reemplaza al set balanceado materializado (`np.tile` de los índices V y copia
+de todas las ventanas): cada clase es un stream infinito y barajado de
+*índices* y `sample_from_datasets` los mezcla a la fracción objetivo. Las
+ventanas se leen por batch desde los arrays de train (memory-mapped si vienen
+de la cache de dataset), así que la memoria no crece con el corpus ni con el
+factor de oversampling.
+    
+    índices N ─┐
+               ├─ sample_from_datasets ─ batch ─ gather ─ augment ─ prefetch
+    índices V ─┘
+
+La augmentation (`augment_batch_tf`: jitter, gain, time-warp y z-score por
+fila) se aplica como ops de tensor sobre el batch completo, en `map` paralelos y
+con semillas stateless derivadas del número de batch: dos corridas con la
+misma semilla ven exactamente los mismos batches.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from training.augmentation import augment_batch_tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def oversampling_plan(y: np.ndarray, ratio: Optional[int] = None) -> Tuple[float, int]:
+    """
+    Fracción de V y tamaño del set balanceado equivalente al oversampling
+    original: todos los N más los V replicados `ratio` veces
+    (por defecto `max(1, N//V - 1)`).
+    
+    Returns:
+        (fracción de V por batch, muestras por época)
+    """
+    y = np.asarray(y)
+    n_pos = int((y == 1).sum())
+    n_neg = int(len(y) - n_pos)
+    if n_pos == 0 or n_neg == 0:
+        raise ValueError(f"El oversampling requiere ambas clases (N={n_neg}, V={n_pos})")
+    if ratio is None:
+        ratio = max(1, int(n_neg / n_pos) - 1)
+    total = n_neg + ratio * n_pos
+    return ratio * n_pos / total, total
+
+
+def _class_stream(indices: np.ndarray, seed: int, block: int) -> tf.data.Dataset:
+    return (tf.data.Dataset.from_tensor_slices(indices.astype(np.int64))
+            .shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+            .repeat()
+            .batch(block))
+
+
+def make_train_dataset(
+    X_sig: np.ndarray,
+    X_rr: np.ndarray,
+    y: np.ndarray,
+    indices: Optional[np.ndarray] = None,
+    batch_size: int = 256,
+    pos_fraction: Optional[float] = None,
+    augment: bool = True,
+    augment_prob: float = 0.5,
+    seed: int = 42,
+    sample_block: int = 8
+) -> Tuple[tf.data.Dataset, int, Dict[str, float]]:
+    """
+    Dataset infinito de batches ({'sig': (B, L, 1), 'rr': (B, 3)}, y) con V
+    sobremuestreado a `pos_fraction` (por defecto la de `oversampling_plan`).
+    
+    `X_sig` (n, L), `X_rr` y `y` (binaria) no se copian: se indexan por batch,
+    así que pueden ser memmaps. `indices` restringe el muestreo a un
+    subconjunto (p. ej. excluir la validación). Con `augment`, cada V del
+    batch se augmenta con probabilidad `augment_prob`.
+    
+    El muestreo elige la clase por bloques de `sample_block` índices (el
+    muestreo elemento a elemento de tf.data limita el throughput); la
+    fracción esperada de V por batch no cambia.
+    
+    Returns:
+        (dataset, steps_per_epoch, plan) — una época recorre tantas muestras
+        como el set balanceado materializado equivalente.
+    """
+    y = np.asarray(y)
+    indices = np.arange(len(y)) if indices is None else np.asarray(indices)
+    y_sub = y[indices]
+    planned_fraction, epoch_samples = oversampling_plan(y_sub)
+    if pos_fraction is None:
+        pos_fraction = planned_fraction
+    
+    if batch_size % sample_block:
+        raise ValueError(f"batch_size ({batch_size}) debe ser múltiplo de sample_block ({sample_block})")
+    streams = [_class_stream(indices[y_sub == 0], seed, sample_block),
+               _class_stream(indices[y_sub == 1], seed + 1, sample_block)]
+    ds = tf.data.Dataset.sample_from_datasets(
+        streams, weights=[1.0 - pos_fraction, pos_fraction], seed=seed
+    )
+    
+    def gather(idx):
+        # Índices ordenados: lectura secuencial del memmap. El orden dentro del
+        # batch no importa porque el muestreo ya es aleatorio.
+        idx = np.sort(idx)
+        return (np.asarray(X_sig[idx], dtype=np.float32),
+                np.asarray(X_rr[idx], dtype=np.float32),
+                np.asarray(y[idx], dtype=np.int32))
+    
+    win, n_rr = X_sig.shape[1], X_rr.shape[1]
+    
+    def load(idx):
+        sig, rr, label = tf.numpy_function(gather, [idx], [tf.float32, tf.float32, tf.int32])
+        sig.set_shape([None, win])
+        rr.set_shape([None, n_rr])
+        label.set_shape([None])
+        return sig, rr, label
+    
+    def augment_fn(step, batch):
+        sig, rr, label = batch
+        seed_aug, seed_mask = tf.unstack(tf.random.experimental.stateless_split(
+            tf.stack([tf.constant(seed, tf.int64), step]), 2
+        ))
+        take = (label == 1) & (tf.random.stateless_uniform(tf.shape(label), seed_mask) < augment_prob)
+        sig = tf.where(take[:, None], augment_batch_tf(sig, seed_aug), sig)
+        return sig, rr, label
+    
+    ds = ds.batch(batch_size // sample_block).map(
+        lambda blocks: load(tf.reshape(blocks, [-1])), num_parallel_calls=AUTOTUNE
+    )
+    if augment:
+        ds = ds.enumerate().map(augment_fn, num_parallel_calls=AUTOTUNE)
+    ds = ds.map(lambda sig, rr, label: ({'sig': sig[..., None], 'rr': rr}, label),
+                num_parallel_calls=AUTOTUNE)
+    ds = ds.prefetch(AUTOTUNE)
+    
+    steps_per_epoch = max(1, epoch_samples // batch_size)
+    plan = {
+        'pos_fraction': float(pos_fraction),
+        'epoch_samples': float(steps_per_epoch * batch_size),
+        'expected_V_per_epoch': float(steps_per_epoch * batch_size * pos_fraction),
+        'expected_N_per_epoch': float(steps_per_epoch * batch_size * (1.0 - pos_fraction)),
+    }
+    return ds, steps_per_epoch, plan
@@ -0,0 +1,287 @@
+"""
+Modelo CNN-1D (señal + RR) y bucle de entrenamiento reutilizable.
+
+`build_model` y `fit_streaming` son la única definición de la arquitectura
+y del entrenamiento: los usan deteccionarritmias.py, la búsqueda de
+hiperparámetros (optimize_hyperparameters.py) y los runners que entrenan
+varios modelos por proceso. Los hiperparámetros viajan en un dict con las
+claves de DEFAULT_HPARAMS (las que busca Optuna).
+
+Opciones de ejecución (no cambian el modelo): `configure_runtime` fija los
+hilos de TensorFlow y la precisión mixta bfloat16, y `compile_model(...,
+jit_compile=True)` compila el paso de entrenamiento con XLA.
+"""
+import os
+import platform
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, callbacks, mixed_precision, optimizers, regularizers, Input, Model
+
+from training.input_pipeline import make_train_dataset
+
+DEFAULT_HPARAMS = {
+    'focal_gamma': 2.0,
+    'focal_alpha': 0.35,
+    'dropout_rate': 0.35,
+    'l2_reg': 1e-4,
+    'learning_rate': 1e-3,
+    'batch_size': 256,
+    'conv1_filters': 32,
+    'conv2_filters': 64,
+    'conv3_filters': 128,
+    'dense_units': 64,
+    'epochs': 30,
+}
+
+
+def resolve_hparams(hparams: Optional[Dict] = None) -> Dict:
+    """DEFAULT_HPARAMS con los valores de `hparams` encima (claves desconocidas: error)."""
+    hparams = dict(hparams or {})
+    unknown = set(hparams) - set(DEFAULT_HPARAMS)
+    if unknown:
+        raise ValueError(f"Hiperparámetros desconocidos: {sorted(unknown)}")
+    return {**DEFAULT_HPARAMS, **hparams}
+
+
+def limit_tf_threads(intra_op: int, inter_op: int = 1):
+    """
+    Acota los hilos de TensorFlow del proceso. Debe llamarse antes de
+    ejecutar cualquier op (al inicio de cada worker).
+    """
+    os.environ['OMP_NUM_THREADS'] = str(intra_op)
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+
+def bf16_supported() -> bool:
+    """
+    La CPU tiene instrucciones bfloat16 nativas (AVX512-BF16 / AMX en x86,
+    BF16 en ARMv8.6); sin ellas bfloat16 se emula y es más lento que float32.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = set(f.read().split())
+    except OSError:
+        return False
+    if platform.machine().lower() in ('aarch64', 'arm64'):
+        return 'bf16' in flags
+    return bool({'avx512_bf16', 'amx_bf16'} & flags)
+
+
+def configure_runtime(intra_op: int = 0, inter_op: int = 0, mixed_bf16: bool = False) -> Dict:
+    """
+    Hilos de TensorFlow (0 = default de TF) y política de precisión mixta.
+    Debe llamarse antes de ejecutar cualquier op y de construir el modelo.
+    bfloat16 solo se activa si la CPU lo soporta (`bf16_supported`).
+    
+    Returns:
+        {'intra_op', 'inter_op', 'precision'} efectivos
+    """
+    if intra_op > 0:
+        limit_tf_threads(intra_op, inter_op or tf.config.threading.get_inter_op_parallelism_threads())
+    elif inter_op > 0:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    
+    policy = 'float32'
+    if mixed_bf16:
+        if bf16_supported():
+            policy = 'mixed_bfloat16'
+        else:
+            print("⚠️  La CPU no tiene bfloat16 nativo: se entrena en float32")
+    mixed_precision.set_global_policy(policy)
+    return {
+        'intra_op': tf.config.threading.get_intra_op_parallelism_threads(),
+        'inter_op': tf.config.threading.get_inter_op_parallelism_threads(),
+        'precision': policy,
+    }
+
+
+def float32_model(model: Model) -> Model:
+    """
+    Copia en float32 de un modelo entrenado con precisión mixta (las
+    variables ya son float32; cambia el cómputo) para exportar a SavedModel,
+    TFLite, NumPy y ONNX. Sin precisión mixta retorna el mismo modelo.
+    """
+    if all(layer.dtype_policy.name == 'float32' for layer in model.layers if not isinstance(layer, layers.InputLayer)):
+        return model
+    config = model.get_config()
+    for layer in config['layers']:
+        if 'dtype' in layer['config']:
+            layer['config']['dtype'] = 'float32'
+    copy = Model.from_config(config)
+    copy.set_weights(model.get_weights())
+    return copy
+
+
+class EpochTimer(callbacks.Callback):
+    """Agrega `epoch_time_s` (segundos de pared de la época, con validación) a los logs."""
+    
+    def __init__(self):
+        super().__init__()
+        self.times: List[float] = []
+        self._start = None
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        self.times.append(time.perf_counter() - self._start)
+        if logs is not None:
+            logs['epoch_time_s'] = self.times[-1]
+
+
+def binary_focal_loss(gamma=2.0, alpha=0.35):
+    def loss(y_true, y_pred):
+        # En float32 aun con precisión mixta: en bfloat16 1-1e-7 redondea a 1 y log(pt) diverge
+        y_true = tf.cast(y_true, tf.float32)
+        y_pred = tf.clip_by_value(tf.cast(y_pred, tf.float32), 1e-7, 1-1e-7)
+        pt = tf.where(tf.equal(y_true, 1), y_pred, 1-y_pred)
+        w  = tf.where(tf.equal(y_true, 1), alpha, 1-alpha)
+        return -tf.reduce_mean(w * tf.pow(1-pt, gamma) * tf.math.log(pt))
+    return loss
+
+
+def build_model(win: int = 360, hparams: Optional[Dict] = None, compile: bool = True, separable: bool = False,
+                jit_compile='auto') -> Model:
+    """
+    CNN-1D de tres bloques sobre la ventana + rama densa de RR, compilada con
+    focal loss y PR-AUC. Con `separable`, los bloques 2 y 3 usan convoluciones
+    depthwise-separable (el primero tiene un solo canal de entrada). La salida
+    es siempre float32 (también bajo precisión mixta).
+    """
+    hp = resolve_hparams(hparams)
+    conv = layers.SeparableConv1D if separable else layers.Conv1D
+    
+    inp_sig = Input(shape=(win, 1), name='sig')
+    x = layers.Conv1D(hp['conv1_filters'], 7, padding='same', activation='relu')(inp_sig)
+    x = layers.MaxPooling1D(2)(x)
+    x = conv(hp['conv2_filters'], 5, padding='same', activation='relu')(x)
+    x = layers.MaxPooling1D(2)(x)
+    x = conv(hp['conv3_filters'], 3, padding='same', activation='relu')(x)
+    x = layers.GlobalAveragePooling1D()(x)
+    
+    inp_rr = Input(shape=(3,), name='rr')
+    y = layers.Dense(16, activation='relu')(inp_rr)
+    
+    z = layers.Concatenate()([x, y])
+    # L2 suave ayuda a bajar sobre-confianza (menos FP)
+    z = layers.Dense(hp['dense_units'], activation='relu', kernel_regularizer=regularizers.l2(hp['l2_reg']))(z)
+    z = layers.Dropout(hp['dropout_rate'])(z)
+    out = layers.Dense(1, activation='sigmoid', dtype='float32')(z)
+    
+    model = Model(inputs=[inp_sig, inp_rr], outputs=out)
+    if compile:
+        compile_model(model, hp, jit_compile=jit_compile)
+    return model
+
+
+def compile_model(model: Model, hparams: Optional[Dict] = None, jit_compile='auto') -> Model:
+    """
+    Adam + focal loss + accuracy/PR-AUC. `jit_compile=True` compila el paso
+    de entrenamiento con XLA ('auto' de Keras: solo con GPU).
+    """
+    hp = resolve_hparams(hparams)
+    model.compile(
+        optimizer=optimizers.Adam(hp['learning_rate']),
+        loss=binary_focal_loss(gamma=hp['focal_gamma'], alpha=hp['focal_alpha']),
+        metrics=['accuracy', tf.keras.metrics.AUC(curve='PR', name='pr_auc')],
+        jit_compile=jit_compile
+    )
+    return model
+
+
+def training_callbacks() -> List[callbacks.Callback]:
+    """ReduceLROnPlateau + EarlyStopping sobre val_pr_auc."""
+    return [
+        callbacks.ReduceLROnPlateau(monitor='val_pr_auc', factor=0.5, patience=3, verbose=1, mode='max'),
+        callbacks.EarlyStopping(monitor='val_pr_auc', patience=6, restore_best_weights=True, verbose=1, mode='max')
+    ]
+
+
+def validation_arrays(X_sig: np.ndarray, X_rr: np.ndarray, y: np.ndarray, val_idx: np.ndarray) -> Tuple[Dict, np.ndarray]:
+    """Inputs del modelo y etiquetas de la validación (copiados fuera del memmap)."""
+    return (
+        {'sig': np.expand_dims(X_sig[val_idx], -1).astype(np.float32),
+         'rr': X_rr[val_idx].astype(np.float32)},
+        np.asarray(y)[val_idx].astype(np.int32)
+    )
+
+
+def fit_streaming(
+    model: Model,
+    X_sig: np.ndarray,
+    X_rr: np.ndarray,
+    y: np.ndarray,
+    train_idx: np.ndarray,
+    validation: Tuple[Dict, np.ndarray],
+    hparams: Optional[Dict] = None,
+    augment: bool = True,
+    seed: int = 42,
+    callback_list: Optional[Sequence[callbacks.Callback]] = None,
+    threads: Optional[int] = None,
+    initial_epoch: int = 0,
+    verbose: int = 1
+):
+    """
+    Entrena `model` con el pipeline tf.data (oversampling + augmentation al
+    vuelo) sobre `train_idx`, validando en `validation`. `threads` acota el
+    threadpool de tf.data (workers que comparten la máquina). Al reanudar
+    (`initial_epoch` > 0) el pipeline se siembra con `seed + initial_epoch`
+    para no repetir los batches de las primeras épocas.
+    
+    Returns:
+        History de Keras
+    """
+    hp = resolve_hparams(hparams)
+    train_ds, steps_per_epoch, _ = make_train_dataset(
+        X_sig, X_rr, y, indices=train_idx, batch_size=hp['batch_size'],
+        augment=augment, augment_prob=0.5, seed=seed + initial_epoch
+    )
+    if threads:
+        options = tf.data.Options()
+        options.threading.private_threadpool_size = threads
+        train_ds = train_ds.with_options(options)
+    return model.fit(
+        train_ds,
+        steps_per_epoch=steps_per_epoch,
+        validation_data=validation,
+        epochs=hp['epochs'],
+        initial_epoch=initial_epoch,
+        callbacks=list(training_callbacks() if callback_list is None else callback_list),
+        verbose=verbose
+    )
+
+
+def train_model(
+    X_sig: np.ndarray,
+    X_rr: np.ndarray,
+    y: np.ndarray,
+    train_idx: np.ndarray,
+    val_idx: np.ndarray,
+    hparams: Optional[Dict] = None,
+    augment: bool = True,
+    seed: int = 42,
+    extra_callbacks: Sequence[callbacks.Callback] = (),
+    threads: Optional[int] = None,
+    verbose: int = 0
+):
+    """
+    Construye y entrena un modelo desde cero con los callbacks estándar más
+    `extra_callbacks` (p. ej. poda de Optuna).
+    
+    Returns:
+        (model, history, validation)
+    """
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(seed)
+    validation = validation_arrays(X_sig, X_rr, y, val_idx)
+    model = build_model(X_sig.shape[1], hparams)
+    history = fit_streaming(
+        model, X_sig, X_rr, y, train_idx, validation, hparams,
+        augment=augment, seed=seed, callback_list=training_callbacks() + list(extra_callbacks),
+        threads=threads, verbose=verbose
+    )
+    return model, history, validation
@@ -0,0 +1,138 @@
+"""
+Extracción de registros en paralelo (un proceso por registro).
+
+Cada registro se filtra y ventanea de forma independiente, así que la
+extracción se reparte en un ProcessPoolExecutor. El resultado conserva el
+orden de `records` (determinista, independiente del orden de finalización)
+y cada registro devuelve un RecordResult estructurado en lugar de abortar o
+imprimir: 'ok', 'empty' (sin ventanas válidas), 'missing' (archivos WFDB
+ausentes) o 'error' (excepción con traceback).
+
+Se usa el contexto 'fork': con 'spawn' los workers re-importarían el script
+de entrenamiento (sin guard de __main__) y lo ejecutarían completo. Donde
+'fork' no existe (Windows) la extracción es secuencial.
+"""
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+Dataset = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+@dataclass
+class RecordResult:
+    """Resultado de extraer un registro."""
+    record_id: object
+    status: str                     # ok | empty | missing | error
+    n_beats: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    data: Optional[Dataset] = None
+    
+    @property
+    def usable(self) -> bool:
+        return self.status in ('ok', 'empty')
+    
+    def to_dict(self) -> Dict:
+        return {
+            'record_id': self.record_id, 'status': self.status, 'n_beats': self.n_beats,
+            'seconds': round(self.seconds, 3), 'error': self.error,
+        }
+
+
+def extract_one(extract_fn: Callable[[object], Dataset], record_id) -> RecordResult:
+    """Ejecuta `extract_fn(record_id)` y clasifica el resultado o la falla."""
+    t0 = time.perf_counter()
+    try:
+        data = extract_fn(record_id)
+    except FileNotFoundError as e:
+        return RecordResult(record_id, 'missing', seconds=time.perf_counter() - t0, error=str(e))
+    except Exception as e:
+        return RecordResult(
+            record_id, 'error', seconds=time.perf_counter() - t0,
+            error=f"{e.__class__.__name__}: {e}\n{traceback.format_exc()}"
+        )
+    n = int(len(data[2]))
+    return RecordResult(record_id, 'ok' if n else 'empty', n_beats=n,
+                        seconds=time.perf_counter() - t0, data=data)
+
+
+def _print_progress(done: int, total: int, result: RecordResult):
+    detail = f"{result.n_beats} latidos" if result.usable else result.error.splitlines()[0]
+    print(f"[extracción] {done}/{total} record {result.record_id}: {result.status} — {detail} ({result.seconds:.1f}s)")
+
+
+def extract_records(
+    records: List,
+    extract_fn: Callable[[object], Dataset],
+    workers: Optional[int] = None,
+    progress: bool = True
+) -> List[RecordResult]:
+    """
+    Extrae `records` con `workers` procesos (default: núcleos disponibles).
+    
+    `extract_fn` debe ser picklable (función de módulo o functools.partial).
+    Retorna un RecordResult por registro, en el mismo orden que `records`.
+    """
+    records = list(records)
+    workers = min(workers or os.cpu_count() or 1, len(records))
+    fork_available = 'fork' in multiprocessing.get_all_start_methods()
+    results: List[Optional[RecordResult]] = [None] * len(records)
+    
+    if workers <= 1 or not fork_available:
+        for i, record_id in enumerate(records):
+            results[i] = extract_one(extract_fn, record_id)
+            if progress:
+                _print_progress(i + 1, len(records), results[i])
+        return results
+    
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        futures = {pool.submit(extract_one, extract_fn, rid): i for i, rid in enumerate(records)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            results[i] = future.result()
+            if progress:
+                _print_progress(done, len(records), results[i])
+    return results
+
+
+def check_results(results: List[RecordResult], raise_on_error: bool = True):
+    """
+    Reporta registros vacíos/ausentes como [ADVERTENCIA] y, si hay errores
+    de extracción, lanza RuntimeError con el detalle de cada uno.
+    """
+    for r in results:
+        if r.status == 'empty':
+            print(f'[ADVERTENCIA] Record {r.record_id} sin ventanas válidas.')
+        elif r.status == 'missing':
+            print(f'[ADVERTENCIA] Record {r.record_id} no encontrado: {r.error}')
+    errors = [r for r in results if r.status == 'error']
+    if errors and raise_on_error:
+        detail = '\n'.join(f'  - {r.record_id}: {r.error}' for r in errors)
+        raise RuntimeError(f"Falló la extracción de {len(errors)} registro(s):\n{detail}")
+
+
+def concat_results(results: List[RecordResult], win: int) -> Dataset:
+    """Concatena, en orden, los datos de los registros con ventanas válidas."""
+    parts = [r.data for r in results if r.status == 'ok']
+    if not parts:
+        return (np.empty((0, win), np.float32),
+                np.empty((0, 3),  np.float32),
+                np.array([]))
+    return tuple(np.concatenate([p[k] for p in parts]) for k in range(3))
+
+
+def extraction_summary(results: List[RecordResult]) -> Dict[str, float]:
+    """Métricas agregadas (para MLflow)."""
+    counts = {s: sum(r.status == s for r in results) for s in ('ok', 'empty', 'missing', 'error')}
+    return {
+        **{f'extract_records_{s}': float(n) for s, n in counts.items()},
+        'extract_beats_total': float(sum(r.n_beats for r in results)),
+        'extract_cpu_seconds': float(sum(r.seconds for r in results)),
+    }
@@ -0,0 +1,202 @@
+"""
+Cuantización post-entrenamiento (PTQ) a TFLite con gate de regresión de accuracy.
+
+Genera, a partir del SavedModel:
+  - float:          conversión por defecto (referencia)
+  - dynamic_range:  pesos int8, activaciones float
+  - full_int8:      pesos y activaciones int8 calibradas con un dataset representativo
+
+Cada variante se evalúa sobre el set de test (registros MIT-BIH held-out) con la
+misma regla de decisión que el modelo float (Platt + umbral + RuleGuard) y solo
+se promueve si la pérdida de precisión/recall de la clase V queda bajo el límite
+y además es más rápida que el float. Entre las que pasan, gana la de menor latencia.
+"""
+import os
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import tensorflow as tf
+from sklearn.metrics import precision_score, recall_score
+
+QUANT_VARIANTS = ('dynamic_range', 'full_int8')
+
+
+def representative_dataset(X_sig, X_rr, n_samples=500, seed=42):
+    """
+    Dataset representativo para calibrar rangos de activación: muestras de las
+    ventanas de entrenamiento y sus features RR, una por paso (batch 1).
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(X_sig), size=min(n_samples, len(X_sig)), replace=False)
+    sig = np.asarray(X_sig, dtype=np.float32)
+    if sig.ndim == 2:
+        sig = sig[..., None]
+    rr = np.asarray(X_rr, dtype=np.float32)
+    
+    def gen():
+        for i in idx:
+            yield {'sig': sig[i:i+1], 'rr': rr[i:i+1]}
+    return gen
+
+
+def convert_tflite(savedmodel_dir, variant='float', rep_data=None):
+    """Convierte el SavedModel a TFLite según la variante."""
+    converter = tf.lite.TFLiteConverter.from_saved_model(savedmodel_dir)
+    if variant == 'dynamic_range':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif variant == 'full_int8':
+        if rep_data is None:
+            raise ValueError("full_int8 requiere un dataset representativo")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = rep_data
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif variant != 'float':
+        raise ValueError(f"Variante desconocida: {variant}")
+    return converter.convert()
+
+
+def tflite_predict(tflite_model: bytes, X_sig, X_rr, batch_size=256, num_threads=1):
+    """Inferencia por lotes con la signature 'serving_default' (E/S en float)."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=num_threads)
+    runner = interpreter.get_signature_runner('serving_default')
+    sig = np.asarray(X_sig, dtype=np.float32)
+    if sig.ndim == 2:
+        sig = sig[..., None]
+    rr = np.asarray(X_rr, dtype=np.float32)
+    
+    out = np.empty(len(sig), dtype=np.float32)
+    for s in range(0, len(sig), batch_size):
+        res = runner(sig=sig[s:s+batch_size], rr=rr[s:s+batch_size])
+        out[s:s+batch_size] = next(iter(res.values())).ravel()
+    return out
+
+
+def measure_latency(tflite_model: bytes, X_sig, X_rr, batch_size=256, repeats=20, num_threads=1):
+    """Latencia mediana (ms) de un batch, tras una llamada de calentamiento."""
+    sig = np.asarray(X_sig[:batch_size], dtype=np.float32)
+    if sig.ndim == 2:
+        sig = sig[..., None]
+    rr = np.asarray(X_rr[:batch_size], dtype=np.float32)
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=num_threads)
+    runner = interpreter.get_signature_runner('serving_default')
+    runner(sig=sig, rr=rr)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        runner(sig=sig, rr=rr)
+        times.append((time.perf_counter() - t0) * 1000)
+    return float(np.median(times))
+
+
+def _v_metrics(y_true, y_pred):
+    return {
+        'precision_V': float(precision_score(y_true, y_pred, pos_label=1, zero_division=0)),
+        'recall_V': float(recall_score(y_true, y_pred, pos_label=1, zero_division=0)),
+    }
+
+
+def quantize_and_gate(
+    savedmodel_dir,
+    save_dir,
+    X_rep_sig, X_rep_rr,
+    X_test_sig, X_test_rr, y_test,
+    decide_fn: Callable[[np.ndarray], np.ndarray],
+    max_metric_drop=0.01,
+    max_latency_delta_ms=0.0,
+    variants=QUANT_VARIANTS,
+    model_tag='v7',
+    rep_samples=500,
+    latency_batch=256,
+    seed=42,
+    float_model: Optional[bytes] = None
+) -> Dict:
+    """
+    Cuantiza, evalúa y promueve la variante más rápida que respete los límites.
+    
+    Args:
+        decide_fn: mapea probabilidades crudas del modelo -> etiquetas 0/1
+                   (misma regla que el float: Platt + umbral + RuleGuard)
+        max_metric_drop: caída máxima permitida en precisión y recall de V
+                         respecto al modelo TFLite float
+        max_latency_delta_ms: la latencia de la variante debe quedar por debajo
+                              de la del float + este margen (0: estrictamente
+                              más rápida; negativo: exige una mejora mínima)
+        float_model: bytes del TFLite float si ya se convirtió (se reutiliza)
+    
+    Returns:
+        dict con el reporte por variante y la variante promovida (o None)
+    """
+    float_model = float_model or convert_tflite(savedmodel_dir, 'float')
+    rep_data = representative_dataset(X_rep_sig, X_rep_rr, n_samples=rep_samples, seed=seed)
+    
+    models = {'float': float_model}
+    for variant in variants:
+        models[variant] = convert_tflite(savedmodel_dir, variant, rep_data=rep_data)
+    
+    report = {}
+    for name, content in models.items():
+        proba = tflite_predict(content, X_test_sig, X_test_rr, batch_size=latency_batch)
+        report[name] = {
+            **_v_metrics(y_test, decide_fn(proba)),
+            'size_kb': round(len(content) / 1024, 1),
+            'latency_ms': measure_latency(content, X_test_sig, X_test_rr, batch_size=latency_batch),
+        }
+    
+    base = report['float']
+    promoted: Optional[str] = None
+    for name in variants:
+        r = report[name]
+        r['delta_precision_V'] = r['precision_V'] - base['precision_V']
+        r['delta_recall_V'] = r['recall_V'] - base['recall_V']
+        r['delta_latency_ms'] = r['latency_ms'] - base['latency_ms']
+        r['accuracy_passed'] = bool(
+            r['delta_precision_V'] >= -max_metric_drop and r['delta_recall_V'] >= -max_metric_drop
+        )
+        r['latency_passed'] = bool(r['delta_latency_ms'] < max_latency_delta_ms)
+        r['passed'] = r['accuracy_passed'] and r['latency_passed']
+        # Entre las que pasan, la de menor latencia medida
+        if r['passed'] and (promoted is None or r['latency_ms'] < report[promoted]['latency_ms']):
+            promoted = name
+    
+    paths: Dict[str, str] = {}
+    if promoted is not None:
+        path = os.path.join(save_dir, f'model_{model_tag}_{promoted}.tflite')
+        with open(path, 'wb') as f:
+            f.write(models[promoted])
+        paths[promoted] = path
+    
+    return {
+        'variants': report,
+        'promoted': promoted,
+        'paths': paths,
+        'max_metric_drop': max_metric_drop,
+        'max_latency_delta_ms': max_latency_delta_ms,
+    }
+
+
+def print_quantization_report(result: Dict):
+    print("\n[Cuantización] variante | Prec_V (Δ) | Rec_V (Δ) | KB | ms/batch")
+    for name, r in result['variants'].items():
+        dp = f"{r['delta_precision_V']:+.4f}" if 'delta_precision_V' in r else "   ref "
+        dr = f"{r['delta_recall_V']:+.4f}" if 'delta_recall_V' in r else "   ref "
+        flag = '' if 'passed' not in r else (' ✅' if r['passed'] else ' ❌')
+        print(f"  {name:<14} {r['precision_V']:.4f} ({dp}) | {r['recall_V']:.4f} ({dr}) | "
+              f"{r['size_kb']:>7.1f} | {r['latency_ms']:.2f}{flag}")
+    if result['promoted']:
+        print(f"  → Promovida: {result['promoted']} (caída máx. permitida {result['max_metric_drop']:.3f}, "
+              f"Δ latencia < {result['max_latency_delta_ms']:+.2f} ms)")
+    else:
+        print(f"  → Ninguna variante cuantizada cumple los límites (caída {result['max_metric_drop']:.3f}, "
+              f"Δ latencia < {result['max_latency_delta_ms']:+.2f} ms); se mantiene float")
+
+
+def quantization_mlflow_metrics(result: Dict) -> Dict[str, float]:
+    """Aplana el reporte a métricas de MLflow."""
+    metrics: Dict[str, float] = {}
+    for name, r in result['variants'].items():
+        for key in ('precision_V', 'recall_V', 'size_kb', 'latency_ms',
+                    'delta_precision_V', 'delta_recall_V', 'delta_latency_ms'):
+            if key in r:
+                metrics[f"tflite_{name}_{key}"] = float(r[key])
+    return metrics
@@ -0,0 +1,455 @@
+"""
+Evaluación por registro completo con el pipeline de serving, en procesos paralelos.
+
+Las métricas de test de deteccionarritmias.py salen de ventanas centradas
+en las anotaciones: no pasan por la detección de picos del servicio. Aquí
+cada registro de test se procesa entero con el código de producción
+(`SignalProcessor.process_signal` + `ArrhythmiaPredictor.predict`, con la
+configuración de settings) y los latidos detectados se aparean con las
+anotaciones de referencia dentro de una tolerancia (150 ms, como ANSI/AAMI
+EC57). Se reporta, por registro y agregado:
+
+- Detección de latidos: Se = TP/(TP+FN) y PPV = TP/(TP+FP).
+- Clasificación V de punta a punta: un V de referencia no detectado (o sin
+  ventana completa) cuenta como FN y un V predicho sin latido de referencia
+  como FP. Los latidos de referencia fuera de N/V (clase Q) no cuentan.
+- Throughput: segundos de señal por segundo de cómputo y latidos/s.
+
+Los registros corren en un pool de procesos (spawn); cada worker carga el
+modelo una vez con los hilos acotados.
+    
+    python -m training.record_evaluation --workers 4
+    python -m training.record_evaluation --model-name model_v7_student --backend numpy
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_PATH = os.path.join(PROJECT_ROOT, 'mit-bih')
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'record_eval_results')
+EXPERIMENT_NAME = "record_evaluation"
+TOLERANCE_MS = 150.0
+
+# Símbolos de anotación MIT-BIH que son latidos (el resto: ritmo, ruido, comentarios)
+BEAT_SYMBOLS = frozenset('NLRBAaJSVrFejnE/fQ?')
+
+# Estado del worker: pipeline de serving y event loop propio
+_PIPELINE: Optional[Dict] = None
+
+
+def match_beats(reference: np.ndarray, detected: np.ndarray, tolerance: int) -> np.ndarray:
+    """
+    Apareo uno a uno de latidos (muestras ordenadas) a |Δ| <= tolerance.
+    Si el detectado siguiente está más cerca de la misma referencia, el
+    actual queda sin aparear (FP).
+    
+    Returns:
+        (M, 2) índices [referencia, detectado] de los pares
+    """
+    reference = np.asarray(reference, dtype=np.int64)
+    detected = np.asarray(detected, dtype=np.int64)
+    pairs = []
+    i = j = 0
+    while i < len(reference) and j < len(detected):
+        delta = detected[j] - reference[i]
+        if abs(delta) <= tolerance:
+            if j + 1 < len(detected) and abs(detected[j + 1] - reference[i]) < abs(delta):
+                j += 1
+                continue
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif delta < 0:
+            j += 1
+        else:
+            i += 1
+    return np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def _ratio(num: int, den: int) -> float:
+    return float(num / den) if den else float('nan')
+
+
+def beat_metrics(
+    ref_samples: np.ndarray,
+    ref_labels: np.ndarray,
+    det_samples: np.ndarray,
+    det_pred: np.ndarray,
+    tolerance: int
+) -> Dict:
+    """
+    Conteos y Se/PPV de detección y de clasificación V.
+    
+    Args:
+        ref_samples, ref_labels: Latidos de referencia y su clase ('N' | 'V' | 'Q')
+        det_samples: Picos R detectados por el servicio
+        det_pred: Por pico, 1 = V, 0 = N, -1 = sin ventana (no clasificado)
+        tolerance: Tolerancia del apareo en muestras
+    """
+    pairs = match_beats(ref_samples, det_samples, tolerance)
+    ref_matched = np.full(len(ref_samples), -1, dtype=np.int64)
+    det_matched = np.zeros(len(det_samples), dtype=bool)
+    ref_matched[pairs[:, 0]] = pairs[:, 1]
+    det_matched[pairs[:, 1]] = True
+    
+    tp = len(pairs)
+    fn = len(ref_samples) - tp
+    fp = len(det_samples) - tp
+    
+    # V de punta a punta: referencia V con su detección clasificada como V
+    ref_v = ref_labels == 'V'
+    ref_scored = ref_labels != 'Q'
+    # Sin detecciones todos los latidos de referencia son FN (no hay índice que leer en det_pred)
+    pred_of_ref = np.full(len(ref_samples), -1, dtype=np.int64)
+    if len(det_samples):
+        pred_of_ref = np.where(ref_matched >= 0, det_pred[np.maximum(ref_matched, 0)], -1)
+    v_tp = int(np.sum(ref_v & (pred_of_ref == 1)))
+    v_fn = int(np.sum(ref_v)) - v_tp
+    v_fp = int(np.sum(ref_scored & ~ref_v & (pred_of_ref == 1)) + np.sum(~det_matched & (det_pred == 1)))
+    se_v, ppv_v = _ratio(v_tp, v_tp + v_fn), _ratio(v_tp, v_tp + v_fp)
+    
+    return {
+        'ref_beats': int(len(ref_samples)),
+        'detected': int(len(det_samples)),
+        'classified': int(np.sum(det_pred >= 0)),
+        'det_tp': tp, 'det_fn': fn, 'det_fp': fp,
+        'det_se': _ratio(tp, tp + fn),
+        'det_ppv': _ratio(tp, tp + fp),
+        'ref_V': int(np.sum(ref_v)),
+        'v_tp': v_tp, 'v_fn': v_fn, 'v_fp': v_fp,
+        'v_se': se_v,
+        'v_ppv': ppv_v,
+        'v_f1': 2 * se_v * ppv_v / (se_v + ppv_v) if se_v + ppv_v > 0 else float('nan'),
+    }
+
+
+def reference_beats(samples: np.ndarray, symbols: Sequence[str]):
+    """Anotaciones de latido (BEAT_SYMBOLS) y su clase AAMI ('Q' si no es N/V)."""
+    from training.ecg_dataset import AAMI_MAP, CLASSES
+    
+    symbols = np.asarray(symbols, dtype=str)
+    keep = np.isin(symbols, list(BEAT_SYMBOLS))
+    labels = np.array([AAMI_MAP.get(s, 'Q') for s in symbols[keep]], dtype='<U1')
+    labels[~np.isin(labels, list(CLASSES))] = 'Q'
+    return np.asarray(samples, dtype=np.int64)[keep], labels
+
+
+def _init_worker(config: Dict):
+    """Inicializador del pool: acota hilos y arma el pipeline de serving (modelo cargado una vez)."""
+    global _PIPELINE
+    threads = config['threads']
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    
+    from src.infrastructure.config.settings import settings
+    from src.infrastructure.repositories import ModelRepository, ModelRegistry
+    from src.infrastructure.ml import SignalProcessor, ArrhythmiaPredictor
+    
+    if config['backend'] == 'keras':
+        from training.model import limit_tf_threads
+        limit_tf_threads(threads, 1)
+    backend_options = {'intra_op_threads': threads, 'inter_op_threads': 1} if config['backend'] == 'onnx' else {}
+    
+    repository = ModelRepository(model_dir=Path(config['model_dir']), backend=config['backend'],
+                                 backend_options=backend_options)
+    registry = ModelRegistry(model_repository=repository, default_alias=settings.MODEL_ALIAS,
+                             default_version=config['model_name'])
+    predictor = ArrhythmiaPredictor(
+        model_registry=registry,
+        threshold=settings.MODEL_THRESHOLD,
+        ruleguard_config={
+            'rr_low': settings.RULEGUARD_RR_LOW,
+            'rr_high': settings.RULEGUARD_RR_HIGH,
+            'qrs_threshold': settings.RULEGUARD_QRS_THRESHOLD
+        },
+        model_alias=settings.MODEL_ALIAS,
+        ruleguard_from_metadata=settings.RULEGUARD_FROM_METADATA,
+        threshold_from_metadata=settings.THRESHOLD_FROM_METADATA
+    )
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(repository.load_model(config['model_name']))
+    _PIPELINE = {
+        'processor': SignalProcessor(sampling_rate=config['fs'], window_size=settings.WINDOW_SIZE),
+        'predictor': predictor,
+        'loop': loop,
+    }
+
+
+def run_pipeline(signal: np.ndarray, fs: int, apply_ruleguard: bool = True) -> Dict:
+    """
+    Pasa un registro completo por el pipeline del worker.
+    
+    Returns:
+        {'r_peaks', 'pred' (1/0/-1 por pico), 'model_version', 'process_s', 'predict_s'}
+    """
+    from src.domain.entities import ECGSignal
+    
+    processor, predictor, loop = _PIPELINE['processor'], _PIPELINE['predictor'], _PIPELINE['loop']
+    t0 = time.perf_counter()
+    processed = loop.run_until_complete(processor.process_signal(ECGSignal.create(signal_data=signal, sampling_rate=fs)))
+    t1 = time.perf_counter()
+    
+    pred = np.full(len(processed.r_peaks), -1, dtype=np.int64)
+    version = None
+    if processed.windows:
+        result = loop.run_until_complete(predictor.predict(processed, apply_ruleguard=apply_ruleguard))
+        positions = np.array([b['position_sample'] for b in result.beat_predictions], dtype=np.int64)
+        pred[np.searchsorted(processed.r_peaks, positions)] = [
+            int(b['arrhythmia_type'] == 'V') for b in result.beat_predictions
+        ]
+        version = result.model_version
+    return {
+        'r_peaks': np.asarray(processed.r_peaks, dtype=np.int64),
+        'pred': pred,
+        'model_version': version,
+        'process_s': t1 - t0,
+        'predict_s': time.perf_counter() - t1,
+    }
+
+
+def evaluate_record(record_id, config: Dict) -> Dict:
+    """
+    Evalúa un registro en el worker. Retorna un dict serializable con
+    `status` ('ok' | 'missing' | 'error'), métricas y tiempos.
+    """
+    from training.ecg_dataset import read_record
+    
+    t0, started = time.perf_counter(), time.time()
+    try:
+        signal, samples, symbols = read_record(record_id, config['base_path'], config['deriv_idx'])
+        out = run_pipeline(signal, config['fs'], apply_ruleguard=config['ruleguard'])
+        ref_samples, ref_labels = reference_beats(samples, symbols)
+        tolerance = int(round(config['tolerance_ms'] / 1000 * config['fs']))
+        metrics = beat_metrics(ref_samples, ref_labels, out['r_peaks'], out['pred'], tolerance)
+    except FileNotFoundError as e:
+        return {'record_id': record_id, 'status': 'missing', 'error': str(e)}
+    except Exception as e:
+        return {'record_id': record_id, 'status': 'error', 'error': f"{e.__class__.__name__}: {e}"}
+    
+    seconds = time.perf_counter() - t0
+    duration = len(signal) / config['fs']
+    return {
+        'record_id': record_id,
+        'status': 'ok',
+        'pid': os.getpid(),
+        'model_version': out['model_version'],
+        **metrics,
+        'duration_s': duration,
+        'process_s': out['process_s'],
+        'predict_s': out['predict_s'],
+        'seconds': seconds,
+        'realtime_factor': duration / seconds,
+        'beats_per_s': len(out['r_peaks']) / seconds,
+        'started': started,
+        'finished': started + seconds,
+    }
+
+
+def _evaluate_task(task):
+    record_id, config = task
+    return evaluate_record(record_id, config)
+
+
+def aggregate_records(results: Sequence[Dict], elapsed_s: float) -> Dict:
+    """
+    Métricas brutas (conteos sumados sobre todos los registros), media por
+    registro de Se/PPV y throughput del pool completo: entre el primer
+    registro que empieza y el último que termina, sin el arranque de los
+    workers ni la carga del modelo (incluidos en `elapsed_s`).
+    """
+    ok = [r for r in results if r['status'] == 'ok']
+    wall_s = max(r['finished'] for r in ok) - min(r['started'] for r in ok) if ok else 0.0
+    total = {k: sum(r[k] for r in ok) for k in
+             ('ref_beats', 'detected', 'det_tp', 'det_fn', 'det_fp', 'ref_V', 'v_tp', 'v_fn', 'v_fp')}
+    se_v = _ratio(total['v_tp'], total['v_tp'] + total['v_fn'])
+    ppv_v = _ratio(total['v_tp'], total['v_tp'] + total['v_fp'])
+    duration = sum(r['duration_s'] for r in ok)
+    
+    def mean(key):
+        values = np.array([r[key] for r in ok], dtype=float)
+        return float(np.nanmean(values)) if np.isfinite(values).any() else float('nan')
+    
+    return {
+        'records_ok': len(ok),
+        'records_failed': len(results) - len(ok),
+        **total,
+        'gross': {
+            'det_se': _ratio(total['det_tp'], total['det_tp'] + total['det_fn']),
+            'det_ppv': _ratio(total['det_tp'], total['det_tp'] + total['det_fp']),
+            'v_se': se_v,
+            'v_ppv': ppv_v,
+            'v_f1': 2 * se_v * ppv_v / (se_v + ppv_v) if se_v + ppv_v > 0 else float('nan'),
+        },
+        'per_record_mean': {k: mean(k) for k in ('det_se', 'det_ppv', 'v_se', 'v_ppv')},
+        'throughput': {
+            'wall_s': wall_s,
+            'elapsed_s': elapsed_s,
+            'signal_s': duration,
+            'cpu_s': sum(r['seconds'] for r in ok),
+            'realtime_factor': duration / wall_s if wall_s else float('nan'),
+            'beats_per_s': total['detected'] / wall_s if wall_s else float('nan'),
+            'predict_s': sum(r['predict_s'] for r in ok),
+            'process_s': sum(r['process_s'] for r in ok),
+        },
+    }
+
+
+def print_report(results: Sequence[Dict], summary: Dict, config: Dict):
+    print("\n" + "=" * 100)
+    print(f"📊 EVALUACIÓN POR REGISTRO — {config['model_name']} ({config['backend']}) "
+          f"| tolerancia {config['tolerance_ms']:.0f} ms | RuleGuard {'on' if config['ruleguard'] else 'off'}")
+    print("=" * 100)
+    print(f"  {'Rec':>5} {'Ref':>6} {'Det':>6} {'Se':>7} {'PPV':>7} | {'V ref':>6} {'Se V':>7} {'PPV V':>7} "
+          f"| {'seg':>6} {'x RT':>7}")
+    for r in results:
+        if r['status'] != 'ok':
+            print(f"  {r['record_id']:>5} {r['status']}: {r['error'].splitlines()[0]}")
+            continue
+        print(f"  {r['record_id']:>5} {r['ref_beats']:>6} {r['detected']:>6} {r['det_se']:>7.4f} {r['det_ppv']:>7.4f} "
+              f"| {r['ref_V']:>6} {r['v_se']:>7.4f} {r['v_ppv']:>7.4f} | {r['seconds']:>6.2f} {r['realtime_factor']:>7.0f}")
+    g, m, t = summary['gross'], summary['per_record_mean'], summary['throughput']
+    print(f"\n  Bruto:      detección Se={g['det_se']:.4f} PPV={g['det_ppv']:.4f} | "
+          f"V Se={g['v_se']:.4f} PPV={g['v_ppv']:.4f} F1={g['v_f1']:.4f}")
+    print(f"  Media/reg.: detección Se={m['det_se']:.4f} PPV={m['det_ppv']:.4f} | "
+          f"V Se={m['v_se']:.4f} PPV={m['v_ppv']:.4f}")
+    print(f"  Throughput: {t['signal_s'] / 3600:.2f} h de señal en {t['wall_s']:.1f} s "
+          f"({t['realtime_factor']:.0f}x tiempo real, {t['beats_per_s']:.0f} latidos/s) "
+          f"| CPU: preproceso {t['process_s']:.1f} s, predicción {t['predict_s']:.1f} s")
+
+
+def log_mlflow(summary: Dict, config: Dict, path: str):
+    """Run de MLflow con la configuración, las métricas agregadas y el JSON completo."""
+    import mlflow
+    
+    mlflow.set_tracking_uri("file:./mlruns")
+    mlflow.set_experiment(EXPERIMENT_NAME)
+    with mlflow.start_run(run_name=f"{config['model_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
+        mlflow.log_params({
+            'model_name': config['model_name'], 'backend': config['backend'], 'ruleguard': config['ruleguard'],
+            'tolerance_ms': config['tolerance_ms'], 'workers': config['workers'], 'threads_per_worker': config['threads'],
+            'records': ','.join(map(str, config['records'])),
+        })
+        metrics = {
+            **{f"gross_{k}": v for k, v in summary['gross'].items()},
+            **{f"mean_{k}": v for k, v in summary['per_record_mean'].items()},
+            **{f"throughput_{k}": v for k, v in summary['throughput'].items()},
+            'records_failed': summary['records_failed'],
+        }
+        mlflow.log_metrics({k: float(v) for k, v in metrics.items() if np.isfinite(v)})
+        mlflow.log_artifact(path)
+
+
+def run_record_evaluation(
+    records: Optional[Sequence] = None,
+    model_name: Optional[str] = None,
+    backend: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    tolerance_ms: float = TOLERANCE_MS,
+    ruleguard: bool = True,
+    base_path: str = BASE_PATH,
+    use_mlflow: bool = False,
+    results_dir: str = RESULTS_DIR
+) -> Dict:
+    """
+    Evalúa el pipeline de serving sobre registros completos.
+    
+    Args:
+        records: Registros MIT-BIH (default: TEST_RECORDS)
+        model_name, backend, model_dir: Modelo a servir (default: los de settings)
+        workers: Registros en paralelo (default: núcleos)
+        threads_per_worker: Hilos de inferencia por worker (default: núcleos/workers)
+        tolerance_ms: Tolerancia del apareo detectado/referencia
+        ruleguard: Aplicar RuleGuard (como `apply_ruleguard` de la API)
+    
+    Returns:
+        {'records': [resultado por registro], 'summary': agregado, 'path': JSON guardado}
+    """
+    from src.infrastructure.config.settings import settings
+    from training.ecg_dataset import TEST_RECORDS
+    
+    records = list(records or TEST_RECORDS)
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(records)))
+    config = {
+        'records': records,
+        'model_name': model_name or settings.MODEL_NAME,
+        'backend': backend or settings.MODEL_BACKEND,
+        'model_dir': str(model_dir or settings.MODEL_DIR),
+        'base_path': base_path,
+        'fs': settings.SAMPLING_RATE,
+        'deriv_idx': settings.DERIVATION_INDEX,
+        'tolerance_ms': tolerance_ms,
+        'ruleguard': ruleguard,
+        'workers': workers,
+        'threads': max(1, threads_per_worker or cores // workers),
+    }
+    print(f"🩺 Evaluación por registro: {len(records)} registros | {config['model_name']} ({config['backend']}) "
+          f"| Workers: {workers} x {config['threads']} hilos")
+    
+    results = []
+    t0 = time.perf_counter()
+    tasks = [(r, config) for r in records]
+    if workers == 1:
+        _init_worker(config)
+        results = [_evaluate_task(task) for task in tasks]
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+            results = list(pool.imap_unordered(_evaluate_task, tasks))
+    elapsed_s = time.perf_counter() - t0
+    
+    results.sort(key=lambda r: records.index(r['record_id']))
+    summary = aggregate_records(results, elapsed_s)
+    print_report(results, summary, config)
+    
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"records_{config['model_name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump({'config': config, 'records': results, 'summary': summary}, f, indent=2)
+    print(f"\n💾 Resultados guardados en: {path}")
+    
+    if use_mlflow:
+        log_mlflow(summary, config, path)
+    return {'records': results, 'summary': summary, 'path': path}
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Evaluación por registro completo con el pipeline de serving')
+    parser.add_argument('--records', type=int, nargs='*', default=None, help='Registros (default: TEST_RECORDS)')
+    parser.add_argument('--model-name', default=None, help='Versión a evaluar (default: MODEL_NAME de settings)')
+    parser.add_argument('--backend', choices=['keras', 'numpy', 'onnx'], default=None,
+                        help='Backend de inferencia (default: MODEL_BACKEND de settings)')
+    parser.add_argument('--model-dir', default=None, help='Directorio de modelos (default: MODEL_DIR de settings)')
+    parser.add_argument('--workers', type=int, default=None, help='Registros en paralelo (default: núcleos)')
+    parser.add_argument('--threads-per-worker', type=int, default=None, help='Hilos por worker (default: núcleos/workers)')
+    parser.add_argument('--tolerance-ms', type=float, default=TOLERANCE_MS, help='Tolerancia del apareo (default: 150)')
+    parser.add_argument('--base-path', default=BASE_PATH, help='Directorio de los registros WFDB')
+    parser.add_argument('--no-ruleguard', action='store_true')
+    parser.add_argument('--mlflow', action='store_true', help=f'Registrar en MLflow (experimento {EXPERIMENT_NAME})')
+    args = parser.parse_args()
+    
+    run_record_evaluation(
+        records=args.records,
+        model_name=args.model_name,
+        backend=args.backend,
+        model_dir=args.model_dir,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        tolerance_ms=args.tolerance_ms,
+        ruleguard=not args.no_ruleguard,
+        base_path=args.base_path,
+        use_mlflow=args.mlflow
+    )
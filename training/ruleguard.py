@@ -0,0 +1,230 @@
+"""
+Sintonía vectorizada de RuleGuard-V.
+
+RuleGuard anula predicciones V cuyo ratio RR está en un rango "normal"
+(rr_lo < RR_next/RR_prev < rr_hi) y cuyo QRS aproximado es angosto
+(qrs_ms < qrs_thr). La sintonía barre la grilla completa de
+(rr_lo, rr_hi, qrs_thr) sobre la validación:
+
+- `qrs_widths_ms` calcula el ancho QRS de todas las ventanas de una vez (es
+  la misma función que usa la API, en src/infrastructure/ml/signal_processor.py).
+- `sweep_grid` obtiene TP/FP/FN de cada combinación sin recorrerlas: solo
+  los positivos predichos pueden cambiar, y la cantidad anulada por celda
+  es un producto de máscaras (rr_lo x rr_hi) @ (qrs_thr), por bloques.
+- `select_config` elige la celda como el bucle original: F1 máximo con
+  precisión >= objetivo, primera en orden (rr_lo, rr_hi, qrs_thr).
+
+`meta_config` produce el bloque `ruleguard_config` de meta_<tag>.json con
+las mismas claves que usa la API (rr_low, rr_high, qrs_threshold).
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from src.infrastructure.ml.signal_processor import qrs_widths_ms
+
+DEFAULT_CONFIG = (0.90, 1.10, 110)
+
+# Grilla de sintonía (la del bucle original era 6x4x5)
+RR_LO_GRID = np.round(np.arange(0.80, 0.981, 0.01), 2)
+RR_HI_GRID = np.round(np.arange(1.02, 1.301, 0.01), 2)
+QRS_GRID = np.arange(80, 141, 2)
+
+
+def _qrs_width_loop(w, fs=360, center=None, rel_thr=0.5, max_ms=200):
+    """Implementación original por ventana; referencia para `check_vectorized`."""
+    L = len(w)
+    if center is None:
+        center = L//2
+    dv = np.abs(np.diff(w, prepend=w[0]))
+    kernel = np.ones(5)/5.0
+    env = np.convolve(dv, kernel, mode='same')
+    peak = np.max(env[max(0,center-20):min(L,center+20)]) + 1e-9
+    thr = rel_thr * peak
+    left = center
+    while left>1 and env[left] > thr:
+        left -= 1
+    right = center
+    while right<L-2 and env[right] > thr:
+        right += 1
+    width_samples = right - left
+    width_ms = 1000.0 * width_samples / fs
+    return min(width_ms, max_ms)
+
+
+def rr_ratio(X_rr: np.ndarray) -> np.ndarray:
+    """RR_next / RR_prev (con el mismo epsilon que el entrenamiento)."""
+    return X_rr[:, 1] / (X_rr[:, 0] + 1e-6)
+
+
+def sweep_grid(
+    y_true: np.ndarray,
+    y_pred: np.ndarray,
+    rr: np.ndarray,
+    qrs_ms: np.ndarray,
+    rr_lo_grid: Sequence[float],
+    rr_hi_grid: Sequence[float],
+    qrs_grid: Sequence[float],
+    max_block_bytes: int = 64 * 1024 * 1024
+) -> Dict[str, np.ndarray]:
+    """
+    TP, FP, FN, precisión, recall y F1 de V para cada (rr_lo, rr_hi, qrs_thr).
+    
+    Returns:
+        dict con la grilla ('rr_lo', 'rr_hi', 'qrs_thr') y arrays (A, B, C)
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    y_pred = np.asarray(y_pred).astype(bool)
+    lo_grid = np.asarray(rr_lo_grid, dtype=np.float64)
+    hi_grid = np.asarray(rr_hi_grid, dtype=np.float64)
+    qrs_grid = np.asarray(qrs_grid, dtype=np.float64)
+    A, B, C = len(lo_grid), len(hi_grid), len(qrs_grid)
+    
+    tp0 = int((y_true & y_pred).sum())
+    fp0 = int((~y_true & y_pred).sum())
+    fn0 = int((y_true & ~y_pred).sum())
+    
+    # Solo los positivos predichos pueden ser anulados
+    pos = np.flatnonzero(y_pred)
+    r, q, t = rr[pos], qrs_ms[pos], y_true[pos]
+    hi_mask = (r[None, :] < hi_grid[:, None]).astype(np.float32)            # (B, P)
+    # Columna 0: anulados verdaderos (V reales); columna 1: anulados falsos
+    q_mask = (q[None, :] < qrs_grid[:, None]).astype(np.float32)            # (C, P)
+    weights = np.stack([q_mask * t, q_mask * ~t], axis=-1)                  # (C, P, 2)
+    weights = weights.transpose(1, 0, 2).reshape(len(pos), 2 * C)           # (P, 2C)
+    
+    suppressed = np.zeros((A, B, C, 2), dtype=np.int64)
+    rows = max(1, max_block_bytes // max(1, 4 * B * len(pos)))
+    for start in range(0, A, rows):
+        lo_mask = (r[None, :] > lo_grid[start:start + rows, None]).astype(np.float32)   # (a, P)
+        both = (lo_mask[:, None, :] * hi_mask[None, :, :]).reshape(-1, len(pos))        # (a*B, P)
+        counts = np.rint(both @ weights).astype(np.int64)                              # (a*B, 2C)
+        suppressed[start:start + rows] = counts.reshape(-1, B, C, 2)
+    
+    tp = tp0 - suppressed[..., 0]
+    fp = fp0 - suppressed[..., 1]
+    fn = fn0 + suppressed[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    return {
+        'rr_lo': lo_grid, 'rr_hi': hi_grid, 'qrs_thr': qrs_grid,
+        'tp': tp, 'fp': fp, 'fn': fn,
+        'precision': precision, 'recall': recall, 'f1': f1,
+    }
+
+
+def select_config(
+    sweep: Dict[str, np.ndarray],
+    target_precision: float,
+    default: Tuple[float, float, float] = DEFAULT_CONFIG
+) -> Dict[str, float]:
+    """
+    Celda con F1 máximo entre las de precisión >= objetivo (empates: la
+    primera en orden rr_lo, rr_hi, qrs_thr). Sin candidatas con F1 > 0 se
+    usa `default`, igual que el bucle original.
+    """
+    f1 = np.where(sweep['precision'] >= target_precision, sweep['f1'], -np.inf)
+    flat = int(np.argmax(f1))
+    if not f1.flat[flat] > 0.0:
+        rr_lo, rr_hi, qrs_thr = default
+        return {'rr_lo': float(rr_lo), 'rr_hi': float(rr_hi), 'qrs_thr': float(qrs_thr),
+                'f1': 0.0, 'precision': float('nan'), 'recall': float('nan'), 'feasible': False}
+    a, b, c = np.unravel_index(flat, f1.shape)
+    return {
+        'rr_lo': float(sweep['rr_lo'][a]),
+        'rr_hi': float(sweep['rr_hi'][b]),
+        'qrs_thr': float(sweep['qrs_thr'][c]),
+        'f1': float(sweep['f1'][a, b, c]),
+        'precision': float(sweep['precision'][a, b, c]),
+        'recall': float(sweep['recall'][a, b, c]),
+        'feasible': True,
+    }
+
+
+def apply_ruleguard(y_pred: np.ndarray, rr: np.ndarray, qrs_ms: np.ndarray, rr_lo: float, rr_hi: float, qrs_thr: float) -> np.ndarray:
+    """Anula los V predichos con RR "normal" y QRS angosto."""
+    y = np.asarray(y_pred).astype(np.int32).copy()
+    y[(y == 1) & (rr > rr_lo) & (rr < rr_hi) & (qrs_ms < qrs_thr)] = 0
+    return y
+
+
+def meta_config(config: Dict[str, float]) -> Dict[str, float]:
+    """Bloque `ruleguard_config` de la metadata, con las claves de la API."""
+    return {
+        'rr_low': round(float(config['rr_lo']), 6),
+        'rr_high': round(float(config['rr_hi']), 6),
+        'qrs_threshold': float(config['qrs_thr']),
+    }
+
+
+# ----------------------------------------------------------------------
+# Verificación: vectorizado == bucles originales
+# ----------------------------------------------------------------------
+
+def _sweep_loop(y_true, y_pred, rr, qrs_ms, rr_lo_grid, rr_hi_grid, qrs_grid, target_precision):
+    """Bucle original (sklearn por combinación); referencia para `check_vectorized`."""
+    from sklearn.metrics import precision_recall_fscore_support
+    best = (0.0, DEFAULT_CONFIG)
+    for rr_lo in rr_lo_grid:
+        for rr_hi in rr_hi_grid:
+            for qrs_thr in qrs_grid:
+                ytmp = y_pred.copy()
+                mask = (ytmp==1) & (rr>rr_lo) & (rr<rr_hi) & (qrs_ms<qrs_thr)
+                ytmp[mask] = 0
+                p,r,f1,_ = precision_recall_fscore_support(y_true, ytmp, average='binary', zero_division=0)
+                if p>=target_precision and f1>best[0]:
+                    best = (f1, (rr_lo, rr_hi, qrs_thr))
+    return best
+
+
+def synthetic_validation(n: int = 3000, win: int = 360, fs: int = 360, seed: int = 0):
+    """Ventanas con QRS de ancho variable, RR y predicciones ruidosas."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(win)
+    y_true = (rng.random(n) < 0.15).astype(np.int32)
+    width = np.where(y_true == 1, rng.uniform(8, 30, n), rng.uniform(3, 14, n))
+    X = np.exp(-0.5 * ((t[None, :] - win // 2) / width[:, None]) ** 2)
+    X += 0.05 * rng.standard_normal((n, win))
+    rr = np.where(y_true == 1, rng.uniform(0.6, 1.3, n), rng.uniform(0.85, 1.15, n))
+    X_rr = np.stack([np.ones(n), rr, rr], axis=1)
+    y_pred = np.where(rng.random(n) < 0.2, 1 - y_true, y_true).astype(np.int32)
+    return X.astype(np.float32), X_rr, y_true, y_pred
+
+
+def check_vectorized(n: int = 3000, seed: int = 0) -> bool:
+    """Compara anchos QRS y la selección de la grilla con los bucles originales."""
+    X, X_rr, y_true, y_pred = synthetic_validation(n=n, seed=seed)
+    qrs_ref = np.array([_qrs_width_loop(w) for w in X])
+    qrs_vec = qrs_widths_ms(X)
+    same_qrs = np.array_equal(qrs_ref, qrs_vec)
+    print(f"  {'✅' if same_qrs else '❌'} ancho QRS: {int((qrs_ref == qrs_vec).sum())}/{n} idénticos")
+    
+    rr = rr_ratio(X_rr)
+    grids = (np.linspace(0.85, 0.95, 6), np.linspace(1.05, 1.20, 4), [90, 100, 110, 120, 130])
+    ok = same_qrs
+    for target in (0.0, 0.6, 0.85, 1.01):
+        f1_ref, cfg_ref = _sweep_loop(y_true, y_pred, rr, qrs_ref, *grids, target)
+        chosen = select_config(sweep_grid(y_true, y_pred, rr, qrs_vec, *grids), target)
+        same = (np.allclose((chosen['rr_lo'], chosen['rr_hi'], chosen['qrs_thr']), cfg_ref)
+                and np.isclose(chosen['f1'], f1_ref))
+        ok &= bool(same)
+        print(f"  {'✅' if same else '❌'} grilla (prec>={target}): {cfg_ref} F1={f1_ref:.4f}")
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    
+    passed = check_vectorized()
+    X, X_rr, y_true, y_pred = synthetic_validation(n=20000, seed=1)
+    t0 = time.perf_counter()
+    qrs = qrs_widths_ms(X)
+    grids = (np.linspace(0.80, 0.98, 37), np.linspace(1.02, 1.30, 29), np.arange(70, 151, 2))
+    sweep = sweep_grid(y_true, y_pred, rr_ratio(X_rr), qrs, *grids)
+    elapsed = time.perf_counter() - t0
+    print(f"  grilla {sweep['f1'].size} combinaciones x {len(y_true)} latidos: {elapsed:.2f}s")
+    print("✅ Sintonía vectorizada idéntica" if passed else "❌ La sintonía vectorizada difiere")
+    sys.exit(0 if passed else 1)
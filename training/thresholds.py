@@ -0,0 +1,91 @@
+"""
+Calibración Platt, selección de umbral y métricas de decisión de la clase V.
+
+Misma regla que [C09] de deteccionarritmias.py, compartida con la
+validación cruzada: Platt sobre la probabilidad cruda de la validación y
+umbral con F1 máximo entre los que cumplen precisión y recall objetivo; si
+ninguno cumple ambas metas, el de F1 máximo a secas.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (
+    accuracy_score, average_precision_score, confusion_matrix, precision_recall_curve, precision_recall_fscore_support
+)
+
+MEETS_TARGETS = "Cumple metas (Prec y Rec)"
+BEST_F1 = "Mejor F1 posible (no alcanzó ambas metas)"
+
+
+def fit_platt(proba_raw: np.ndarray, y_true: np.ndarray) -> LogisticRegression:
+    platt = LogisticRegression(max_iter=1000)
+    platt.fit(np.asarray(proba_raw).reshape(-1, 1), y_true)
+    return platt
+
+
+def calibrate(platt: LogisticRegression, proba_raw: np.ndarray) -> np.ndarray:
+    return platt.predict_proba(np.asarray(proba_raw).reshape(-1, 1))[:, 1]
+
+
+def select_threshold(y_true: np.ndarray, proba: np.ndarray, target_prec: float, target_rec: float) -> Dict:
+    """
+    Umbral sobre `proba` (calibrada) con F1 máximo entre los que cumplen
+    ambas metas (empates: el umbral más bajo, como el sort estable original).
+    
+    Returns:
+        {'threshold', 'precision', 'recall', 'f1', 'meets_targets', 'method'}
+    """
+    prec, rec, thr = precision_recall_curve(y_true, proba)
+    # Mismo apareamiento que el script original: umbral i con prec/rec i+1
+    p, r = prec[1:], rec[1:]
+    f1 = (2 * p * r) / (p + r + 1e-9)
+    meets = (p >= target_prec) & (r >= target_rec)
+    candidates = np.where(meets, f1, -np.inf) if meets.any() else f1
+    best = int(np.argmax(candidates))
+    return {
+        'threshold': float(thr[best]),
+        'precision': float(p[best]),
+        'recall': float(r[best]),
+        'f1': float(f1[best]),
+        'meets_targets': bool(meets.any()),
+        'method': MEETS_TARGETS if meets.any() else BEST_F1,
+    }
+
+
+def raw_threshold(platt: LogisticRegression, threshold: float) -> Optional[float]:
+    """
+    Umbral equivalente sobre la probabilidad cruda del modelo: con pendiente
+    positiva Platt es creciente, así que `calibrate(p) >= threshold` <=>
+    `p >= raw_threshold`. None si la pendiente no es positiva.
+    """
+    a, b = float(platt.coef_[0, 0]), float(platt.intercept_[0])
+    if a <= 0:
+        return None
+    t = min(max(threshold, 1e-7), 1 - 1e-7)
+    return float((np.log(t / (1 - t)) - b) / a)
+
+
+def decision_meta(platt: LogisticRegression, selection: Dict) -> Dict:
+    """Bloque `decision` de meta_<tag>.json: umbral calibrado, Platt y umbral crudo."""
+    return {
+        'threshold': selection['threshold'],
+        'threshold_raw': raw_threshold(platt, selection['threshold']),
+        'platt': {'coef': float(platt.coef_[0, 0]), 'intercept': float(platt.intercept_[0])},
+        'method': selection['method'],
+    }
+
+
+def decision_metrics(y_true: np.ndarray, y_pred: np.ndarray, proba: np.ndarray) -> Dict[str, float]:
+    """Accuracy, Prec/Rec/F1 de V, PR-AUC de `proba` y matriz de confusión."""
+    y_true = np.asarray(y_true)
+    prec, rec, f1, _ = precision_recall_fscore_support(y_true, y_pred, labels=[1], zero_division=0)
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        'accuracy': float(accuracy_score(y_true, y_pred)),
+        'precision_V': float(prec[0]),
+        'recall_V': float(rec[0]),
+        'f1_V': float(f1[0]),
+        'pr_auc': float(average_precision_score(y_true, proba)) if y_true.any() else float('nan'),
+        'TN': int(tn), 'FP': int(fp), 'FN': int(fn), 'TP': int(tp),
+    }